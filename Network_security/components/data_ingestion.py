@@ -4,9 +4,14 @@ from Network_security.logging.logger import logging
 
 from Network_security.entity.config_entity import DataIngestionConfig
 from Network_security.entity.artifact_entity import DataIngestionArtifact
+from Network_security.constants.training_pipeline import SCHEMA_FILE_PATH,ARTIFACT_EXPORT_CSV
+from Network_security.utils.main_utils.utils import read_yaml_file,write_yaml_file,compact_dataframe,save_dataframe
+from Network_security.utils.ml_utils.tracking.profiler import profiled
 
 import os
 import sys
+import itertools
+from datetime import datetime,timedelta,timezone
 import numpy as np
 import pandas as pd
 import pymongo
@@ -17,41 +22,180 @@ from dotenv import load_dotenv
 load_dotenv()
 Mongo_DB_URL=os.getenv("Mongo_DB_URL")
 
+# the snapshot keeps each row's document _id (as a string) so changed and deleted documents can be matched
+SNAPSHOT_ID_COLUMN="_id"
+# marker given to documents loaded before it existed, older than any run's mark
+UNTRACKED_UPDATED_AT=datetime(1970,1,1)
+
 class DataIngestion:
-    def __init__(self,data_ingestion_config:DataIngestionConfig):
+    def __init__(self,data_ingestion_config:DataIngestionConfig,mongo_client=None):
         try:
             self.data_ingestion_config=data_ingestion_config
+            self.mongo_client=mongo_client
+            self.schema_config=read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise NetworkSecurityException(e,sys)
-        
-    def export_collection_as_dataframe(self):
+
+    def get_collection(self):
         try:
+            if self.mongo_client is None:
+                self.mongo_client=pymongo.MongoClient(Mongo_DB_URL)
             database_name=self.data_ingestion_config.database_name
             collection_name=self.data_ingestion_config.collection_name
-            self.mongo_client=pymongo.MongoClient(Mongo_DB_URL)
-            collection=self.mongo_client[database_name][collection_name]
+            return self.mongo_client[database_name][collection_name]
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
 
-            df=pd.DataFrame(list(collection.find()))
-            if "_id" in df.columns.to_list():
-                df=df.drop(columns=["_id"],axis=1)
+    @profiled("mongo_fetch")
+    def fetch_documents_as_dataframe(self,collection,query:dict,with_ids:bool=False)->pd.DataFrame:
+        try:
+            columns=[list(column.keys())[0] for column in self.schema_config['columns']]
+            # only the schema columns come over the wire, plus _id when the rows go into the snapshot
+            projection={"_id":1 if with_ids else 0,**{column:1 for column in columns}}
+            cursor=collection.find(query,projection=projection,batch_size=self.data_ingestion_config.batch_size)
+
+            frames=[]
+            while True:
+                documents=list(itertools.islice(cursor,self.data_ingestion_config.batch_size))
+                if not documents:
+                    break
+                # build each batch column by column instead of one dict per row; "na" and other junk become NaN.
+                # Batches are compacted right away, so the whole collection is never held as float64
+                frame=compact_dataframe(pd.DataFrame({
+                    column:pd.to_numeric(pd.Series([document.get(column) for document in documents],dtype=object),
+                                         errors="coerce")
+                    for column in columns
+                }))
+                if with_ids:
+                    frame[SNAPSHOT_ID_COLUMN]=[str(document["_id"]) for document in documents]
+                frames.append(frame)
+            if not frames:
+                return pd.DataFrame(columns=columns+[SNAPSHOT_ID_COLUMN] if with_ids else columns)
+            return pd.concat(frames,ignore_index=True)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
 
-            df.replace({"na":np.nan},inplace=True)
-            return df
+    @profiled("snapshot_read")
+    def read_snapshot(self):
+        try:
+            snapshot_file_path=self.data_ingestion_config.snapshot_file_path
+            snapshot_state_file_path=self.data_ingestion_config.snapshot_state_file_path
+            if not (os.path.exists(snapshot_file_path) and os.path.exists(snapshot_state_file_path)):
+                return None,None
+            snapshot_state=read_yaml_file(snapshot_state_file_path)
+            snapshot_df=pd.read_parquet(snapshot_file_path)
+            # snapshots written before rows were keyed by _id cannot be updated in place
+            if not snapshot_state.get("updated_at_mark") or SNAPSHOT_ID_COLUMN not in snapshot_df.columns:
+                return None,None
+            snapshot_state["updated_at_mark"]=datetime.fromisoformat(snapshot_state["updated_at_mark"])
+            return snapshot_df,snapshot_state
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    @profiled("snapshot_write")
+    def write_snapshot(self,dataframe:pd.DataFrame,updated_at_mark)->None:
+        try:
+            snapshot_file_path=self.data_ingestion_config.snapshot_file_path
+            os.makedirs(os.path.dirname(snapshot_file_path),exist_ok=True)
+            tmp_file_path=f"{snapshot_file_path}.tmp"
+            dataframe.to_parquet(tmp_file_path,index=False)
+            os.replace(tmp_file_path,snapshot_file_path)
+            write_yaml_file(file_path=self.data_ingestion_config.snapshot_state_file_path,
+                            content={"updated_at_mark":updated_at_mark.isoformat(),"row_count":len(dataframe)})
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def backfill_updated_at(self,collection)->int:
+        # stamps documents written without the change marker, so they can be tracked from now on
+        try:
+            updated_at_field=self.data_ingestion_config.updated_at_field
+            result=collection.update_many({updated_at_field:{"$exists":False}},
+                                          {"$set":{updated_at_field:UNTRACKED_UPDATED_AT}})
+            if result.modified_count:
+                logging.info(f"Stamped {result.modified_count} documents without {updated_at_field}")
+            return result.modified_count
+        except pymongo.errors.PyMongoError as e:
+            logging.info(f"Could not stamp documents without {self.data_ingestion_config.updated_at_field}: {e}")
+            return 0
+
+    def fetch_by_ids(self,collection,document_ids:list)->list:
+        batch_size=self.data_ingestion_config.batch_size
+        return [self.fetch_documents_as_dataframe(collection,{"_id":{"$in":document_ids[start:start+batch_size]}},
+                                                  with_ids=True)
+                for start in range(0,len(document_ids),batch_size)]
+
+    def update_snapshot(self,collection,snapshot_df:pd.DataFrame,snapshot_state:dict)->pd.DataFrame:
+        try:
+            updated_at_field=self.data_ingestion_config.updated_at_field
+            # documents written or changed since the previous run started, less the lookback
+            changed_df=self.fetch_documents_as_dataframe(
+                collection,{updated_at_field:{"$gte":snapshot_state["updated_at_mark"]}},with_ids=True)
+            fresh_frames=[changed_df]
+
+            # every document is either in the snapshot or was just fetched, unless some were deleted or written
+            # without a recent marker; only then is the collection's full _id list read
+            known_ids=set(snapshot_df[SNAPSHOT_ID_COLUMN])|set(changed_df[SNAPSHOT_ID_COLUMN])
+            current_ids=None
+            if collection.count_documents({})!=len(known_ids):
+                current_ids={str(document["_id"]):document["_id"] for document in collection.find(
+                    {},projection={"_id":1},batch_size=self.data_ingestion_config.batch_size)}
+                fresh_frames+=self.fetch_by_ids(collection,[current_ids[document_id]
+                                                            for document_id in current_ids.keys()-known_ids])
+            fresh_df=pd.concat(fresh_frames,ignore_index=True)
+
+            kept=~snapshot_df[SNAPSHOT_ID_COLUMN].isin(set(fresh_df[SNAPSHOT_ID_COLUMN]))
+            if current_ids is not None:
+                kept&=snapshot_df[SNAPSHOT_ID_COLUMN].isin(current_ids.keys())
+            logging.info(f"Snapshot of {len(snapshot_df)} rows: {len(snapshot_df)-int(kept.sum())} changed or deleted, "
+                         f"{len(fresh_df)} new or changed documents fetched")
+            if not len(fresh_df):
+                return snapshot_df[kept].reset_index(drop=True)
+            return pd.concat([snapshot_df[kept],fresh_df],ignore_index=True)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def export_collection_as_dataframe(self):
+        try:
+            collection=self.get_collection()
+            updated_at_field=self.data_ingestion_config.updated_at_field
+            # the next run re-fetches from here: this run's start, less the lookback, in naive UTC like Mongo's dates
+            updated_at_mark=datetime.now(timezone.utc).replace(tzinfo=None)-timedelta(
+                seconds=self.data_ingestion_config.updated_at_lookback_seconds)
+            if self.data_ingestion_config.backfill_updated_at:
+                self.backfill_updated_at(collection)
+
+            snapshot_df,snapshot_state=self.read_snapshot()
+            if snapshot_df is not None:
+                untracked=collection.count_documents({updated_at_field:{"$exists":False}})
+                if untracked:
+                    # new ones are still found through the document count, edits to them are not
+                    logging.info(f"{untracked} documents have no {updated_at_field}, edits to them are not picked up")
+                df=self.update_snapshot(collection,snapshot_df,snapshot_state)
+            else:
+                df=self.fetch_documents_as_dataframe(collection,{},with_ids=True)
+                logging.info(f"Fetched the full collection (no usable snapshot): {len(df)} documents")
+
+            # rows in _id order with dtypes fixed by their values, so the same documents give the same frame
+            # (and the same stage cache fingerprint) whichever way they were fetched
+            df=df.sort_values(SNAPSHOT_ID_COLUMN,kind="stable",ignore_index=True)
+            self.write_snapshot(df,updated_at_mark)
+            return compact_dataframe(df.drop(columns=SNAPSHOT_ID_COLUMN))
 
         except Exception as e:
             raise NetworkSecurityException(e,sys)
     
+    @profiled("feature_store")
     def export_data_into_feature_store(self,dataframe:pd.DataFrame):
         try:
             feature_store_file_path=self.data_ingestion_config.feature_store_file_path
             # Creating a folder
-            dir_path=os.path.dirname(feature_store_file_path)
-            os.makedirs(dir_path,exist_ok=True)
-            dataframe.to_csv(feature_store_file_path,index=False,header=True)
+            dataframe=compact_dataframe(dataframe)
+            save_dataframe(feature_store_file_path,dataframe,export_csv=ARTIFACT_EXPORT_CSV)
             return dataframe
         except Exception as e:
             raise NetworkSecurityException(e,sys)
 
+    @profiled("train_test_split")
     def split_data_as_train_test(self,dataframe:pd.DataFrame):
         try:
             train_set,test_set=train_test_split(
@@ -62,26 +206,20 @@ class DataIngestion:
                 "Exited split_data_as_train_test method of Data_Ingestion class"
             )
 
-            dir_path=os.path.dirname(self.data_ingestion_config.training_file_path)
-            os.makedirs(dir_path,exist_ok=True)
             logging.info(f"Exporting train and test file path,")
 
-            train_set.to_csv(
-                self.data_ingestion_config.training_file_path,index=False,header=True
-            )
-
-            test_set.to_csv(
-                self.data_ingestion_config.testing_file_path,index=False,header=True
-            )
+            save_dataframe(self.data_ingestion_config.training_file_path,train_set,export_csv=ARTIFACT_EXPORT_CSV)
+            save_dataframe(self.data_ingestion_config.testing_file_path,test_set,export_csv=ARTIFACT_EXPORT_CSV)
             logging.info(f"Exporting train and test file path,")
 
         except Exception as e:
             raise NetworkSecurityException(e,sys)
 
 
-    def initiate_data_ingestion(self):
+    def initiate_data_ingestion(self,dataframe:pd.DataFrame=None):
         try:
-            dataframe=self.export_collection_as_dataframe()
+            if dataframe is None:
+                dataframe=self.export_collection_as_dataframe()
             dataframe=self.export_data_into_feature_store(dataframe)
             self.split_data_as_train_test(dataframe)
             dataingestionartifact=DataIngestionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
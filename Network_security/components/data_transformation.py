@@ -1,7 +1,6 @@
 import sys,os
 import numpy as np
 import pandas as pd
-from sklearn.impute import KNNImputer
 from sklearn.pipeline import Pipeline
 from Network_security.logging.logger import logging
 from Network_security.exception.exception import NetworkSecurityException
@@ -9,7 +8,10 @@ from Network_security.constants.training_pipeline import TARGET_COLUMN
 from Network_security.constants.training_pipeline import DATA_TRANSFORMATION_IMPUTER_PARAMS
 from Network_security.entity.artifact_entity import DataTransformationArtifact,DataValidationArtifact
 from Network_security.entity.config_entity import DataTransformationConfig
-from Network_security.utils.main_utils.utils import save_numpy_array,save_object
+from Network_security.utils.main_utils.utils import save_numpy_array,save_object,load_dataframe
+from Network_security.utils.ml_utils.preprocessing.imputer import FastKNNImputer
+from Network_security.utils.ml_utils.preprocessing.ternary import compact_features
+from Network_security.utils.ml_utils.tracking.profiler import profile_span
 
 class DataTransformation:
     def __init__(self,data_validation_artifact:DataValidationArtifact,
@@ -23,15 +25,15 @@ class DataTransformation:
     @staticmethod
     def read_data(file_path)->pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return load_dataframe(file_path)
         except Exception as e:
             raise NetworkSecurityException(e,sys)
         
     def get_data_transformer_object(cls)->Pipeline:
         logging.info("Entered get_data_transformer_object method of DataTransformation class")
         try:
-            imputer:KNNImputer=KNNImputer(**DATA_TRANSFORMATION_IMPUTER_PARAMS)
-            logging.info("initialize KNNImputer with {DATA_TRANSFORMATION_IMPUTER_PARAMS}")
+            imputer:FastKNNImputer=FastKNNImputer(**DATA_TRANSFORMATION_IMPUTER_PARAMS)
+            logging.info(f"initialize FastKNNImputer with {DATA_TRANSFORMATION_IMPUTER_PARAMS}")
             processor:Pipeline=Pipeline([("imputer",imputer)])
             return processor
         except Exception as e:
@@ -54,24 +56,31 @@ class DataTransformation:
 
             preprocessor=self.get_data_transformer_object()
 
-            preprocessor_object=preprocessor.fit(input_feature_train_df)
-            transformed_input_train_feature=preprocessor_object.transform(input_feature_train_df)
-            transformed_input_test_feature=preprocessor_object.transform(input_feature_test_df)
+            with profile_span("imputer_fit",rows=len(input_feature_train_df)):
+                preprocessor_object=preprocessor.fit(input_feature_train_df)
+            with profile_span("imputer_transform",rows=len(input_feature_train_df)+len(input_feature_test_df)):
+                transformed_input_train_feature=preprocessor_object.transform(input_feature_train_df)
+                transformed_input_test_feature=preprocessor_object.transform(input_feature_test_df)
 
-            train_arr=np.c_[transformed_input_train_feature,np.array(target_feature_train_df)]
-            test_arr=np.c_[transformed_input_test_feature,np.array(target_feature_test_df)]
-
-            save_numpy_array(self.data_transforamtion_config.transformed_train_file_path,array=train_arr)
-            save_numpy_array(self.data_transforamtion_config.transformed_test_file_path,array=test_arr)
+            # features and target are kept apart so the trainer can memory map them without slicing copies;
+            # features are stored as int8 codes unless imputation left fractional values (then float32),
+            # and the 0/1 target fits in int8
+            save_numpy_array(self.data_transforamtion_config.transformed_train_file_path,
+                             array=np.ascontiguousarray(compact_features(transformed_input_train_feature)))
+            save_numpy_array(self.data_transforamtion_config.transformed_test_file_path,
+                             array=np.ascontiguousarray(compact_features(transformed_input_test_feature)))
+            save_numpy_array(self.data_transforamtion_config.transformed_train_target_file_path,
+                             array=target_feature_train_df.to_numpy(dtype=np.int8))
+            save_numpy_array(self.data_transforamtion_config.transformed_test_target_file_path,
+                             array=target_feature_test_df.to_numpy(dtype=np.int8))
             save_object(self.data_transforamtion_config.transformed_object_file_path,preprocessor_object)
 
-            save_object("final_model/preprocessor.pkl",preprocessor_object)
-
-
             data_transformation_artifact=DataTransformationArtifact(
                 transformed_object_file_path=self.data_transforamtion_config.transformed_object_file_path,
                 transformed_train_file_path=self.data_transforamtion_config.transformed_train_file_path,
-                transformed_test_file_path=self.data_transforamtion_config.transformed_test_file_path
+                transformed_test_file_path=self.data_transforamtion_config.transformed_test_file_path,
+                transformed_train_target_file_path=self.data_transforamtion_config.transformed_train_target_file_path,
+                transformed_test_target_file_path=self.data_transforamtion_config.transformed_test_target_file_path
             )
             return data_transformation_artifact
 
@@ -1,13 +1,15 @@
-from Network_security.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact
+from Network_security.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DriftReportArtifact
 from Network_security.entity.config_entity import DataValidationConfig
 
 from Network_security.logging.logger import logging
 from Network_security.exception.exception import NetworkSecurityException
-from Network_security.constants.training_pipeline import SCHEMA_FILE_PATH
-from scipy.stats import ks_2samp
+from Network_security.constants.training_pipeline import SCHEMA_FILE_PATH,ARTIFACT_EXPORT_CSV
+from Network_security.utils.ml_utils.metric.drift_report import get_drift_report
 import pandas as pd
 import os, sys
-from Network_security.utils.main_utils.utils import read_yaml_file,write_yaml_file
+from Network_security.utils.main_utils.utils import read_yaml_file,write_yaml_file,load_dataframe,save_dataframe
+from Network_security.utils.main_utils.schema import SchemaValidator
+from Network_security.utils.ml_utils.tracking.profiler import profiled
 
 class DataValidation:
     def __init__(self,data_ingestion_artifact:DataIngestionArtifact,
@@ -16,74 +18,63 @@ class DataValidation:
             self.data_ingestion_artifact=data_ingestion_artifact
             self.data_validation_config=data_validation_config
             self.schema_config=read_yaml_file(SCHEMA_FILE_PATH)
+            self.schema_validator=SchemaValidator(SCHEMA_FILE_PATH)
         except Exception as e:
             raise NetworkSecurityException(e,sys)
         
     @staticmethod
     def read_data(file_path)->pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return load_dataframe(file_path)
         except Exception as e:
             raise NetworkSecurityException(e,sys)
 
-    def validate_number_of_columns(self,dataframe:pd.DataFrame)->bool:
+    @profiled("schema_check")
+    def validate_dataframe(self,dataframe:pd.DataFrame,name:str)->list:
         try:
-            number_of_columns=len(self.schema_config['columns'])
-            logging.info(f"Required no of columns:{number_of_columns}")
-            logging.info(f"Data frame columns:{len(dataframe.columns)}")
-            if len(dataframe.columns)==number_of_columns:
-                return True
-            return False
+            # every structural problem is reported, none overwrites another
+            errors=[f"{name} dataframe: {error}" for error in self.schema_validator.check_structure(dataframe)]
+            logging.info(f"Schema check of {name} dataframe: {len(errors)} problems")
+            return errors
         except Exception as e:
             raise NetworkSecurityException(e,sys)
-        
-    def validate_number_of_numerical_columns(self,dataframe:pd.DataFrame)->bool:
+
+    @profiled("split_valid_rows")
+    def split_valid_rows(self,dataframe:pd.DataFrame,name:str,invalid_file_path:str):
+        # rows with values outside the schema's domain go to the invalid path, which stays None when there are none
         try:
-            num_col_list=[]
-            for i in dataframe.columns:
-                if dataframe[i].dtype=='int64':
-                        num_col_list.append(i)
-                        
-            number_of_numerical_columns=len(self.schema_config['numerical_columns'])
-            logging.info(f"Required no of numerical columns:{number_of_numerical_columns}")
-            logging.info(f"Data frame numerical columns:{len(num_col_list)}")
-            if len(num_col_list)==number_of_numerical_columns:
-                return True
-            return False
+            valid_dataframe,invalid_dataframe,invalid_columns=self.schema_validator.split_rows(dataframe)
+            if not len(invalid_dataframe):
+                return valid_dataframe,None
+            logging.info(f"{len(invalid_dataframe)} invalid {name} rows, invalid values per column: {invalid_columns}")
+            save_dataframe(invalid_file_path,invalid_dataframe,export_csv=ARTIFACT_EXPORT_CSV)
+            return valid_dataframe,invalid_file_path
         except Exception as e:
             raise NetworkSecurityException(e,sys)
-    
-    def detect_database_drift(self,base_df,current_df,thresold=0.05)->0.05:
-        try:
-            status=True
-            report={}
-            for column in base_df.columns:
-                d1=base_df[column]
-                d2=current_df[column]
-                is_same_dist=ks_2samp(d1,d2)
-                if thresold<=is_same_dist.pvalue:
-                    is_found=False
-                else:
-                    is_found=True
-                    status=False
-
-                report.update({column:{
-                           'p_value':float(is_same_dist.pvalue),
-                            'drift_status':is_found
-                            }})
-                
-                drift_report_file_path=self.data_validation_config.drift_report_file_path
-                dir_path=os.path.dirname(drift_report_file_path)
-                os.makedirs(dir_path,exist_ok=True)
-                write_yaml_file(file_path=drift_report_file_path,content=report)
 
+    @profiled("drift")
+    def detect_database_drift(self,base_df,current_df,thresold=None)->DriftReportArtifact:
+        try:
+            drift_report=get_drift_report(
+                base_df=base_df,current_df=current_df,
+                method=self.data_validation_config.drift_method,
+                thresold=self.data_validation_config.drift_thresold if thresold is None else thresold,
+                psi_thresold=self.data_validation_config.psi_thresold,
+                max_categories=self.data_validation_config.drift_max_categories,
+                n_jobs=self.data_validation_config.drift_n_jobs,
+            )
+            logging.info(f"Drift check with {drift_report.method}: drifted columns {drift_report.drifted_columns}")
+
+            # written once, after every column has been scored
+            write_yaml_file(file_path=self.data_validation_config.drift_report_file_path,content={
+                'drift_found':drift_report.drift_found,
+                'drifted_columns':drift_report.drifted_columns,
+                'columns':drift_report.column_report,
+            })
+            return drift_report
         except Exception as e:
             raise NetworkSecurityException(e,sys)
 
-
-
-
-
     def initiate_data_validation(self)->DataValidationArtifact:
         try:
             train_file_path=self.data_ingestion_artifact.trained_file_path
@@ -92,36 +83,28 @@ class DataValidation:
             train_dataframe=DataValidation.read_data(train_file_path)
             test_dataframe=DataValidation.read_data(test_file_path)
 
-            status=self.validate_number_of_columns(dataframe=train_dataframe)
-            if not status:
-                error_message=f"Train dataframe does not contain all columns. \n"
-
-            status=self.validate_number_of_columns(dataframe=test_dataframe)
-            if not status:
-                error_message=f"Test dataframe does not contain all columns. \n"
-
-            status=self.validate_number_of_numerical_columns(dataframe=train_dataframe)
-            if not status:
-                error_message=f"Train dataframe does not contain same numbers of numerical columns. \n"
-
-            status=self.validate_number_of_numerical_columns(dataframe=test_dataframe)
-            if not status:
-                error_message=f"Test dataframe does not contain same numbers of numerical columns. \n"
+            error_message=self.validate_dataframe(train_dataframe,"Train")+self.validate_dataframe(test_dataframe,"Test")
+            if error_message:
+                raise Exception("Schema validation failed: "+"; ".join(error_message))
 
-            status=self.detect_database_drift(base_df=train_dataframe,current_df=test_dataframe)
-            dir_path=os.path.dirname(self.data_validation_config.valid_train_file_path)
-            os.makedirs(dir_path,exist_ok=True)
+            train_dataframe,invalid_train_file_path=self.split_valid_rows(
+                train_dataframe,"train",self.data_validation_config.invalid_train_file_path)
+            test_dataframe,invalid_test_file_path=self.split_valid_rows(
+                test_dataframe,"test",self.data_validation_config.invalid_test_file_path)
 
-            train_dataframe.to_csv(self.data_validation_config.valid_train_file_path,index=False,header=True)
-            test_dataframe.to_csv(self.data_validation_config.valid_test_file_path,index=False,header=True)
+            drift_report=self.detect_database_drift(base_df=train_dataframe,current_df=test_dataframe)
+            status=not drift_report.drift_found
+            save_dataframe(self.data_validation_config.valid_train_file_path,train_dataframe,export_csv=ARTIFACT_EXPORT_CSV)
+            save_dataframe(self.data_validation_config.valid_test_file_path,test_dataframe,export_csv=ARTIFACT_EXPORT_CSV)
 
             data_validation_artifact = DataValidationArtifact(
                 validation_status=status,
-                valid_train_file_path=self.data_ingestion_artifact.trained_file_path,
-                valid_test_file_path=self.data_ingestion_artifact.test_file_path,
-                invalid_train_file_path=None,
-                invalid_test_file_path=None,
+                valid_train_file_path=self.data_validation_config.valid_train_file_path,
+                valid_test_file_path=self.data_validation_config.valid_test_file_path,
+                invalid_train_file_path=invalid_train_file_path,
+                invalid_test_file_path=invalid_test_file_path,
                 drift_report_file_path=self.data_validation_config.drift_report_file_path,
+                drifted_columns=drift_report.drifted_columns,
             )
             return data_validation_artifact
         except Exception as e:
@@ -1,40 +1,66 @@
 import os,sys
+import math
+import shutil
+import time
+from dataclasses import asdict
 from Network_security.exception.exception import NetworkSecurityException
 from Network_security.logging.logger import logging
 from Network_security.entity.config_entity import ModelTrainerConfig
 from Network_security.entity.artifact_entity import DataTransformationArtifact,ModelTrainerArtifact
-from Network_security.utils.main_utils.utils import save_object,load_object,load_numpy_array,evaluate_models
+from Network_security.utils.main_utils.utils import (
+    load_object,load_numpy_array,evaluate_models,read_yaml_file,compute_file_hash,compute_object_hash
+)
+from Network_security.utils.main_utils.schema import FeatureSchema
+from Network_security.constants.training_pipeline import SCHEMA_FILE_PATH,TARGET_COLUMN,MODEL_BUNDLE_MANIFEST_FILE_NAME
 from Network_security.utils.ml_utils.metric.classification_report import get_classification_score
 from Network_security.utils.ml_utils.model.estimator import NetworkModel
+from Network_security.utils.ml_utils.model.compiled_tree import compile_tree_model,check_parity
+from Network_security.utils.ml_utils.model.bundle import save_model_bundle,publish_model_bundle
+from Network_security.utils.ml_utils.model.streaming import TRAINING_MODES,TernaryCategoricalNB,train_streaming_models
+from Network_security.utils.ml_utils.tracking.experiment_tracker import ExperimentTracker
+from Network_security.utils.ml_utils.tracking.profiler import profiled
 
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression,SGDClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.ensemble import RandomForestClassifier,AdaBoostClassifier,GradientBoostingClassifier
-import mlflow
 
 
 
 class ModelTrainer:
-    def __init__(self,model_trainer_config:ModelTrainerConfig,data_transforamtion_artifact:DataTransformationArtifact):
+    def __init__(self,model_trainer_config:ModelTrainerConfig,data_transforamtion_artifact:DataTransformationArtifact,
+                 experiment_tracker:ExperimentTracker=None):
         try:
             self.model_trainer_config=model_trainer_config
             self.data_transforamtion_artifact=data_transforamtion_artifact
+            # the training pipeline passes its own tracker so stages and models share one mlflow run
+            self.experiment_tracker=experiment_tracker
         except Exception as e:
             raise NetworkSecurityException(e,sys)
     
-    def track_mlflow(self,best_model,classification_train_metric):
-        with mlflow.start_run():
-            f1_score=classification_train_metric.f1_score
-            precision_score=classification_train_metric.precision_score
-            recall_score=classification_train_metric.recall_score
-
-            mlflow.log_metric("f1_score",f1_score)
-            mlflow.log_metric("precision_score",precision_score)
-            mlflow.log_metric("recall_score",recall_score)
-            mlflow.sklearn.log_model(best_model,"model")
-
-    def train_model(self,x_train,y_train,x_test,y_test):
+    @profiled("mlflow_logging")
+    def track_mlflow(self,best_model_name:str,search_results:dict,classification_train_metric,
+                     classification_test_metric,search_seconds:float,y_train,y_test):
+        tracker=self.experiment_tracker
+        best_result=search_results[best_model_name]
+        tracker.log_params({"champion_model":best_model_name,"training_mode":self.model_trainer_config.training_mode,
+                            **{f"champion.{key}":value for key,value in best_result.best_params.items()},
+                            **{key:value for key,value in vars(self.model_trainer_config).items() if key.startswith("search_")}})
+        tracker.log_metrics({"search_seconds":search_seconds,
+                             **{f"train_{key}":value for key,value in asdict(classification_train_metric).items()},
+                             **{f"test_{key}":value for key,value in asdict(classification_test_metric).items()}})
+        # every family's finalist gets a nested run, so candidates can be compared under the parent
+        for model_name,search_result in search_results.items():
+            run_id=tracker.start_child_run(model_name,tags={"champion":str(model_name==best_model_name)})
+            tracker.log_params({"n_candidates":search_result.n_candidates,**search_result.best_params},run_id=run_id)
+            test_metric=get_classification_score(y_true=y_test,y_pred=search_result.test_predictions)
+            tracker.log_metrics({"cv_score":None if math.isnan(search_result.best_score) else search_result.best_score,
+                                 "train_score":search_result.train_score,"test_score":search_result.test_score,
+                                 **{f"test_{key}":value for key,value in asdict(test_metric).items()}},run_id=run_id)
+        # serialised and uploaded on a background thread while the bundles are written
+        tracker.log_model_async(best_result.best_estimator)
+
+    def get_model_candidates(self):
         models={
             "Random Forest":RandomForestClassifier(verbose=1),
             "Decision Tree":DecisionTreeClassifier(),
@@ -68,62 +94,152 @@ class ModelTrainer:
                 'n_estimators': [8,16,32,64,128,256]
             }
         }
-        model_report:dict=evaluate_models(x_train=x_train,y_train=y_train,x_test=x_test,y_test=y_test,
-                                          models=models,param=params)
+        return models,params
 
+    def get_streaming_model_candidates(self):
+        # models that can learn one chunk at a time; the forest grows n_estimators trees per chunk
+        models={
+            "SGD Logistic Regression":SGDClassifier(loss="log_loss",random_state=42),
+            "Naive Bayes":TernaryCategoricalNB(),
+            "Random Forest":RandomForestClassifier(n_estimators=16,warm_start=True,n_jobs=-1,random_state=42),
+        }
+        return models
+
+    def search_models(self,x_train,y_train,x_test,y_test)->dict:
+        if self.model_trainer_config.training_mode=="streaming":
+            return train_streaming_models(self.get_streaming_model_candidates(),x_train,y_train,x_test,y_test,
+                                          chunk_size=self.model_trainer_config.streaming_chunk_size,
+                                          epochs=self.model_trainer_config.streaming_epochs)
+        models,params=self.get_model_candidates()
+        return evaluate_models(x_train=x_train,y_train=y_train,x_test=x_test,y_test=y_test,
+                               models=models,param=params,
+                               cv=self.model_trainer_config.search_cv,
+                               n_jobs=self.model_trainer_config.search_n_jobs,
+                               strategy=self.model_trainer_config.search_strategy,
+                               factor=self.model_trainer_config.search_halving_factor,
+                               max_fits=self.model_trainer_config.search_max_fits,
+                               max_seconds=self.model_trainer_config.search_max_seconds)
+
+    @profiled("publish_final_model")
+    def publish_final_model(self,bundle_dir:str)->str:
+        # preprocessor, model and compiled model travel together in one bundle, and serving
+        # switches over only when LATEST is flipped to it
+        return publish_model_bundle(bundle_dir,self.model_trainer_config.final_model_dir)
+
+    def save_trained_model(self,bundle_dir:str,network_model:NetworkModel,model_name:str,search_result,
+                           train_metric,test_metric)->dict:
+        objects={"preprocessor":network_model.preprocessor,"model":network_model.model}
+        compiled_model=self.compile_model(network_model.model)
+        if compiled_model is not None:
+            objects["compiled_model"]=compiled_model
+        schema_config=read_yaml_file(SCHEMA_FILE_PATH)
+        manifest={
+            "model_name":model_name,
+            "model_class":type(network_model.model).__name__,
+            "params":search_result.best_params,
+            # families with a single candidate skip cross validation and have no cv score
+            "cv_score":None if math.isnan(search_result.best_score) else search_result.best_score,
+            "target_column":TARGET_COLUMN,
+            "feature_columns":FeatureSchema().feature_columns,
+            "schema":{name:dtype for column in schema_config["columns"] for name,dtype in column.items()},
+            "metrics":{"train":asdict(train_metric),"test":asdict(test_metric)},
+            "training_data_hash":compute_object_hash([
+                compute_file_hash(self.data_transforamtion_artifact.transformed_train_file_path),
+                compute_file_hash(self.data_transforamtion_artifact.transformed_train_target_file_path),
+            ]),
+        }
+        return save_model_bundle(bundle_dir,objects,manifest)
+
+    @profiled("save_finalists")
+    def save_finalists(self,preprocessor,search_results:dict,y_train,y_test)->dict:
+        # every family's refit winner is kept as its own bundle, so any of them can be published later
+        finalist_model_file_paths={}
+        for model_name,search_result in search_results.items():
+            bundle_dir=os.path.join(self.model_trainer_config.finalists_dir,model_name.lower().replace(" ","_"))
+            self.save_trained_model(bundle_dir,NetworkModel(preprocessor=preprocessor,model=search_result.best_estimator),
+                                    model_name,search_result,
+                                    get_classification_score(y_true=y_train,y_pred=search_result.train_predictions),
+                                    get_classification_score(y_true=y_test,y_pred=search_result.test_predictions))
+            finalist_model_file_paths[model_name]=os.path.join(bundle_dir,MODEL_BUNDLE_MANIFEST_FILE_NAME)
+        return finalist_model_file_paths
+
+    @profiled("compile_model")
+    def compile_model(self,model):
+        # flattened copy of a tree ensemble, only kept if it reproduces the sklearn model on the test set
+        if not self.model_trainer_config.compile_model:
+            return None
+        compiled_model=compile_tree_model(model)
+        if compiled_model is None:
+            return None
+        x_test=load_numpy_array(self.data_transforamtion_artifact.transformed_test_file_path,mmap_mode='r')
+        if not check_parity(model,compiled_model,x_test):
+            logging.info("Compiled model does not match the sklearn model, publishing the sklearn model only")
+            return None
+        return compiled_model
 
-        best_model_score=max(sorted(model_report.values()))
-        best_model_name=list(model_report.keys())[
-            list(model_report.values()).index(best_model_score)
-        ]
-        best_model=models[best_model_name]
-        
-        y_train_pred=best_model.predict(x_train)
-        classification_train_metric=get_classification_score(y_true=y_train,y_pred=y_train_pred)
+    def train_model(self,x_train,y_train,x_test,y_test):
+        if self.model_trainer_config.training_mode not in TRAINING_MODES:
+            raise ValueError(f"training_mode must be one of {TRAINING_MODES}, got {self.model_trainer_config.training_mode!r}")
+        search_start=time.perf_counter()
+        search_results:dict=self.search_models(x_train,y_train,x_test,y_test)
+        search_seconds=time.perf_counter()-search_start
+        best_model_name=max(search_results,key=lambda model_name:search_results[model_name].test_score)
+        best_result=search_results[best_model_name]
+
+        # predictions come back from the search workers, nothing is predicted twice
+        classification_train_metric=get_classification_score(y_true=y_train,y_pred=best_result.train_predictions)
+        classification_test_metric=get_classification_score(y_true=y_test,y_pred=best_result.test_predictions)
 
         # Track the mlflow
-        self.track_mlflow(best_model,classification_train_metric)
-
-
-        y_test_pred=best_model.predict(x_test)
-        classification_test_metric=get_classification_score(y_true=y_test,y_pred=y_test_pred)
-
-        self.track_mlflow(best_model,classification_test_metric)
+        self.track_mlflow(best_model_name,search_results,classification_train_metric,classification_test_metric,
+                          search_seconds,y_train,y_test)
 
         preprocessor=load_object(file_path=self.data_transforamtion_artifact.transformed_object_file_path)
 
-        model_dir_path=os.path.dirname(self.model_trainer_config.trained_model_file_path)
-        os.makedirs(model_dir_path,exist_ok=True)
-
-        Network_model=NetworkModel(preprocessor=preprocessor,model=best_model)
-        save_object(self.model_trainer_config.trained_model_file_path,obj=Network_model)
+        finalist_model_file_paths=self.save_finalists(preprocessor,search_results,y_train,y_test)
+        # the champion's bundle is its finalist bundle, copied to the run's trained_model directory
+        trained_model_bundle_dir=self.model_trainer_config.trained_model_bundle_dir
+        shutil.rmtree(trained_model_bundle_dir,ignore_errors=True)
+        shutil.copytree(os.path.dirname(finalist_model_file_paths[best_model_name]),trained_model_bundle_dir)
+        logging.info(f"Champion model: {best_model_name} with test score {best_result.test_score:.4f}")
 
-        save_object("final_model/model.pkl",best_model)
+        if self.model_trainer_config.promote_model:
+            self.publish_final_model(trained_model_bundle_dir)
 
 
         model_trainer_artifact=ModelTrainerArtifact(trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                              train_metric_artifact=classification_train_metric,
-                             test_metric_artifact=classification_test_metric)
+                             test_metric_artifact=classification_test_metric,
+                             finalist_model_file_paths=finalist_model_file_paths)
         
         logging.info(f"Model trainer artifact: {model_trainer_artifact}")
         return model_trainer_artifact
 
     def initiate_model_trainer(self)->ModelTrainerArtifact:
         try:
-            trainer_file_path=self.data_transforamtion_artifact.transformed_train_file_path
-            test_file_path=self.data_transforamtion_artifact.transformed_test_file_path
-            
-            train_arr=load_numpy_array(trainer_file_path)
-            test_arr=load_numpy_array(test_file_path)
-
+            # memory mapped, read-only: nothing is copied into RAM until an estimator touches the pages,
+            # and in streaming mode only one chunk at a time is
             x_train,y_train,x_test,y_test=(
-                train_arr[:,:-1],
-                train_arr[:,-1],
-                test_arr[:,:-1],
-                test_arr[:,-1]
+                load_numpy_array(self.data_transforamtion_artifact.transformed_train_file_path,mmap_mode='r'),
+                load_numpy_array(self.data_transforamtion_artifact.transformed_train_target_file_path,mmap_mode='r'),
+                load_numpy_array(self.data_transforamtion_artifact.transformed_test_file_path,mmap_mode='r'),
+                load_numpy_array(self.data_transforamtion_artifact.transformed_test_target_file_path,mmap_mode='r')
             )
 
-            model=self.train_model(x_train,y_train, x_test, y_test)
+            # run on its own (not from the training pipeline), the trainer opens and closes its own run
+            owns_run=self.experiment_tracker is None
+            if owns_run:
+                self.experiment_tracker=ExperimentTracker(enabled=self.model_trainer_config.track_mlflow)
+                self.experiment_tracker.start_run("model_trainer")
+            try:
+                model_trainer_artifact=self.train_model(x_train,y_train, x_test, y_test)
+            except Exception:
+                if owns_run:
+                    self.experiment_tracker.end_run(status="FAILED")
+                raise
+            if owns_run:
+                self.experiment_tracker.end_run()
+            return model_trainer_artifact
 
         except Exception as e:
             raise NetworkSecurityException(e,sys)
@@ -11,8 +11,16 @@ FILE_NAME:str="phisingData.csv"
 TRAIN_FILE_NAME:str="train.csv"
 TEST_FILE_NAME:str="test.csv"
 
+# frames passed between stages are stored as compactly typed Parquet, CSV copies are only written on request
+ARTIFACT_FILE_FORMAT:str="parquet"
+ARTIFACT_EXPORT_CSV:bool=False
+
 SCHEMA_FILE_PATH=os.path.join("data_schema","schema.yaml")
 
+# stage outputs are reused when a stage's inputs and config hash to a fingerprint seen before
+STAGE_CACHE_DIR_NAME:str="stage_cache"
+STAGE_CACHE_ENABLED:bool=True
+
 
 DATA_INGESTION_COLLECTION_NAME:str="Networkdata"
 DATA_INGESTION_DATABASE_NAME:str="KUNAL_AI"
@@ -20,6 +28,22 @@ DATA_INGESTION_DIR_NAME:str="data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR:str="feature_store"
 DATA_INGESTION_INGESTED_DIR:str="ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO:float=0.2
+DATA_INGESTION_BATCH_SIZE:int=10_000
+# local copy of the collection keyed by _id, so later runs only fetch documents added or changed since
+DATA_INGESTION_SNAPSHOT_DIR:str="snapshot"
+# change marker every writer sets on insert and on update. Each run re-fetches the documents stamped after the
+# previous run started, less the lookback, which covers writer clock skew and writes still in flight then
+DATA_INGESTION_UPDATED_AT_FIELD:str="updated_at"
+DATA_INGESTION_UPDATED_AT_LOOKBACK_SECONDS:float=300.0
+# documents loaded before the marker existed are stamped once with a date older than any run, so they count as
+# unchanged; turn off for a read-only Mongo user (edits to unstamped documents then go unnoticed)
+DATA_INGESTION_BACKFILL_UPDATED_AT:bool=True
+# push_data.py: the CSV is read in chunks and written in unordered insert_many batches by several workers
+DATA_INGESTION_LOAD_CHUNK_SIZE:int=100_000
+DATA_INGESTION_LOAD_BATCH_SIZE:int=5_000
+DATA_INGESTION_LOAD_N_WORKERS:int=4
+# upsert mode keys every document on its row hash plus how often that row appeared before, so reloading is a no-op
+DATA_INGESTION_ROW_KEY_FIELD:str="row_key"
 
 
 DATA_VALIDATION_DIR_NAME: str="data validation"
@@ -27,29 +51,124 @@ DATA_VALIDATION_VALID_DIR: str="validated"
 DATA_VALIDATION_INVALID_DIR: str="invalid"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str="drift_report"
 DATA_VALIDATION_DRIFT_REPORT_DIR_NAME: str="report.yaml"
+# the {-1,0,1} features are compared on value counts with "chi2" (p-value below the thresold means drift)
+# or "psi" (index above the psi thresold means drift); high cardinality columns fall back to KS
+DATA_VALIDATION_DRIFT_METHOD: str="chi2"
+DATA_VALIDATION_DRIFT_THRESOLD: float=0.05
+DATA_VALIDATION_PSI_THRESOLD: float=0.2
+DATA_VALIDATION_DRIFT_MAX_CATEGORIES: int=20
+DATA_VALIDATION_DRIFT_N_JOBS: int=-1
+# stop the training pipeline when the validation stage reports drift
+DATA_VALIDATION_FAIL_ON_DRIFT: bool=False
 PREPROCESSING_OBJECT_FILE_NAME="preprocessing.pkl"
 
 DATA_TRANSFORMATION_DIR_NAME:str="data transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR:str="transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR:str="transformed_object"
 # knn Imputer for nan values
+# mode "exact" reproduces sklearn's KNNImputer; "indexed" searches a deduplicated donor index instead,
+# which is faster but may pick different neighbours among equally close donors, so it is opt-in
 DATA_TRANSFORMATION_IMPUTER_PARAMS: dict={
     "missing_values":np.nan,
     "n_neighbors":3,
     "weights":"uniform",
+    "mode":"exact",
 }
 
 MODEL_TRAINER_DIR_NAME:str="model trainer"
 MODEL_TRAINER_TRAINED_MODEL_DIR:str="trained_model"
-MODEL_TRAINER_TRAINED_MODEL_NAME:str="model.pkl"
+MODEL_TRAINER_TRAINED_MODEL_NAME:str="manifest.json"
+MODEL_TRAINER_FINALISTS_DIR:str="finalists"
 MODEL_TRAINER_EXPECTED_SCORE:float=0.6
 MODEL_TRAINER_OVER_FITTING_UNDER_FITTING_THRESOLD:float=0.05
+# hyperparameter search: "grid" tries every candidate, "halving" runs successive halving on growing subsamples
+MODEL_TRAINER_SEARCH_STRATEGY:str="grid"
+MODEL_TRAINER_SEARCH_CV:int=3
+MODEL_TRAINER_SEARCH_N_JOBS:int=-1
+MODEL_TRAINER_SEARCH_HALVING_FACTOR:int=3
+# optional budget, None means unlimited
+MODEL_TRAINER_SEARCH_MAX_FITS=None
+MODEL_TRAINER_SEARCH_MAX_SECONDS=None
+# "streaming" trains partial_fit / warm-started models chunk by chunk from the memory mapped arrays, for
+# training sets larger than RAM; "batch" runs the in-memory model search
+MODEL_TRAINER_TRAINING_MODE:str="batch"
+MODEL_TRAINER_STREAMING_CHUNK_SIZE:int=100_000
+MODEL_TRAINER_STREAMING_EPOCHS:int=5
+# copy the trained model into final_model, where serving picks it up
+MODEL_TRAINER_PROMOTE_MODEL:bool=True
+# tree ensembles are also published flattened into numpy node arrays when they match sklearn's output
+MODEL_TRAINER_COMPILE_MODEL:bool=True
+# the flattened trees only win on small batches: benchmarks/run.py measured them 2x faster at 1-32 rows, even
+# at 100 and 1.3x, 2x and 5x slower at 200, 400 and 10k rows, so larger calls go to the sklearn model
+MODEL_COMPILED_MAX_ROWS:int=128
+# one mlflow run per training: metrics and params go in batches, the champion model is uploaded in the background
+MODEL_TRAINER_TRACK_MLFLOW:bool=True
+MLFLOW_EXPERIMENT_NAME:str="network_security"
+MLFLOW_MODEL_ARTIFACT_PATH:str="model"
 
 SAVED_MODEL_DIR=os.path.join("saved_models")
 MODEL_FILE_NAME="model.pkl"
 
+FINAL_MODEL_DIR:str="final_model"
+# plain pickles of an older final_model, still loaded when no bundle has been published
+FINAL_MODEL_FILE_NAME:str="model.pkl"
+FINAL_PREPROCESSOR_FILE_NAME:str="preprocessor.pkl"
+
+# models are saved as bundles: manifest.json, one pickle per object and arrays.bin with the large arrays
+MODEL_BUNDLE_FORMAT_VERSION:int=1
+MODEL_BUNDLE_MANIFEST_FILE_NAME:str="manifest.json"
+MODEL_BUNDLE_ARRAYS_FILE_NAME:str="arrays.bin"
+MODEL_BUNDLE_VERSIONS_DIR:str="versions"
+MODEL_BUNDLE_LATEST_FILE_NAME:str="LATEST"
+MODEL_BUNDLE_ARRAY_MIN_BYTES:int=1024
+MODEL_BUNDLE_KEEP_VERSIONS:int=5
+# how often the serving registry checks final_model for a newly trained model
+MODEL_REGISTRY_POLL_INTERVAL_SECONDS:float=5.0
+# /v1/score is for inline filters scoring a handful of URLs, larger jobs go through batch prediction
+SCORE_MAX_RECORDS:int=1000
+# concurrent scoring requests are coalesced into one model call per window or per max batch size (in rows)
+SCORE_BATCH_WINDOW_MS:float=2.0
+SCORE_MAX_BATCH_SIZE:int=256
+SCORE_BATCH_N_THREADS:int=1
+# feature vectors repeat a lot in live traffic, so scored rows are cached per model version
+PREDICTION_CACHE_ENABLED:bool=True
+PREDICTION_CACHE_MAX_SIZE:int=100_000
+PREDICTION_CACHE_TTL_SECONDS:float=3600.0
+# lookups and stores cost about 1us per row under the cache lock, so bigger requests (CSV uploads) skip the
+# cache instead of holding up the small inline ones; every /v1/score request still goes through it
+PREDICTION_CACHE_MAX_REQUEST_ROWS:int=SCORE_MAX_RECORDS
+# /metrics histogram buckets; requests are logged as JSON lines for this fraction of requests, errors always
+SERVING_LATENCY_BUCKETS_SECONDS:tuple=(0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+SERVING_SIZE_BUCKETS_BYTES:tuple=(256,1024,4096,16_384,65_536,262_144,1_048_576,4_194_304,16_777_216,67_108_864)
+SERVING_BATCH_ROWS_BUCKETS:tuple=(1,4,16,64,256,1024,4096,16_384,65_536)
+SERVING_LOG_SAMPLE_RATE:float=0.01
+
+# /train runs the pipeline in a separate, lower priority process so serving keeps its CPU share
+TRAINING_JOB_NICENESS:int=10
+TRAINING_JOB_HISTORY_SIZE:int=20
+# on shutdown a running job is asked to terminate, and killed if it has not exited after this long
+TRAINING_JOB_STOP_TIMEOUT_SECONDS:float=10.0
+
+# every training run writes profile/run_profile.json with the wall time, CPU time, peak memory and rows of each
+# stage and sub-step; "cprofile" or "sample" (a stack sampler, written as folded stacks) add a function profile
+TRAINING_PROFILE_DIR_NAME:str="profile"
+TRAINING_PROFILE_FILE_NAME:str="run_profile.json"
+TRAINING_PROFILE_CPROFILE_FILE_NAME:str="run_profile.prof"
+TRAINING_PROFILE_STACKS_FILE_NAME:str="run_profile.folded"
+TRAINING_PROFILE_MODE:str="off"
+TRAINING_PROFILE_SAMPLE_INTERVAL_SECONDS:float=0.005
+TRAINING_PROFILE_MEMORY_INTERVAL_SECONDS:float=0.05
+TRAINING_PROFILE_TOP_FUNCTIONS:int=30
+
 TRAINING_BUCKET_NAME="kunalawsbucketns"
 
+BATCH_PREDICTION_DIR_NAME:str="prediction_output"
+BATCH_PREDICTION_OUTPUT_FILE_NAME:str="batch_output.csv"
+BATCH_PREDICTION_CHUNK_SIZE:int=100_000
+BATCH_PREDICTION_OUTPUT_COLUMN:str="predicted_column"
+# 1 scores in-process, more than 1 scores chunks in a pool with one model loaded per worker
+BATCH_PREDICTION_N_WORKERS:int=1
+
 
 
 
@@ -1,9 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass,field
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path:str
     test_file_path:str
+    # timings of the run that produced it, filled in by the training pipeline
+    profile:dict=field(default=None,repr=False)
+
+@dataclass
+class DriftReportArtifact:
+    drift_found:bool
+    drifted_columns:list
+    method:str
+    column_report:dict
 
 @dataclass
 class DataValidationArtifact:
@@ -13,12 +22,17 @@ class DataValidationArtifact:
     invalid_train_file_path:str
     invalid_test_file_path:str
     drift_report_file_path:str
+    drifted_columns:list=None
+    profile:dict=field(default=None,repr=False)
 
 @dataclass
 class DataTransformationArtifact:
     transformed_object_file_path:str
     transformed_train_file_path:str
     transformed_test_file_path:str
+    transformed_train_target_file_path:str
+    transformed_test_target_file_path:str
+    profile:dict=field(default=None,repr=False)
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -30,4 +44,26 @@ class ClassificationMetricArtifact:
 class ModelTrainerArtifact:
     trained_model_file_path:str
     train_metric_artifact:ClassificationMetricArtifact
-    test_metric_artifact:ClassificationMetricArtifact
\ No newline at end of file
+    test_metric_artifact:ClassificationMetricArtifact
+    # model name -> manifest of that family's finalist bundle
+    finalist_model_file_paths:dict=None
+    profile:dict=field(default=None,repr=False)
+
+@dataclass
+class BatchPredictionArtifact:
+    output_file_path:str
+    rows_scored:int
+    elapsed_seconds:float
+    rows_per_second:float
+
+@dataclass
+class RunProfileArtifact:
+    run_profile_file_path:str
+    mode:str
+    wall_seconds:float
+    cpu_seconds:float
+    peak_rss_mb:float
+    # stage name -> the stage's timings with its sub-steps
+    stages:dict
+    cprofile_file_path:str=None
+    stacks_file_path:str=None
@@ -12,40 +12,62 @@ class TrainingPipelineConfig:
         self.pipeline_name=training_pipeline.PIPELINE_NAME 
         self.artifact_name=training_pipeline.ARTIFACT_DIR
         self.artifact_dir=os.path.join(self.artifact_name,timestamp)
-        self.model_dir=os.path.join("final_model")
+        self.model_dir=os.path.join(training_pipeline.FINAL_MODEL_DIR)
+        self.stage_cache_dir=os.path.join(self.artifact_name,training_pipeline.STAGE_CACHE_DIR_NAME)
         self.timestamp:str=timestamp
 
 
+def artifact_file_name(file_name:str)->str:
+    return file_name.replace("csv",training_pipeline.ARTIFACT_FILE_FORMAT)
+
+
 class DataIngestionConfig:
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
         self.data_ingestion_dir:str=os.path.join(
             training_pipeline_config.artifact_dir,training_pipeline.DATA_INGESTION_DIR_NAME 
         )
         self.feature_store_file_path:str=os.path.join(
-            self.data_ingestion_dir,training_pipeline.DATA_INGESTION_FEATURE_STORE_DIR,training_pipeline.FILE_NAME
+            self.data_ingestion_dir,training_pipeline.DATA_INGESTION_FEATURE_STORE_DIR,artifact_file_name(training_pipeline.FILE_NAME)
         )
         self.training_file_path:str=os.path.join(
-            self.data_ingestion_dir,training_pipeline.DATA_INGESTION_INGESTED_DIR,training_pipeline.TRAIN_FILE_NAME
+            self.data_ingestion_dir,training_pipeline.DATA_INGESTION_INGESTED_DIR,artifact_file_name(training_pipeline.TRAIN_FILE_NAME)
         )
         self.testing_file_path:str=os.path.join(
-            self.data_ingestion_dir,training_pipeline.DATA_INGESTION_INGESTED_DIR,training_pipeline.TEST_FILE_NAME
+            self.data_ingestion_dir,training_pipeline.DATA_INGESTION_INGESTED_DIR,artifact_file_name(training_pipeline.TEST_FILE_NAME)
         )
         self.train_test_split_ratio:float=training_pipeline.DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
         self.collection_name:str=training_pipeline.DATA_INGESTION_COLLECTION_NAME
         self.database_name:str=training_pipeline.DATA_INGESTION_DATABASE_NAME
+        self.batch_size:int=training_pipeline.DATA_INGESTION_BATCH_SIZE
+        self.updated_at_field:str=training_pipeline.DATA_INGESTION_UPDATED_AT_FIELD
+        self.updated_at_lookback_seconds:float=training_pipeline.DATA_INGESTION_UPDATED_AT_LOOKBACK_SECONDS
+        self.backfill_updated_at:bool=training_pipeline.DATA_INGESTION_BACKFILL_UPDATED_AT
+        snapshot_name=f"{self.database_name}_{self.collection_name}"
+        self.snapshot_file_path:str=os.path.join(
+            training_pipeline_config.artifact_name,training_pipeline.DATA_INGESTION_SNAPSHOT_DIR,f"{snapshot_name}.parquet"
+        )
+        self.snapshot_state_file_path:str=os.path.join(
+            training_pipeline_config.artifact_name,training_pipeline.DATA_INGESTION_SNAPSHOT_DIR,f"{snapshot_name}.yaml"
+        )
 
 class DataValidationConfig:
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
         self.data_validation_dir:str=os.path.join(training_pipeline_config.artifact_dir,training_pipeline.DATA_VALIDATION_DIR_NAME)
         self.valid_data_dir:str=os.path.join(self.data_validation_dir,training_pipeline.DATA_VALIDATION_VALID_DIR)
         self.invalid_data_dir:str=os.path.join(self.data_validation_dir,training_pipeline.DATA_VALIDATION_INVALID_DIR)
-        self.valid_train_file_path:str=os.path.join(self.valid_data_dir,training_pipeline.TRAIN_FILE_NAME)
-        self.valid_test_file_path:str=os.path.join(self.valid_data_dir,training_pipeline.TEST_FILE_NAME)
-        self.invalid_train_file_path:str=os.path.join(self.invalid_data_dir,training_pipeline.TRAIN_FILE_NAME)
-        self.invalid_test_file_path:str=os.path.join(self.invalid_data_dir,training_pipeline.TEST_FILE_NAME)
+        self.valid_train_file_path:str=os.path.join(self.valid_data_dir,artifact_file_name(training_pipeline.TRAIN_FILE_NAME))
+        self.valid_test_file_path:str=os.path.join(self.valid_data_dir,artifact_file_name(training_pipeline.TEST_FILE_NAME))
+        self.invalid_train_file_path:str=os.path.join(self.invalid_data_dir,artifact_file_name(training_pipeline.TRAIN_FILE_NAME))
+        self.invalid_test_file_path:str=os.path.join(self.invalid_data_dir,artifact_file_name(training_pipeline.TEST_FILE_NAME))
         self.drift_report_file_path:str=os.path.join(self.data_validation_dir,
                                                      training_pipeline.DATA_VALIDATION_DRIFT_REPORT_DIR,
                                                      training_pipeline.DATA_VALIDATION_DRIFT_REPORT_DIR_NAME)
+        self.drift_method:str=training_pipeline.DATA_VALIDATION_DRIFT_METHOD
+        self.drift_thresold:float=training_pipeline.DATA_VALIDATION_DRIFT_THRESOLD
+        self.psi_thresold:float=training_pipeline.DATA_VALIDATION_PSI_THRESOLD
+        self.drift_max_categories:int=training_pipeline.DATA_VALIDATION_DRIFT_MAX_CATEGORIES
+        self.drift_n_jobs:int=training_pipeline.DATA_VALIDATION_DRIFT_N_JOBS
+        self.fail_on_drift:bool=training_pipeline.DATA_VALIDATION_FAIL_ON_DRIFT
 
 class DataTransformationConfig:
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
@@ -54,6 +76,10 @@ class DataTransformationConfig:
             training_pipeline.TRAIN_FILE_NAME.replace("csv", "npy"))
         self.transformed_test_file_path: str = os.path.join(self.data_transformation_dir,  training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
             training_pipeline.TEST_FILE_NAME.replace("csv", "npy") )
+        self.transformed_train_target_file_path: str = os.path.join( self.data_transformation_dir,training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+            training_pipeline.TRAIN_FILE_NAME.replace(".csv", "_target.npy"))
+        self.transformed_test_target_file_path: str = os.path.join(self.data_transformation_dir,  training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+            training_pipeline.TEST_FILE_NAME.replace(".csv", "_target.npy") )
         self.transformed_object_file_path: str = os.path.join(self.data_transformation_dir, training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
             training_pipeline.PREPROCESSING_OBJECT_FILE_NAME)
 
@@ -62,10 +88,50 @@ class ModelTrainerConfig:
         self.model_trainer_config_dir=os.path.join(
             training_pipleline_config.artifact_dir,training_pipeline.MODEL_TRAINER_DIR_NAME
         )
+        self.trained_model_bundle_dir=os.path.join(
+            self.model_trainer_config_dir,training_pipeline.MODEL_TRAINER_TRAINED_MODEL_DIR
+        )
+        # the bundle's manifest, which is what identifies the trained model
         self.trained_model_file_path=os.path.join(
-            self.model_trainer_config_dir,training_pipeline.MODEL_TRAINER_TRAINED_MODEL_DIR,
-            training_pipeline.MODEL_TRAINER_TRAINED_MODEL_NAME
+            self.trained_model_bundle_dir,training_pipeline.MODEL_TRAINER_TRAINED_MODEL_NAME
         )
+        self.finalists_dir=os.path.join(self.model_trainer_config_dir,training_pipeline.MODEL_TRAINER_FINALISTS_DIR)
+        self.final_model_dir=training_pipleline_config.model_dir
         self.expected_accuracy:float=training_pipeline.MODEL_TRAINER_EXPECTED_SCORE
         self.overfitting_underfitting_thresold=training_pipeline.MODEL_TRAINER_OVER_FITTING_UNDER_FITTING_THRESOLD
+        self.search_strategy:str=training_pipeline.MODEL_TRAINER_SEARCH_STRATEGY
+        self.search_cv:int=training_pipeline.MODEL_TRAINER_SEARCH_CV
+        self.search_n_jobs:int=training_pipeline.MODEL_TRAINER_SEARCH_N_JOBS
+        self.search_halving_factor:int=training_pipeline.MODEL_TRAINER_SEARCH_HALVING_FACTOR
+        self.search_max_fits=training_pipeline.MODEL_TRAINER_SEARCH_MAX_FITS
+        self.search_max_seconds=training_pipeline.MODEL_TRAINER_SEARCH_MAX_SECONDS
+        self.training_mode:str=training_pipeline.MODEL_TRAINER_TRAINING_MODE
+        self.streaming_chunk_size:int=training_pipeline.MODEL_TRAINER_STREAMING_CHUNK_SIZE
+        self.streaming_epochs:int=training_pipeline.MODEL_TRAINER_STREAMING_EPOCHS
+        self.promote_model:bool=training_pipeline.MODEL_TRAINER_PROMOTE_MODEL
+        self.compile_model:bool=training_pipeline.MODEL_TRAINER_COMPILE_MODEL
+        self.track_mlflow:bool=training_pipeline.MODEL_TRAINER_TRACK_MLFLOW
+
+class RunProfileConfig:
+    def __init__(self,training_pipeline_config:TrainingPipelineConfig):
+        self.profile_dir:str=os.path.join(training_pipeline_config.artifact_dir,training_pipeline.TRAINING_PROFILE_DIR_NAME)
+        self.run_profile_file_path:str=os.path.join(self.profile_dir,training_pipeline.TRAINING_PROFILE_FILE_NAME)
+        self.cprofile_file_path:str=os.path.join(self.profile_dir,training_pipeline.TRAINING_PROFILE_CPROFILE_FILE_NAME)
+        self.stacks_file_path:str=os.path.join(self.profile_dir,training_pipeline.TRAINING_PROFILE_STACKS_FILE_NAME)
+        self.mode:str=training_pipeline.TRAINING_PROFILE_MODE
+        self.sample_interval:float=training_pipeline.TRAINING_PROFILE_SAMPLE_INTERVAL_SECONDS
+        self.memory_interval:float=training_pipeline.TRAINING_PROFILE_MEMORY_INTERVAL_SECONDS
+        self.top_functions:int=training_pipeline.TRAINING_PROFILE_TOP_FUNCTIONS
 
+class BatchPredictionConfig:
+    def __init__(self,input_file_path:str,output_file_path:str=None,model_dir:str=training_pipeline.FINAL_MODEL_DIR,
+                 chunk_size:int=training_pipeline.BATCH_PREDICTION_CHUNK_SIZE,
+                 n_workers:int=training_pipeline.BATCH_PREDICTION_N_WORKERS):
+        self.input_file_path:str=input_file_path
+        self.output_file_path:str=output_file_path or os.path.join(
+            training_pipeline.BATCH_PREDICTION_DIR_NAME,training_pipeline.BATCH_PREDICTION_OUTPUT_FILE_NAME
+        )
+        self.model_dir:str=model_dir
+        self.chunk_size:int=chunk_size
+        self.n_workers:int=n_workers
+        self.prediction_column:str=training_pipeline.BATCH_PREDICTION_OUTPUT_COLUMN
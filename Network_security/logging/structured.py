@@ -0,0 +1,20 @@
+import json
+import random
+import time
+
+from Network_security.logging.logger import logging
+
+
+# One JSON object per line in the regular log file, for a random sample_rate fraction of the calls.
+# Records passed with always=True (errors) are never dropped. Every record carries its sample_rate,
+# so counts taken from the log can be scaled back up.
+class SampledLogger:
+    def __init__(self,sample_rate:float,logger=logging):
+        self.sample_rate=sample_rate
+        self.logger=logger
+
+    def log(self,event:str,always:bool=False,**fields):
+        if not always and random.random()>=self.sample_rate:
+            return
+        record={"event":event,"ts":round(time.time(),3),"sample_rate":1.0 if always else self.sample_rate,**fields}
+        self.logger.info(json.dumps(record,default=str))
@@ -0,0 +1,153 @@
+import os,sys
+import argparse
+import multiprocessing
+import time
+from collections import deque
+import pandas as pd
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import FINAL_MODEL_DIR,BATCH_PREDICTION_CHUNK_SIZE,BATCH_PREDICTION_N_WORKERS
+from Network_security.entity.config_entity import BatchPredictionConfig
+from Network_security.entity.artifact_entity import BatchPredictionArtifact
+from Network_security.serving.model_registry import ModelRegistry
+from Network_security.utils.ml_utils.model.estimator import NetworkModel
+from Network_security.utils.main_utils.schema import SchemaValidator
+
+# set once per pool worker by _init_worker so the model is never pickled per task
+_worker_state=None
+
+
+def _init_worker(batch_prediction_config:BatchPredictionConfig):
+    global _worker_state
+    batch_prediction=BatchPrediction(batch_prediction_config)
+    _worker_state=(batch_prediction,batch_prediction.load_model())
+
+
+def _score_chunk_in_worker(chunk:pd.DataFrame)->pd.DataFrame:
+    batch_prediction,network_model=_worker_state
+    return batch_prediction.score_chunk(network_model,chunk)
+
+
+class BatchPrediction:
+    def __init__(self,batch_prediction_config:BatchPredictionConfig):
+        try:
+            self.batch_prediction_config=batch_prediction_config
+            self.schema_validator=SchemaValidator()
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def load_model(self)->NetworkModel:
+        try:
+            # whole chunks go through sklearn's compiled loops faster than through the flattened trees,
+            # which are tuned for the small batches of online scoring
+            model_registry=ModelRegistry(model_dir=self.batch_prediction_config.model_dir,poll_interval=0,
+                                         prefer_compiled=False)
+            model_registry.load()
+            return model_registry.get_model()
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def read_chunks(self):
+        try:
+            return pd.read_csv(self.batch_prediction_config.input_file_path,
+                               chunksize=self.batch_prediction_config.chunk_size)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def score_chunk(self,network_model:NetworkModel,chunk:pd.DataFrame)->pd.DataFrame:
+        try:
+            errors=self.schema_validator.check_structure(chunk,require_target=False,strict=False)
+            if errors:
+                raise Exception(f"Input does not match the schema: {'; '.join(errors)}")
+            # the file may have its columns in any order and extra ones (a labelled dump keeps its target),
+            # they all stay in the output but the model only ever sees the feature columns in schema order
+            features=chunk[self.schema_validator.feature_columns]
+            self.schema_validator.check_features(features.to_numpy(dtype="float64"))
+            chunk[self.batch_prediction_config.prediction_column]=network_model.predict(features)
+            return chunk
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def score_chunks_in_pool(self,chunks):
+        try:
+            n_workers=self.batch_prediction_config.n_workers
+            with multiprocessing.Pool(processes=n_workers,initializer=_init_worker,
+                                      initargs=(self.batch_prediction_config,)) as pool:
+                # a bounded window of in-flight chunks keeps memory flat, and results are
+                # yielded strictly in submission order so the output keeps the input order
+                in_flight=deque()
+                for chunk in chunks:
+                    in_flight.append(pool.apply_async(_score_chunk_in_worker,(chunk,)))
+                    if len(in_flight)>=2*n_workers:
+                        yield in_flight.popleft().get()
+                while in_flight:
+                    yield in_flight.popleft().get()
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def write_scored_chunks(self,scored_chunks)->int:
+        try:
+            output_file_path=self.batch_prediction_config.output_file_path
+            dir_path=os.path.dirname(output_file_path)
+            if dir_path:
+                os.makedirs(dir_path,exist_ok=True)
+
+            # only a completely scored file is ever visible at the output path
+            tmp_file_path=f"{output_file_path}.tmp"
+            rows_scored=0
+            start=time.perf_counter()
+            with open(tmp_file_path,"w",newline="") as file_obj:
+                for chunk_number,chunk in enumerate(scored_chunks):
+                    chunk.to_csv(file_obj,index=False,header=chunk_number==0)
+                    rows_scored+=len(chunk)
+                    elapsed=time.perf_counter()-start
+                    logging.info(f"Scored chunk {chunk_number}: {rows_scored} rows, "
+                                 f"{rows_scored/max(elapsed,1e-9):.0f} rows/sec")
+            os.replace(tmp_file_path,output_file_path)
+            return rows_scored
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def initiate_batch_prediction(self)->BatchPredictionArtifact:
+        try:
+            logging.info(f"Starting batch prediction for {self.batch_prediction_config.input_file_path}")
+            start=time.perf_counter()
+            if self.batch_prediction_config.n_workers>1:
+                scored_chunks=self.score_chunks_in_pool(self.read_chunks())
+            else:
+                network_model=self.load_model()
+                scored_chunks=(self.score_chunk(network_model,chunk) for chunk in self.read_chunks())
+            rows_scored=self.write_scored_chunks(scored_chunks)
+            elapsed_seconds=time.perf_counter()-start
+
+            batch_prediction_artifact=BatchPredictionArtifact(
+                output_file_path=self.batch_prediction_config.output_file_path,
+                rows_scored=rows_scored,
+                elapsed_seconds=elapsed_seconds,
+                rows_per_second=rows_scored/max(elapsed_seconds,1e-9),
+            )
+            logging.info(f"Batch prediction completed and artifact: {batch_prediction_artifact}")
+            return batch_prediction_artifact
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description="Score a CSV of URL features chunk by chunk")
+    parser.add_argument("input_file_path")
+    parser.add_argument("-o","--output",dest="output_file_path",default=None)
+    parser.add_argument("--model-dir",default=FINAL_MODEL_DIR)
+    parser.add_argument("--chunk-size",type=int,default=BATCH_PREDICTION_CHUNK_SIZE)
+    parser.add_argument("--workers",type=int,default=BATCH_PREDICTION_N_WORKERS)
+    args=parser.parse_args()
+    try:
+        batch_prediction_config=BatchPredictionConfig(input_file_path=args.input_file_path,
+                                                      output_file_path=args.output_file_path,
+                                                      model_dir=args.model_dir,
+                                                      chunk_size=args.chunk_size,
+                                                      n_workers=args.workers)
+        batch_prediction_artifact=BatchPrediction(batch_prediction_config).initiate_batch_prediction()
+        print(batch_prediction_artifact)
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
@@ -0,0 +1,48 @@
+import os,sys
+from dataclasses import fields,is_dataclass
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.utils.main_utils.utils import save_object,load_object
+
+
+# Stores the artifact each pipeline stage returned, keyed by a fingerprint of that stage's inputs and config.
+# A stage whose fingerprint is already cached (and whose files are still on disk) is skipped, which is also
+# what lets a failed run resume: the stages that completed before the failure are hits on the next run.
+class StageCache:
+    def __init__(self,cache_dir:str):
+        try:
+            self.cache_dir=cache_dir
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _entry_path(self,stage_name:str,fingerprint:str)->str:
+        return os.path.join(self.cache_dir,stage_name,f"{fingerprint}.pkl")
+
+    @staticmethod
+    def _artifact_files_exist(artifact)->bool:
+        if not is_dataclass(artifact):
+            return False
+        for field in fields(artifact):
+            value=getattr(artifact,field.name)
+            if field.name.endswith("_file_path") and isinstance(value,str) and not os.path.exists(value):
+                return False
+        return True
+
+    def get(self,stage_name:str,fingerprint:str):
+        try:
+            entry_path=self._entry_path(stage_name,fingerprint)
+            if not os.path.exists(entry_path):
+                return None
+            artifact=load_object(entry_path)
+            if not self._artifact_files_exist(artifact):
+                logging.info(f"Stage cache entry for {stage_name} [{fingerprint[:12]}] points to missing files, ignoring it")
+                return None
+            return artifact
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def put(self,stage_name:str,fingerprint:str,artifact)->None:
+        try:
+            save_object(self._entry_path(stage_name,fingerprint),artifact)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
@@ -1,4 +1,6 @@
 import sys,os
+import time
+from dataclasses import is_dataclass
 from Network_security.exception.exception import NetworkSecurityException
 from Network_security.logging.logger import logging
 from Network_security.components.data_ingestion import DataIngestion
@@ -6,7 +8,8 @@ from Network_security.components.data_validation import DataValidation
 from Network_security.components.data_transformation import DataTransformation
 from Network_security.components.model_trainer import ModelTrainer
 from Network_security.entity.config_entity import(
-TrainingPipelineConfig,DataIngestionConfig,DataValidationConfig,DataTransformationConfig,ModelTrainerConfig
+TrainingPipelineConfig,DataIngestionConfig,DataValidationConfig,DataTransformationConfig,ModelTrainerConfig,
+RunProfileConfig
 )
 from Network_security.entity.artifact_entity import(
 DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact,ModelTrainerArtifact
@@ -15,18 +18,87 @@ DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact,ModelTra
 from Network_security.constants.training_pipeline import TRAINING_BUCKET_NAME
 from Network_security.cloud.s3_syncer import S3Sync
 from Network_security.constants.training_pipeline import SAVED_MODEL_DIR
+from Network_security.constants.training_pipeline import (
+STAGE_CACHE_ENABLED,SCHEMA_FILE_PATH,TARGET_COLUMN,DATA_TRANSFORMATION_IMPUTER_PARAMS,MODEL_TRAINER_PROMOTE_MODEL,
+MODEL_TRAINER_TRACK_MLFLOW
+)
+from Network_security.pipeline.stage_cache import StageCache
+from Network_security.utils.ml_utils.tracking.experiment_tracker import ExperimentTracker
+from Network_security.utils.ml_utils.tracking.profiler import RunProfiler,profile_span
+from Network_security.utils.main_utils.utils import (
+compute_file_hash,compute_dataframe_hash,compute_object_hash
+)
 
 class TrainingPipeline:
-    def __init__(self):
+    def __init__(self,use_stage_cache:bool=STAGE_CACHE_ENABLED,progress_callback=None,
+                 promote_model:bool=MODEL_TRAINER_PROMOTE_MODEL):
         self.training_pipeline_config=TrainingPipelineConfig()
         self.s3_sync = S3Sync()
+        self.stage_cache=StageCache(self.training_pipeline_config.stage_cache_dir) if use_stage_cache else None
+        # called with {"stage","status","seconds"} as each stage of run_pipeline starts, completes or fails
+        self.progress_callback=progress_callback
+        self.promote_model=promote_model
+        # one mlflow run for the whole pipeline: stage durations, the trainer's metrics and the champion model
+        self.experiment_tracker=ExperimentTracker(enabled=MODEL_TRAINER_TRACK_MLFLOW)
+        # timings, memory and row counts of every stage and sub-step, written as profile/run_profile.json
+        self.run_profile_config=RunProfileConfig(self.training_pipeline_config)
+        self.profiler=RunProfiler(mode=self.run_profile_config.mode,
+                                  sample_interval=self.run_profile_config.sample_interval,
+                                  memory_interval=self.run_profile_config.memory_interval,
+                                  top_functions=self.run_profile_config.top_functions)
+        self.run_profile_artifact=None
+
+    def report_progress(self,stage_name:str,status:str,seconds:float=None):
+        if self.progress_callback is not None:
+            self.progress_callback({"stage":stage_name,"status":status,"seconds":seconds})
+
+    def run_stage(self,stage_name:str,run_stage):
+        self.report_progress(stage_name,"running")
+        start=time.perf_counter()
+        try:
+            with self.profiler.span(stage_name) as span:
+                result=run_stage()
+        except Exception:
+            self.report_progress(stage_name,"failed",time.perf_counter()-start)
+            raise
+        self.report_progress(stage_name,"completed",span.wall_seconds)
+        self.experiment_tracker.log_metrics({f"stage_{stage_name}_seconds":span.wall_seconds,
+                                             f"stage_{stage_name}_cpu_seconds":span.cpu_seconds,
+                                             f"stage_{stage_name}_peak_rss_mb":span.peak_rss_mb})
+        # the stage's timings and those of its sub-steps travel with its artifact
+        if is_dataclass(result) and hasattr(result,"profile"):
+            result.profile=self.profiler.stage_profile(span)
+        return result
+
+    def run_cached_stage(self,stage_name:str,fingerprint_inputs:dict,run_stage,on_cache_hit=None):
+        if self.stage_cache is None:
+            return run_stage()
+        with profile_span("stage_cache_lookup") as span:
+            fingerprint=compute_object_hash({"stage":stage_name,**fingerprint_inputs})
+            artifact=self.stage_cache.get(stage_name,fingerprint)
+            span.details["hit"]=artifact is not None
+        if artifact is not None:
+            logging.info(f"Reusing cached {stage_name} artifact [{fingerprint[:12]}]: {artifact}")
+            if on_cache_hit is not None:
+                on_cache_hit(artifact)
+            return artifact
+        artifact=run_stage()
+        self.stage_cache.put(stage_name,fingerprint,artifact)
+        return artifact
 
     def start_data_ingestion(self):
         try:
             self.data_ingestion_config=DataIngestionConfig(training_pipeline_config=self.training_pipeline_config)
             logging.info("Initiate data ingestion")
             data_ingestion=DataIngestion(data_ingestion_config=self.data_ingestion_config)
-            data_ingestion_artifact=data_ingestion.initiate_data_ingestion()
+            dataframe=data_ingestion.export_collection_as_dataframe()
+            # an unchanged collection reuses the previous split, which keeps every later fingerprint stable
+            data_ingestion_artifact=self.run_cached_stage(
+                "data_ingestion",
+                {"data":compute_dataframe_hash(dataframe),
+                 "train_test_split_ratio":self.data_ingestion_config.train_test_split_ratio},
+                lambda:data_ingestion.initiate_data_ingestion(dataframe=dataframe)
+            )
             logging.info(f"Data ingestion completed and artifact:{data_ingestion_artifact}")
             return data_ingestion_artifact
         except Exception as e:
@@ -38,7 +110,17 @@ class TrainingPipeline:
             logging.info("Initiate data validation")
             data_validation=DataValidation(data_ingestion_artifact=data_ingestion_artifact,
                                            data_validation_config=data_validation_config)
-            dat_validation_artifact=data_validation.initiate_data_validation()
+            dat_validation_artifact=self.run_cached_stage(
+                "data_validation",
+                {"train":compute_file_hash(data_ingestion_artifact.trained_file_path),
+                 "test":compute_file_hash(data_ingestion_artifact.test_file_path),
+                 "schema":compute_file_hash(SCHEMA_FILE_PATH),
+                 "drift":[data_validation_config.drift_method,data_validation_config.drift_thresold,
+                          data_validation_config.psi_thresold,data_validation_config.drift_max_categories]},
+                data_validation.initiate_data_validation
+            )
+            if data_validation_config.fail_on_drift and dat_validation_artifact.drifted_columns:
+                raise Exception(f"Data drift detected in columns {dat_validation_artifact.drifted_columns}")
             logging.info(f"Data validation completed and artifact:{dat_validation_artifact}")
             return dat_validation_artifact
         except Exception as e:
@@ -50,7 +132,14 @@ class TrainingPipeline:
             logging.info("Initiate data transformation")
             data_transformation=DataTransformation(data_transforamtion_config=data_transformation_config,
                                                 data_validation_artifact=data_validation_artifact)
-            data_transformation_artifact=data_transformation.initiate_data_transformation()
+            data_transformation_artifact=self.run_cached_stage(
+                "data_transformation",
+                {"train":compute_file_hash(data_validation_artifact.valid_train_file_path),
+                 "test":compute_file_hash(data_validation_artifact.valid_test_file_path),
+                 "target_column":TARGET_COLUMN,
+                 "imputer_params":DATA_TRANSFORMATION_IMPUTER_PARAMS},
+                data_transformation.initiate_data_transformation
+            )
             logging.info(f"Data transformation completed and artifact:{data_transformation_artifact}")
             return data_transformation_artifact
         except Exception as e:
@@ -59,10 +148,34 @@ class TrainingPipeline:
     def start_model_trainer(self,data_transformation_artifact=DataTransformationArtifact):
         try:
             model_trainer_config=ModelTrainerConfig(training_pipleline_config=self.training_pipeline_config)
+            model_trainer_config.promote_model=self.promote_model
             logging.info("Initiate model trainer")
             model_trainer=ModelTrainer(model_trainer_config=model_trainer_config,
-                                    data_transforamtion_artifact=data_transformation_artifact)
-            model_trainer_artifact=model_trainer.initiate_model_trainer()
+                                    data_transforamtion_artifact=data_transformation_artifact,
+                                    experiment_tracker=self.experiment_tracker)
+            models,params=model_trainer.get_model_candidates()
+            if model_trainer_config.training_mode=="streaming":
+                models,params=model_trainer.get_streaming_model_candidates(),{}
+            fingerprint_inputs={
+                "train":compute_file_hash(data_transformation_artifact.transformed_train_file_path),
+                "test":compute_file_hash(data_transformation_artifact.transformed_test_file_path),
+                "train_target":compute_file_hash(data_transformation_artifact.transformed_train_target_file_path),
+                "test_target":compute_file_hash(data_transformation_artifact.transformed_test_target_file_path),
+                "preprocessor":compute_file_hash(data_transformation_artifact.transformed_object_file_path),
+                "models":{model_name:repr(model) for model_name,model in models.items()},
+                "params":params,
+                "search":{key:value for key,value in vars(model_trainer_config).items()
+                          if key.startswith(("search_","streaming_")) or key=="training_mode"},
+            }
+            # final_model may hold another run's model by now, so a cache hit publishes the cached one again
+            def on_cache_hit(artifact):
+                self.experiment_tracker.set_tags({"model_trainer_cache":"hit",
+                                                  "trained_model_file_path":artifact.trained_model_file_path})
+                if self.promote_model:
+                    model_trainer.publish_final_model(os.path.dirname(artifact.trained_model_file_path))
+            model_trainer_artifact=self.run_cached_stage(
+                "model_trainer",fingerprint_inputs,model_trainer.initiate_model_trainer,on_cache_hit=on_cache_hit
+            )
             logging.info(f"Model trainer completed and artifact{model_trainer_artifact}")
             return model_trainer_artifact
         except Exception as e:
@@ -86,21 +199,50 @@ class TrainingPipeline:
         except Exception as e:
             raise NetworkSecurityException(e,sys)
         
+    def write_run_profile(self):
+        # written for failed runs too, that is when knowing where the time went matters most
+        try:
+            self.run_profile_artifact=self.profiler.write(self.run_profile_config.run_profile_file_path,
+                                                          cprofile_file_path=self.run_profile_config.cprofile_file_path,
+                                                          stacks_file_path=self.run_profile_config.stacks_file_path)
+            self.experiment_tracker.set_tags({"run_profile_file_path":self.run_profile_artifact.run_profile_file_path})
+            self.experiment_tracker.log_metrics({"run_cpu_seconds":self.run_profile_artifact.cpu_seconds,
+                                                 "run_peak_rss_mb":self.run_profile_artifact.peak_rss_mb})
+            return self.run_profile_artifact
+        except Exception as e:
+            logging.info(f"Writing the run profile failed: {e}")
+            return None
+
     def run_pipeline(self):
         try:
             print(f"📁 Local artifact folder: {self.training_pipeline_config.artifact_dir}")
             print(f"📁 Local model folder: {self.training_pipeline_config.model_dir}")
-            data_ingestion_artifact=self.start_data_ingestion()
-            data_validation_artifact=self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact=self.start_data_transforamtion(data_validation_artifact=data_validation_artifact)
-            model_trainer_artifact=self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-                    
-            self.sync_artifact_dir_to_s3()
-            self.sync_saved_model_dir_to_s3()
+            self.profiler.start()
+            self.experiment_tracker.start_run(f"training_{self.training_pipeline_config.timestamp}",
+                                              tags={"promote_model":str(self.promote_model)})
+            data_ingestion_artifact=self.run_stage("ingestion",self.start_data_ingestion)
+            data_validation_artifact=self.run_stage(
+                "validation",lambda:self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact))
+            data_transformation_artifact=self.run_stage(
+                "transformation",lambda:self.start_data_transforamtion(data_validation_artifact=data_validation_artifact))
+            model_trainer_artifact=self.run_stage(
+                "trainer",lambda:self.start_model_trainer(data_transformation_artifact=data_transformation_artifact))
+
+            def sync():
+                self.sync_artifact_dir_to_s3()
+                # an unpromoted model never reached final_model, so there is nothing new to upload there
+                if self.promote_model:
+                    self.sync_saved_model_dir_to_s3()
+            self.run_stage("sync",sync)
+            self.write_run_profile()
 
+            # waits for the model upload that ran alongside the last stages, then sends the batched logs
+            self.experiment_tracker.end_run()
             return model_trainer_artifact
 
         except Exception as e:
+            self.write_run_profile()
+            self.experiment_tracker.end_run(status="FAILED")
             raise NetworkSecurityException(e,sys)
 
 
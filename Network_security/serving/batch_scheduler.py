@@ -0,0 +1,206 @@
+import sys
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import (
+    SCORE_BATCH_WINDOW_MS,SCORE_MAX_BATCH_SIZE,SCORE_BATCH_N_THREADS
+)
+from Network_security.serving.model_registry import ModelRegistry
+from Network_security.serving.prediction_cache import PredictionCache
+
+
+# Coalesces concurrent scoring requests into one NetworkModel.score call. The first queued request opens
+# a window of batch_window_ms; everything that arrives before it closes (or until max_batch_size rows are
+# collected) is scored together on a worker thread and the results are handed back to each request.
+# While all worker threads are busy, new requests keep queueing, so batches grow with the load.
+# With a prediction_cache, rows seen before under the current model version never reach the queue
+# (requests above its max_request_rows skip the cache).
+class BatchScheduler:
+    def __init__(self,model_registry:ModelRegistry,batch_window_ms:float=SCORE_BATCH_WINDOW_MS,
+                 max_batch_size:int=SCORE_MAX_BATCH_SIZE,n_threads:int=SCORE_BATCH_N_THREADS,
+                 prediction_cache:PredictionCache=None,serving_metrics=None):
+        try:
+            self.model_registry=model_registry
+            self.prediction_cache=prediction_cache
+            # receives the rows and preprocess/model seconds of every model call
+            self.serving_metrics=serving_metrics
+            self.batch_window_ms=batch_window_ms
+            self.max_batch_size=max_batch_size
+            self.n_threads=n_threads
+            self._queue=None
+            self._executor=None
+            self._worker_slots=None
+            self._task=None
+            self._scoring_tasks=set()
+            self._batches=0
+            self._requests=0
+            self._rows=0
+            self._last_batch_size=0
+            self._max_batch_rows=0
+            self._score_seconds=0.0
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def start(self):
+        # called from the running event loop (app startup)
+        self._queue=asyncio.Queue()
+        self._executor=ThreadPoolExecutor(max_workers=self.n_threads,thread_name_prefix="batch-scorer")
+        self._worker_slots=asyncio.Semaphore(self.n_threads)
+        self._task=asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task=None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor=None
+
+    async def _score_rows(self,features:np.ndarray):
+        future=asyncio.get_running_loop().create_future()
+        await self._queue.put((features,future))
+        return await future
+
+    @staticmethod
+    def _label_dtype(network_model):
+        model=network_model.model
+        return np.asarray(model.classes_).dtype if hasattr(model,"classes_") else np.int64
+
+    async def submit(self,features:np.ndarray):
+        # returns (labels, probabilities, model_version) for the rows of this request only
+        if len(features)==0:
+            # nothing to score; the empty arrays are shaped like the current model's output
+            network_model,model_version=self.model_registry.get_model_and_version()
+            labels=np.empty(0,dtype=self._label_dtype(network_model))
+            probabilities=np.empty(0,dtype=np.float64) if hasattr(network_model.model,"predict_proba") else None
+            return labels,probabilities,model_version
+        if self.prediction_cache is None or not self.prediction_cache.admits(len(features)):
+            return await self._score_rows(features)
+
+        network_model,cached_version=self.model_registry.get_model_and_version()
+        keys,cacheable=self.prediction_cache.encode_keys(features)
+        hits,cached_labels,cached_probabilities=self.prediction_cache.lookup(keys,cacheable,cached_version)
+        if hits.all():
+            # the cache holds Python scalars, the arrays get the dtypes a model call would have returned
+            labels=np.asarray(cached_labels,dtype=self._label_dtype(network_model))
+            probabilities=None if cached_probabilities[0] is None else np.asarray(cached_probabilities,dtype=np.float64)
+            return labels,probabilities,cached_version
+
+        misses=~hits
+        labels,probabilities,model_version=await self._score_rows(features[misses])
+        self.prediction_cache.store(keys[misses],cacheable[misses],labels,probabilities,model_version)
+        if not hits.any():
+            return labels,probabilities,model_version
+        if model_version!=cached_version:
+            # the model was swapped while we waited, cached rows would mix two versions in one response
+            return await self.submit(features)
+
+        merged_labels=np.empty(len(features),dtype=labels.dtype)
+        merged_labels[hits]=cached_labels
+        merged_labels[misses]=labels
+        merged_probabilities=None
+        if probabilities is not None:
+            merged_probabilities=np.empty(len(features),dtype=np.float64)
+            merged_probabilities[hits]=cached_probabilities
+            merged_probabilities[misses]=probabilities
+        return merged_labels,merged_probabilities,model_version
+
+    async def _collect_batch(self)->list:
+        batch=[await self._queue.get()]
+        rows=len(batch[0][0])
+        deadline=time.perf_counter()+self.batch_window_ms/1000
+        while rows<self.max_batch_size:
+            timeout=deadline-time.perf_counter()
+            if timeout<=0:
+                break
+            try:
+                request=await asyncio.wait_for(self._queue.get(),timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(request)
+            rows+=len(request[0])
+        # anything that queued up while we were waiting for a worker joins this batch too
+        while rows<self.max_batch_size and not self._queue.empty():
+            request=self._queue.get_nowait()
+            batch.append(request)
+            rows+=len(request[0])
+        return batch
+
+    def _score(self,features:np.ndarray):
+        network_model,model_version=self.model_registry.get_model_and_version()
+        timings={}
+        start=time.perf_counter()
+        labels,probabilities=network_model.score(features,timings=timings)
+        score_seconds=time.perf_counter()-start
+        if self.serving_metrics is not None:
+            self.serving_metrics.observe_model_call(len(features),timings["preprocess_seconds"],timings["model_seconds"])
+        return labels,probabilities,model_version,score_seconds
+
+    async def _score_batch(self,batch:list):
+        try:
+            features=np.concatenate([request_features for request_features,_ in batch])
+            labels,probabilities,model_version,score_seconds=await asyncio.get_running_loop().run_in_executor(
+                self._executor,self._score,features
+            )
+            self._batches+=1
+            self._requests+=len(batch)
+            self._rows+=len(features)
+            self._last_batch_size=len(features)
+            self._max_batch_rows=max(self._max_batch_rows,len(features))
+            self._score_seconds+=score_seconds
+
+            start=0
+            for request_features,future in batch:
+                end=start+len(request_features)
+                if not future.done():
+                    future.set_result((labels[start:end],
+                                       probabilities[start:end] if probabilities is not None else None,
+                                       model_version))
+                start=end
+        except Exception as e:
+            logging.info(f"Scoring a batch of {len(batch)} requests failed: {e}")
+            for _,future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._worker_slots.release()
+
+    async def _run(self):
+        while True:
+            # wait for a free worker before forming the next batch, requests keep queueing meanwhile
+            await self._worker_slots.acquire()
+            try:
+                batch=await self._collect_batch()
+            except BaseException:
+                self._worker_slots.release()
+                raise
+            # the loop only keeps weak references to tasks, so in-flight batches are held here
+            task=asyncio.get_running_loop().create_task(self._score_batch(batch))
+            self._scoring_tasks.add(task)
+            task.add_done_callback(self._scoring_tasks.discard)
+
+    def metrics(self)->dict:
+        metrics={
+            "queue_depth":self._queue.qsize() if self._queue is not None else 0,
+            "batches":self._batches,
+            "requests":self._requests,
+            "rows":self._rows,
+            "last_batch_size":self._last_batch_size,
+            "max_batch_size_seen":self._max_batch_rows,
+            "mean_batch_size":self._rows/self._batches if self._batches else 0.0,
+            "mean_requests_per_batch":self._requests/self._batches if self._batches else 0.0,
+            "score_seconds":self._score_seconds,
+            "batch_window_ms":self.batch_window_ms,
+            "max_batch_size":self.max_batch_size,
+        }
+        if self.prediction_cache is not None:
+            metrics["prediction_cache"]=self.prediction_cache.metrics()
+        return metrics
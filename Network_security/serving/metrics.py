@@ -0,0 +1,272 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.logging.structured import SampledLogger
+from Network_security.constants.training_pipeline import (
+    SERVING_LATENCY_BUCKETS_SECONDS,SERVING_SIZE_BUCKETS_BYTES,SERVING_BATCH_ROWS_BUCKETS,SERVING_LOG_SAMPLE_RATE
+)
+
+CONTENT_TYPE="text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value)->str:
+    return str(value).replace("\\","\\\\").replace("\"","\\\"").replace("\n","\\n")
+
+
+def _format_labels(label_names:tuple,label_values:tuple,extra:str="")->str:
+    labels=[f'{name}="{_escape(value)}"' for name,value in zip(label_names,label_values)]
+    if extra:
+        labels.append(extra)
+    return "{"+",".join(labels)+"}" if labels else ""
+
+
+def _format_value(value)->str:
+    if value==float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value,float) else str(value)
+
+
+# Counters, gauges and histograms in the Prometheus text format. Label values are passed positionally in
+# label_names order and a series is a dict entry keyed by their tuple, so an update is one lock and one
+# dict lookup. Values that already live elsewhere (the registry's model version, the cache's hit counts)
+# come from a function called at scrape time instead, which costs nothing between scrapes.
+class _Metric:
+    kind="untyped"
+
+    def __init__(self,name:str,help_text:str,label_names:tuple=()):
+        self.name=name
+        self.help_text=help_text
+        self.label_names=tuple(label_names)
+        self._values={}
+        self._function=None
+        self._lock=threading.Lock()
+
+    def set_function(self,function):
+        # function returns {label values tuple: value}
+        self._function=function
+        return self
+
+    def _series(self)->dict:
+        if self._function is not None:
+            return self._function()
+        with self._lock:
+            return dict(self._values)
+
+    def _sample_lines(self,label_values:tuple,value)->list:
+        return [f"{self.name}{_format_labels(self.label_names,label_values)} {_format_value(value)}"]
+
+    def render(self)->list:
+        lines=[f"# HELP {self.name} {self.help_text}",f"# TYPE {self.name} {self.kind}"]
+        for label_values,value in self._series().items():
+            lines.extend(self._sample_lines(label_values,value))
+        return lines
+
+
+class Counter(_Metric):
+    kind="counter"
+
+    def inc(self,amount:float=1,*label_values):
+        with self._lock:
+            self._values[label_values]=self._values.get(label_values,0)+amount
+
+
+class Gauge(_Metric):
+    kind="gauge"
+
+    def set(self,value:float,*label_values):
+        with self._lock:
+            self._values[label_values]=value
+
+
+class Histogram(_Metric):
+    kind="histogram"
+
+    def __init__(self,name:str,help_text:str,buckets:tuple,label_names:tuple=()):
+        super().__init__(name,help_text,label_names)
+        self.buckets=tuple(sorted(buckets))
+
+    def observe(self,value:float,*label_values):
+        # a value lands in the first bucket whose upper bound is >= value, the last slot is +Inf
+        index=bisect_left(self.buckets,value)
+        with self._lock:
+            series=self._values.get(label_values)
+            if series is None:
+                series=self._values[label_values]=[[0]*(len(self.buckets)+1),0.0]
+            series[0][index]+=1
+            series[1]+=value
+
+    def _series(self)->dict:
+        with self._lock:
+            return {label_values:(list(counts),total) for label_values,(counts,total) in self._values.items()}
+
+    def _sample_lines(self,label_values:tuple,value)->list:
+        counts,total=value
+        lines=[]
+        cumulative=0
+        for bound,count in zip(self.buckets+(float("inf"),),counts):
+            cumulative+=count
+            le=f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names,label_values,le)} {cumulative}")
+        labels=_format_labels(self.label_names,label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics=[]
+
+    def register(self,metric:_Metric)->_Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self,name:str,help_text:str,label_names:tuple=())->Counter:
+        return self.register(Counter(name,help_text,label_names))
+
+    def gauge(self,name:str,help_text:str,label_names:tuple=())->Gauge:
+        return self.register(Gauge(name,help_text,label_names))
+
+    def histogram(self,name:str,help_text:str,buckets:tuple,label_names:tuple=())->Histogram:
+        return self.register(Histogram(name,help_text,buckets,label_names))
+
+    def render(self)->str:
+        lines=[]
+        for metric in self._metrics:
+            # a broken scrape-time function drops its own metric, not the whole page
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logging.info(f"Rendering metric {metric.name} failed: {e}")
+        return "\n".join(lines)+"\n"
+
+
+# Everything /metrics exposes for the scoring service. Request metrics are recorded by MetricsMiddleware,
+# model call timings by the batch scheduler, the rest is read from the registry, scheduler and cache when
+# /metrics is scraped. rows_scored_total is a counter: rows per second is rate(rows_scored_total[1m]).
+class ServingMetrics:
+    def __init__(self,model_registry=None,batch_scheduler=None):
+        try:
+            self.registry=MetricsRegistry()
+            self.request_seconds=self.registry.histogram(
+                "http_request_duration_seconds","Time to serve a request, by route template",
+                SERVING_LATENCY_BUCKETS_SECONDS,("route","method","status"))
+            self.request_bytes=self.registry.histogram(
+                "http_request_size_bytes","Request body size from Content-Length",SERVING_SIZE_BUCKETS_BYTES,("route",))
+            self.response_bytes=self.registry.histogram(
+                "http_response_size_bytes","Response body size",SERVING_SIZE_BUCKETS_BYTES,("route",))
+            self.request_errors=self.registry.counter(
+                "http_request_errors_total","Requests answered with a 4xx or 5xx status",("route","status"))
+            self.rows_scored=self.registry.counter(
+                "rows_scored_total","Rows scored by successful requests, cached rows included",("route",))
+            self.preprocess_seconds=self.registry.histogram(
+                "predict_preprocess_seconds","Preprocessor time per model call",SERVING_LATENCY_BUCKETS_SECONDS)
+            self.model_seconds=self.registry.histogram(
+                "predict_model_seconds","Model time per model call",SERVING_LATENCY_BUCKETS_SECONDS)
+            self.batch_rows=self.registry.histogram(
+                "predict_batch_rows","Rows per model call after request batching",SERVING_BATCH_ROWS_BUCKETS)
+            if model_registry is not None:
+                self.add_model_registry(model_registry)
+            if batch_scheduler is not None:
+                self.add_batch_scheduler(batch_scheduler)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def add_model_registry(self,model_registry):
+        def model_info():
+            version=model_registry.get_version()
+            return {(version,):1} if version is not None else {}
+
+        def health_value(key):
+            value=model_registry.health()[key]
+            return {():value} if value is not None else {}
+
+        self.registry.gauge("model_info","The model version being served",("version",)).set_function(model_info)
+        self.registry.gauge("model_load_seconds","Time the served model took to load").set_function(
+            lambda:health_value("load_seconds"))
+        self.registry.counter("model_loads_total","Models loaded since startup").set_function(
+            lambda:health_value("loads"))
+        self.registry.counter("model_load_failures_total","Model loads that failed").set_function(
+            lambda:health_value("load_failures"))
+
+    def add_batch_scheduler(self,batch_scheduler):
+        self.registry.gauge("score_queue_depth","Requests waiting for the batch scheduler").set_function(
+            lambda:{():batch_scheduler.metrics()["queue_depth"]})
+        self.registry.counter("score_batches_total","Model calls made by the batch scheduler").set_function(
+            lambda:{():batch_scheduler.metrics()["batches"]})
+        prediction_cache=batch_scheduler.prediction_cache
+        if prediction_cache is None:
+            return
+
+        def cache_lookups():
+            cache_metrics=prediction_cache.metrics()
+            return {("hit",):cache_metrics["hits"],("miss",):cache_metrics["misses"]}
+
+        self.registry.counter("prediction_cache_lookups_total","Rows looked up in the prediction cache",
+                              ("result",)).set_function(cache_lookups)
+        self.registry.gauge("prediction_cache_entries","Rows held in the prediction cache").set_function(
+            lambda:{():prediction_cache.metrics()["size"]})
+        self.registry.counter("prediction_cache_bypassed_rows_total",
+                              "Rows of requests too large for the prediction cache").set_function(
+            lambda:{():prediction_cache.metrics()["bypassed_rows"]})
+
+    def observe_request(self,route:str,method:str,status:int,seconds:float,request_bytes:int,response_bytes:int,
+                        rows:int=None):
+        self.request_seconds.observe(seconds,route,method,str(status))
+        self.request_bytes.observe(request_bytes,route)
+        self.response_bytes.observe(response_bytes,route)
+        if status>=400:
+            self.request_errors.inc(1,route,str(status))
+        elif rows:
+            self.rows_scored.inc(rows,route)
+
+    def observe_model_call(self,rows:int,preprocess_seconds:float,model_seconds:float):
+        self.batch_rows.observe(rows)
+        self.preprocess_seconds.observe(preprocess_seconds)
+        self.model_seconds.observe(model_seconds)
+
+    def render(self)->str:
+        return self.registry.render()
+
+
+# ASGI middleware timing every HTTP request. The route label is the matched route template (/train/{job_id},
+# not the job id) so the number of series stays fixed. Handlers put rows and model_version on request.state
+# for the rows counter and the request log; a sample of requests, and every error, is logged as one JSON line.
+class MetricsMiddleware:
+    def __init__(self,app,serving_metrics:ServingMetrics,sample_rate:float=SERVING_LOG_SAMPLE_RATE):
+        self.app=app
+        self.serving_metrics=serving_metrics
+        self.request_logger=SampledLogger(sample_rate)
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http":
+            await self.app(scope,receive,send)
+            return
+        start=time.perf_counter()
+        response={"status":500,"bytes":0}
+
+        async def send_and_measure(message):
+            if message["type"]=="http.response.start":
+                response["status"]=message["status"]
+            elif message["type"]=="http.response.body":
+                response["bytes"]+=len(message.get("body",b""))
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_and_measure)
+        finally:
+            seconds=time.perf_counter()-start
+            route=getattr(scope.get("route"),"path","unmatched")
+            request_bytes=next((int(value) for name,value in scope["headers"] if name==b"content-length"),0)
+            state=scope.get("state") or {}
+            status=response["status"]
+            self.serving_metrics.observe_request(route,scope["method"],status,seconds,request_bytes,
+                                                 response["bytes"],state.get("rows"))
+            self.request_logger.log("request",always=status>=500,route=route,path=scope["path"],
+                                    method=scope["method"],status=status,seconds=round(seconds,6),
+                                    request_bytes=request_bytes,response_bytes=response["bytes"],
+                                    rows=state.get("rows"),model_version=state.get("model_version"))
@@ -0,0 +1,157 @@
+import os,sys
+import hashlib
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import (
+    FINAL_MODEL_DIR,FINAL_MODEL_FILE_NAME,FINAL_PREPROCESSOR_FILE_NAME,MODEL_REGISTRY_POLL_INTERVAL_SECONDS
+)
+from Network_security.utils.ml_utils.model.estimator import NetworkModel
+from Network_security.utils.ml_utils.model.bundle import read_latest_bundle_dir,load_network_model
+
+
+# Keeps one NetworkModel loaded for the lifetime of the service and swaps in a new one when
+# final_model/LATEST points at a new bundle. Readers always see a complete (model, version) pair.
+# With prefer_compiled, the flattened tree model answers calls of up to MODEL_COMPILED_MAX_ROWS rows
+# whenever the bundle has one; larger calls go to the sklearn model.
+# A final_model without bundles (plain model.pkl + preprocessor.pkl) is still served as before.
+class ModelRegistry:
+    def __init__(self,model_dir:str=FINAL_MODEL_DIR,poll_interval:float=MODEL_REGISTRY_POLL_INTERVAL_SECONDS,
+                 prefer_compiled:bool=True):
+        try:
+            self.model_dir=model_dir
+            self.poll_interval=poll_interval
+            self.prefer_compiled=prefer_compiled
+            self.preprocessor_file_path=os.path.join(model_dir,FINAL_PREPROCESSOR_FILE_NAME)
+            self.model_file_path=os.path.join(model_dir,FINAL_MODEL_FILE_NAME)
+            self._state=None
+            self._signature=None
+            self._pending_signature=None
+            self._last_error=None
+            self._loads=0
+            self._load_failures=0
+            self._load_lock=threading.Lock()
+            self._stop_event=threading.Event()
+            self._watcher=None
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _read_signature(self):
+        bundle_dir=read_latest_bundle_dir(self.model_dir)
+        if bundle_dir is not None:
+            return ("bundle",bundle_dir)
+        signature=[]
+        for file_path in (self.preprocessor_file_path,self.model_file_path):
+            if not os.path.exists(file_path):
+                return None
+            stat=os.stat(file_path)
+            signature.append((file_path,stat.st_mtime_ns,stat.st_size))
+        return ("pickle",tuple(signature))
+
+    def _load_pickles(self):
+        with open(self.preprocessor_file_path,"rb") as file_obj:
+            preprocessor_bytes=file_obj.read()
+        with open(self.model_file_path,"rb") as file_obj:
+            model_bytes=file_obj.read()
+        network_model=NetworkModel(preprocessor=pickle.loads(preprocessor_bytes),model=pickle.loads(model_bytes))
+        return network_model,hashlib.sha256(preprocessor_bytes+model_bytes).hexdigest()[:12]
+
+    def load(self)->str:
+        try:
+            with self._load_lock:
+                signature=self._read_signature()
+                if signature is None:
+                    raise Exception(f"Model files not found in {self.model_dir}")
+                start=time.perf_counter()
+                if signature[0]=="bundle":
+                    network_model,manifest=load_network_model(signature[1],prefer_compiled=self.prefer_compiled)
+                    version=manifest["version"]
+                else:
+                    network_model,version=self._load_pickles()
+                load_seconds=time.perf_counter()-start
+
+                # single attribute assignment, so a request never sees a half swapped model
+                self._state=(network_model,version,datetime.now(),load_seconds)
+                self._signature=signature
+                self._pending_signature=None
+                self._last_error=None
+                self._loads+=1
+                logging.info(f"Loaded model version {version} from {self.model_dir} in {load_seconds:.3f}s")
+                return version
+        except Exception as e:
+            self._last_error=str(e)
+            self._load_failures+=1
+            raise NetworkSecurityException(e,sys)
+
+    def check_for_update(self)->bool:
+        signature=self._read_signature()
+        if signature is None or signature==self._signature:
+            self._pending_signature=None
+            return False
+        # LATEST is flipped atomically, loose pickles are only reloaded once they stopped changing for a poll
+        if signature[0]=="pickle" and signature!=self._pending_signature:
+            self._pending_signature=signature
+            return False
+        try:
+            self.load()
+            return True
+        except NetworkSecurityException as e:
+            logging.info(f"Model reload failed, keeping the current model: {e}")
+            return False
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.check_for_update()
+
+    def start(self):
+        try:
+            self.load()
+        except NetworkSecurityException as e:
+            logging.info(f"No model loaded at startup: {e}")
+        if self.poll_interval and self._watcher is None:
+            self._stop_event.clear()
+            self._watcher=threading.Thread(target=self._watch,name="model-registry-watcher",daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher=None
+
+    def get_model_and_version(self):
+        try:
+            state=self._state
+            if state is None:
+                raise Exception(f"No model loaded from {self.model_dir}")
+            return state[0],state[1]
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def has_model(self)->bool:
+        return self._state is not None
+
+    def get_version(self)->str:
+        state=self._state
+        return state[1] if state is not None else None
+
+    def get_model(self)->NetworkModel:
+        return self.get_model_and_version()[0]
+
+    def health(self)->dict:
+        state=self._state
+        return {
+            "status":"ok" if state is not None else "unavailable",
+            "model_dir":self.model_dir,
+            "model_version":state[1] if state is not None else None,
+            "model_source":self._signature[1] if state is not None and self._signature[0]=="bundle" else self.model_dir,
+            "loaded_at":state[2].isoformat() if state is not None else None,
+            "load_seconds":state[3] if state is not None else None,
+            "last_error":self._last_error,
+            "loads":self._loads,
+            "load_failures":self._load_failures,
+        }
@@ -0,0 +1,127 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.constants.training_pipeline import (
+    PREDICTION_CACHE_MAX_SIZE,PREDICTION_CACHE_TTL_SECONDS,PREDICTION_CACHE_MAX_REQUEST_ROWS
+)
+from Network_security.utils.ml_utils.preprocessing.ternary import missing_mask
+
+# 2 bits per feature: -1,0,1 -> 0,1,2 and a missing value -> 3, so up to 32 features fit one uint64
+BITS_PER_FEATURE=2
+MISSING_CODE=3
+
+
+# LRU + TTL cache of (label, probability) per feature vector, keyed by the packed row. Entries belong to
+# one model version and the whole cache is dropped as soon as a different version is seen.
+class PredictionCache:
+    def __init__(self,max_size:int=PREDICTION_CACHE_MAX_SIZE,ttl_seconds:float=PREDICTION_CACHE_TTL_SECONDS,
+                 max_request_rows:int=PREDICTION_CACHE_MAX_REQUEST_ROWS):
+        try:
+            self.max_size=max_size
+            self.ttl_seconds=ttl_seconds
+            # larger requests bypass the cache
+            self.max_request_rows=max_request_rows
+            self._entries=OrderedDict()
+            self._model_version=None
+            self._lock=threading.Lock()
+            self._hits=0
+            self._misses=0
+            self._uncacheable=0
+            self._evictions=0
+            self._expirations=0
+            self._invalidations=0
+            self._bypassed=0
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    @staticmethod
+    def encode_keys(features:np.ndarray):
+        # returns (keys, cacheable); rows with values outside {-1,0,1} cannot be packed and are never cached
+        n_features=features.shape[1]
+        if n_features*BITS_PER_FEATURE>64:
+            return np.zeros(len(features),dtype=np.uint64),np.zeros(len(features),dtype=bool)
+        missing=missing_mask(features)
+        filled=np.where(missing,0,features)
+        cacheable=~((filled!=-1)&(filled!=0)&(filled!=1)).any(axis=1)
+        codes=np.where(missing,MISSING_CODE,filled+1).astype(np.uint64)
+        shifts=np.arange(n_features,dtype=np.uint64)*np.uint64(BITS_PER_FEATURE)
+        keys=np.bitwise_or.reduce(codes<<shifts,axis=1)
+        return keys,cacheable
+
+    def admits(self,n_rows:int)->bool:
+        if n_rows<=self.max_request_rows:
+            return True
+        with self._lock:
+            self._bypassed+=n_rows
+        return False
+
+    def _check_version(self,model_version:str):
+        if model_version!=self._model_version:
+            if self._entries:
+                self._invalidations+=1
+            self._entries.clear()
+            self._model_version=model_version
+
+    def lookup(self,keys:np.ndarray,cacheable:np.ndarray,model_version:str):
+        # returns (hit mask, labels of the hit rows, probabilities of the hit rows)
+        hits=np.zeros(len(keys),dtype=bool)
+        labels=[]
+        probabilities=[]
+        now=time.monotonic()
+        with self._lock:
+            self._check_version(model_version)
+            for row,(key,row_cacheable) in enumerate(zip(keys.tolist(),cacheable.tolist())):
+                if not row_cacheable:
+                    self._uncacheable+=1
+                    continue
+                entry=self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[2]<=now:
+                    del self._entries[key]
+                    self._expirations+=1
+                    continue
+                self._entries.move_to_end(key)
+                hits[row]=True
+                labels.append(entry[0])
+                probabilities.append(entry[1])
+            n_hits=int(hits.sum())
+            self._hits+=n_hits
+            self._misses+=len(keys)-n_hits
+        return hits,labels,probabilities
+
+    def store(self,keys:np.ndarray,cacheable:np.ndarray,labels,probabilities,model_version:str):
+        expires_at=time.monotonic()+self.ttl_seconds
+        probabilities=probabilities.tolist() if probabilities is not None else [None]*len(keys)
+        with self._lock:
+            self._check_version(model_version)
+            for key,row_cacheable,label,probability in zip(keys.tolist(),cacheable.tolist(),labels.tolist(),probabilities):
+                if row_cacheable:
+                    self._entries[key]=(label,probability,expires_at)
+                    self._entries.move_to_end(key)
+            while len(self._entries)>self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions+=1
+
+    def metrics(self)->dict:
+        with self._lock:
+            lookups=self._hits+self._misses
+            return {
+                "size":len(self._entries),
+                "max_size":self.max_size,
+                "ttl_seconds":self.ttl_seconds,
+                "model_version":self._model_version,
+                "hits":self._hits,
+                "misses":self._misses,
+                "hit_rate":self._hits/lookups if lookups else 0.0,
+                "uncacheable_rows":self._uncacheable,
+                "evictions":self._evictions,
+                "expirations":self._expirations,
+                "invalidations":self._invalidations,
+                "max_request_rows":self.max_request_rows,
+                "bypassed_rows":self._bypassed,
+            }
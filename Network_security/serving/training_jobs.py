@@ -0,0 +1,161 @@
+import os,sys
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import datetime
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import (
+    TRAINING_JOB_NICENESS,TRAINING_JOB_HISTORY_SIZE,TRAINING_JOB_STOP_TIMEOUT_SECONDS
+)
+
+
+def _run_training_job(event_queue,promote_model:bool,niceness:int):
+    # entry point of the spawned training process; everything it reports goes through event_queue
+    try:
+        if niceness and hasattr(os,"nice"):
+            os.nice(niceness)
+        from Network_security.pipeline.training_pipeline import TrainingPipeline
+        training_pipeline=TrainingPipeline(progress_callback=lambda event:event_queue.put(("progress",event)),
+                                           promote_model=promote_model)
+        model_trainer_artifact=training_pipeline.run_pipeline()
+        event_queue.put(("succeeded",asdict(model_trainer_artifact)))
+    except Exception as e:
+        event_queue.put(("failed",str(e)))
+
+
+# Runs TrainingPipeline jobs in their own spawned process, so a grid search never holds the GIL or the
+# event loop of the serving process, and keeps the status of recent jobs for polling. One job runs at a time
+# because every job writes to the same final_model directory. on_promote is called after a job that
+# promoted its model succeeds, so serving can reload it right away instead of waiting for the next poll.
+# The process is not a daemon: joblib's loky backend refuses to start workers from a daemonic process and
+# would run the model search and drift checks on one core. stop() ends a running job on shutdown instead.
+class TrainingJobManager:
+    def __init__(self,on_promote=None,niceness:int=TRAINING_JOB_NICENESS,history_size:int=TRAINING_JOB_HISTORY_SIZE):
+        try:
+            self.on_promote=on_promote
+            self.niceness=niceness
+            self.history_size=history_size
+            self._context=multiprocessing.get_context("spawn")
+            self._jobs=OrderedDict()
+            self._lock=threading.Lock()
+            self._active_job_id=None
+            self._active_process=None
+            self._stopping=False
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def start_job(self,auto_promote:bool=True)->str:
+        try:
+            with self._lock:
+                if self._stopping:
+                    raise RuntimeError("Training jobs are shutting down")
+                if self._active_job_id is not None:
+                    raise RuntimeError(f"Training job {self._active_job_id} is still running")
+                job_id=uuid.uuid4().hex[:12]
+                event_queue=self._context.Queue()
+                process=self._context.Process(target=_run_training_job,args=(event_queue,auto_promote,self.niceness),
+                                              name=f"training-job-{job_id}",daemon=False)
+                self._jobs[job_id]={
+                    "job_id":job_id,
+                    "status":"running",
+                    "auto_promote":auto_promote,
+                    "submitted_at":datetime.now().isoformat(),
+                    "finished_at":None,
+                    "current_stage":None,
+                    "stages":OrderedDict(),
+                    "model_trainer_artifact":None,
+                    "promoted_model_version":None,
+                    "error":None,
+                }
+                while len(self._jobs)>self.history_size:
+                    self._jobs.popitem(last=False)
+                self._active_job_id=job_id
+                self._active_process=process
+                process.start()
+            threading.Thread(target=self._monitor,args=(job_id,process,event_queue),
+                             name=f"training-job-monitor-{job_id}",daemon=True).start()
+            logging.info(f"Started training job {job_id} (pid {process.pid}, auto_promote={auto_promote})")
+            return job_id
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _wait_for_outcome(self,job:dict,process,event_queue):
+        # applies progress events until the process reports success or failure
+        while True:
+            try:
+                kind,payload=event_queue.get(timeout=1.0)
+            except Exception:
+                # a process that died without reporting (killed, out of memory) would otherwise look alive forever
+                if not process.is_alive():
+                    return "failed",f"Training process exited with code {process.exitcode}"
+                continue
+            if kind!="progress":
+                return kind,payload
+            with self._lock:
+                stage=job["stages"].setdefault(payload["stage"],{"status":None,"seconds":None})
+                stage["status"]=payload["status"]
+                stage["seconds"]=payload["seconds"]
+                job["current_stage"]=payload["stage"] if payload["status"]=="running" else None
+
+    def _monitor(self,job_id:str,process,event_queue):
+        job=self._jobs[job_id]
+        status,payload=self._wait_for_outcome(job,process,event_queue)
+        process.join()
+
+        error=None if status=="succeeded" else payload
+        if status!="succeeded" and self._stopping:
+            error=f"Stopped at shutdown ({error})"
+        promoted_model_version=None
+        if status=="succeeded" and job["auto_promote"] and self.on_promote is not None and not self._stopping:
+            with self._lock:
+                job["current_stage"]="promote"
+            try:
+                promoted_model_version=self.on_promote()
+            except Exception as e:
+                error=f"Model trained but promotion failed: {e}"
+        # the job only leaves "running" once promotion is done, so a poller never sees a half finished job
+        with self._lock:
+            job["status"]=status
+            job["current_stage"]=None
+            job["model_trainer_artifact"]=payload if status=="succeeded" else None
+            job["promoted_model_version"]=promoted_model_version
+            job["error"]=error
+            job["finished_at"]=datetime.now().isoformat()
+            self._active_job_id=None
+            self._active_process=None
+        logging.info(f"Training job {job_id} {status}")
+
+    def stop(self,timeout:float=TRAINING_JOB_STOP_TIMEOUT_SECONDS):
+        # a non-daemonic child would otherwise keep the server from exiting until training finishes
+        try:
+            with self._lock:
+                self._stopping=True
+                process=self._active_process
+            if process is None or not process.is_alive():
+                return
+            logging.info(f"Stopping training job {self._active_job_id} (pid {process.pid})")
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def get_job(self,job_id:str)->dict:
+        with self._lock:
+            job=self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job,"stages":[{"stage":stage_name,**stage} for stage_name,stage in job["stages"].items()]}
+
+    def list_jobs(self)->list:
+        with self._lock:
+            job_ids=list(self._jobs)
+        return [self.get_job(job_id) for job_id in reversed(job_ids)]
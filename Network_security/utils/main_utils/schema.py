@@ -0,0 +1,178 @@
+import sys
+import math
+import numpy as np
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.constants.training_pipeline import SCHEMA_FILE_PATH,TARGET_COLUMN
+from Network_security.utils.main_utils.utils import read_yaml_file
+from Network_security.utils.ml_utils.preprocessing.ternary import missing_mask
+
+
+# raised for malformed client input, so callers can tell a bad request apart from a server error
+class SchemaValidationError(ValueError):
+    pass
+
+
+# The model's input columns in schema.yaml order, with conversions from request payloads
+# straight to the float matrix the preprocessor expects (no DataFrame on the scoring path).
+class FeatureSchema:
+    def __init__(self,schema_file_path:str=SCHEMA_FILE_PATH,target_column:str=TARGET_COLUMN):
+        try:
+            schema_config=read_yaml_file(schema_file_path)
+            columns=[list(column.keys())[0] for column in schema_config["columns"]]
+            self.target_column=target_column
+            self.feature_columns=[column for column in columns if column!=target_column]
+            self.n_features=len(self.feature_columns)
+            self._feature_set=frozenset(self.feature_columns)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _record_to_row(self,record,position:int)->list:
+        if isinstance(record,dict):
+            unknown=record.keys()-self._feature_set-{self.target_column}
+            if unknown:
+                raise SchemaValidationError(f"record {position}: unknown columns {sorted(unknown)}")
+            missing=self._feature_set-record.keys()
+            if missing:
+                raise SchemaValidationError(f"record {position}: missing columns {sorted(missing)}")
+            values=[record[column] for column in self.feature_columns]
+        elif isinstance(record,list):
+            if len(record)!=self.n_features:
+                raise SchemaValidationError(f"record {position}: expected {self.n_features} values, got {len(record)}")
+            values=record
+        else:
+            raise SchemaValidationError(f"record {position}: expected an object or an array of values")
+
+        row=[]
+        for column,value in zip(self.feature_columns,values):
+            # null is passed on as NaN for the imputer, anything else has to be a whole number
+            if value is None:
+                row.append(math.nan)
+            elif isinstance(value,bool) or not isinstance(value,(int,float)) or (isinstance(value,float) and not value.is_integer()):
+                raise SchemaValidationError(f"record {position}: {column} must be an integer, got {value!r}")
+            else:
+                row.append(value)
+        return row
+
+    def records_from_json(self,payload,max_records:int=None)->np.ndarray:
+        try:
+            # one record, a list of records, or {"records": [...]}; a record is an object or a positional array
+            if isinstance(payload,dict) and "records" in payload:
+                records=payload["records"]
+            elif isinstance(payload,dict):
+                records=[payload]
+            else:
+                records=payload
+            if not isinstance(records,list) or not records:
+                raise SchemaValidationError("expected a record or a non-empty list of records")
+            if isinstance(records[0],(int,float)) or records[0] is None:
+                records=[records]
+            if max_records is not None and len(records)>max_records:
+                raise SchemaValidationError(f"at most {max_records} records per request, got {len(records)}")
+            return np.array([self._record_to_row(record,position) for position,record in enumerate(records)],
+                            dtype=np.float64)
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def records_from_packed(self,body:bytes,max_records:int=None)->np.ndarray:
+        try:
+            # row-major int8, n_features bytes per record in schema order, -128 for a missing value;
+            # the rows stay int8 all the way to the estimator
+            if not body or len(body)%self.n_features:
+                raise SchemaValidationError(f"packed body must be a multiple of {self.n_features} bytes, got {len(body)}")
+            n_records=len(body)//self.n_features
+            if max_records is not None and n_records>max_records:
+                raise SchemaValidationError(f"at most {max_records} records per request, got {n_records}")
+            return np.frombuffer(body,dtype=np.int8).reshape(n_records,self.n_features).copy()
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+
+# schema.yaml compiled once into column order, dtypes and the allowed value domain, then applied to whole
+# frames or feature matrices in vectorised passes. Structural problems (names, order, dtypes) are returned
+# together instead of stopping at the first one; value checks work per row so valid rows can be kept.
+class SchemaValidator:
+    def __init__(self,schema_file_path:str=SCHEMA_FILE_PATH,target_column:str=TARGET_COLUMN):
+        try:
+            schema_config=read_yaml_file(schema_file_path)
+            self.dtypes={name:str(dtype).strip() for column in schema_config["columns"] for name,dtype in column.items()}
+            self.columns=list(self.dtypes)
+            self.target_column=target_column
+            self.feature_columns=[column for column in self.columns if column!=target_column]
+            self.allowed_values=np.array(sorted(schema_config.get("allowed_values",[])),dtype=np.float64)
+            self.allow_missing_features=bool(schema_config.get("allow_missing_features",True))
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def check_columns(self,columns,require_target:bool=True,strict:bool=True)->list:
+        # strict: exactly the schema columns in schema order; otherwise extra columns and any order are fine
+        expected=self.columns if require_target else self.feature_columns
+        columns=[str(column) for column in columns]
+        errors=[]
+        missing=[column for column in expected if column not in set(columns)]
+        if missing:
+            errors.append(f"missing columns {missing}")
+        if strict:
+            unexpected=[column for column in columns if column not in set(self.columns)]
+            if unexpected:
+                errors.append(f"unexpected columns {unexpected}")
+            if not missing and not unexpected:
+                for position,(expected_column,column) in enumerate(zip(expected,columns)):
+                    if expected_column!=column:
+                        errors.append(f"column {position} is {column}, expected {expected_column}")
+                        break
+        return errors
+
+    def check_dtypes(self,dataframe)->list:
+        # integer columns come back as floats once they hold NaN, the value check catches non-integral values.
+        # A header-only CSV reads every column as object, which says nothing about the values
+        errors=[]
+        if not len(dataframe):
+            return errors
+        for column in self.columns:
+            if column not in dataframe.columns:
+                continue
+            dtype=dataframe[column].dtype
+            if self.dtypes[column].startswith("int") and (dtype.kind not in "iuf"):
+                errors.append(f"{column} has dtype {dtype}, expected {self.dtypes[column]}")
+        return errors
+
+    def check_structure(self,dataframe,require_target:bool=True,strict:bool=True)->list:
+        try:
+            return self.check_columns(dataframe.columns,require_target=require_target,strict=strict)+self.check_dtypes(dataframe)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _valid_cells(self,values:np.ndarray,columns:list)->np.ndarray:
+        missing=missing_mask(values)
+        valid=np.isin(values,self.allowed_values) if len(self.allowed_values) else ~missing
+        nullable=np.array([self.allow_missing_features and column!=self.target_column for column in columns])
+        return valid|(missing&nullable)
+
+    def split_rows(self,dataframe):
+        # returns (valid rows, invalid rows, {column: number of invalid values}) of a structurally valid frame
+        try:
+            # int8 frames are checked as they are, without a float64 copy
+            values=dataframe[self.columns].to_numpy()
+            valid_cells=self._valid_cells(values,self.columns)
+            valid_rows=valid_cells.all(axis=1)
+            invalid_counts=(~valid_cells).sum(axis=0)
+            invalid_columns={column:int(count) for column,count in zip(self.columns,invalid_counts) if count}
+            return dataframe[valid_rows],dataframe[~valid_rows],invalid_columns
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def check_features(self,features:np.ndarray):
+        # features in feature_columns order; raises SchemaValidationError naming the first bad value
+        valid_cells=self._valid_cells(features,self.feature_columns)
+        if not valid_cells.all():
+            invalid=np.argwhere(~valid_cells)
+            row,column=invalid[0]
+            n_rows=len(np.unique(invalid[:,0]))
+            raise SchemaValidationError(f"record {row}: {self.feature_columns[column]} must be one of "
+                                        f"{self.allowed_values.astype(int).tolist()}, got {features[row,column]:g}"
+                                        f" ({n_rows} invalid records)")
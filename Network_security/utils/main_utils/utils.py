@@ -2,12 +2,16 @@ import yaml
 from Network_security.exception.exception import NetworkSecurityException
 from Network_security.logging.logger import logging
 import os,sys
+import hashlib
+import json
 import numpy as np
+import pandas as pd
 import dill
 import pickle
 
 from sklearn.metrics import accuracy_score
-from sklearn.model_selection import GridSearchCV
+from Network_security.utils.ml_utils.model.search import ModelSearch
+from Network_security.utils.ml_utils.tracking.profiler import profile_span
 
 def read_yaml_file(file_path: str)->dict:
     try:
@@ -31,18 +35,63 @@ def save_numpy_array(file_path:str,array:np.array):
     try:
         dir_path=os.path.dirname(file_path)
         os.makedirs(dir_path,exist_ok=True)
-        with open(file_path,"wb") as file_obj:
-            np.save(file_obj,array)
+        with profile_span("save_numpy_array",rows=len(array),file=os.path.basename(file_path)):
+            with open(file_path,"wb") as file_obj:
+                np.save(file_obj,array)
     except Exception as e:
         raise NetworkSecurityException(e,sys)
     
+def compact_dataframe(dataframe:pd.DataFrame)->pd.DataFrame:
+    try:
+        # every feature is in {-1,0,1}, so int8 (or float32 where NaNs are present) loses nothing
+        compacted={}
+        for column in dataframe.columns:
+            if pd.api.types.is_integer_dtype(dataframe[column]):
+                compacted[column]=pd.to_numeric(dataframe[column],downcast="integer")
+            elif pd.api.types.is_float_dtype(dataframe[column]):
+                compacted[column]=pd.to_numeric(dataframe[column],downcast="float")
+            else:
+                compacted[column]=dataframe[column]
+        return pd.DataFrame(compacted,index=dataframe.index)
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+def save_dataframe(file_path:str,dataframe:pd.DataFrame,export_csv:bool=False)->None:
+    try:
+        dir_path=os.path.dirname(file_path)
+        os.makedirs(dir_path,exist_ok=True)
+        with profile_span("save_dataframe",rows=len(dataframe),file=os.path.basename(file_path)):
+            if file_path.endswith(".parquet"):
+                dataframe.to_parquet(file_path,index=False)
+                if export_csv:
+                    dataframe.to_csv(file_path.replace(".parquet",".csv"),index=False,header=True)
+            else:
+                dataframe.to_csv(file_path,index=False,header=True)
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+def load_dataframe(file_path:str)->pd.DataFrame:
+    try:
+        with profile_span("load_dataframe",file=os.path.basename(file_path)) as span:
+            if file_path.endswith(".parquet"):
+                dataframe=pd.read_parquet(file_path,memory_map=True)
+            else:
+                dataframe=pd.read_csv(file_path)
+            span.rows=len(dataframe)
+            return dataframe
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
 def save_object(file_path:str,obj:object)->None:
     try:
         logging.info("Entered the save_object method of MainUtils class")
         dir_path=os.path.dirname(file_path)
         os.makedirs(dir_path,exist_ok=True)
-        with open(file_path,"wb") as file_obj:
+        # write next to the target and swap it in, so readers never see a half written pickle
+        tmp_file_path=f"{file_path}.tmp"
+        with open(tmp_file_path,"wb") as file_obj:
             pickle.dump(obj,file_obj)
+        os.replace(tmp_file_path,file_path)
         logging.info("Exited the save_object method of MainUtils class")
     except Exception as e:
         raise NetworkSecurityException(e,sys)
@@ -50,42 +99,59 @@ def save_object(file_path:str,obj:object)->None:
 def load_object(file_path:str,)->object:
     try:
         if not os.path.exists(file_path):
-            raise Exception("The file: {file_path} does not exist")
+            raise Exception(f"The file: {file_path} does not exist")
         with open(file_path,'rb') as file_obj:
-            print(file_obj)
             return pickle.load(file_obj)
     except Exception as e:
         raise NetworkSecurityException(e,sys)
     
-def load_numpy_array(file_path:str)->np.array:
+def load_numpy_array(file_path:str,mmap_mode:str=None)->np.array:
     try:
-        with open(file_path,'rb') as file_obj:
-            return np.load(file_obj)
+        return np.load(file_path,mmap_mode=mmap_mode)
     except Exception as e:
         raise NetworkSecurityException(e,sys)
     
-def evaluate_models(x_train,y_train,x_test,y_test,models,param):
+def compute_file_hash(file_path:str)->str:
     try:
-        report={}
-        for i  in range(len(list(models))):
-            model=list(models.values())[i]
-            para=param[list(models.keys())[i]]
-
-            gs=GridSearchCV(model,para,cv=3)
-            gs.fit(x_train,y_train)
+        file_hash=hashlib.sha256()
+        with open(file_path,"rb") as file_obj:
+            for block in iter(lambda:file_obj.read(1024*1024),b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
 
-            model.set_params(**gs.best_params_)
-            model.fit(x_train,y_train)
+def compute_dataframe_hash(dataframe:pd.DataFrame)->str:
+    try:
+        dataframe_hash=hashlib.sha256(json.dumps(list(map(str,dataframe.columns))).encode())
+        dataframe_hash.update(pd.util.hash_pandas_object(dataframe,index=False).values.tobytes())
+        return dataframe_hash.hexdigest()
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
 
-            y_train_pred=model.predict(x_train)
-            y_test_pred=model.predict(x_test)
+def compute_object_hash(obj:object)->str:
+    try:
+        content=json.dumps(obj,sort_keys=True,default=repr)
+        return hashlib.sha256(content.encode()).hexdigest()
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
 
-            train_model_score = accuracy_score(y_train, y_train_pred)
-            test_model_score = accuracy_score(y_test, y_test_pred)
+def evaluate_models(x_train,y_train,x_test,y_test,models,param,cv=3,n_jobs=-1,strategy="grid",factor=3,
+                    max_fits=None,max_seconds=None):
+    try:
+        # returns {model_name: ModelSearchResult} with the refit winner of every family and its predictions
+        search_results=ModelSearch(models=models,param=param,cv=cv,n_jobs=n_jobs,strategy=strategy,factor=factor,
+                                   max_fits=max_fits,max_seconds=max_seconds).search(x_train,y_train,x_test=x_test)
+        for model_name,search_result in search_results.items():
+            # the search already refit the winner on the full training set, hand that estimator back
+            models[model_name]=search_result.best_estimator
 
-            report[list(models.keys())[i]] = test_model_score
+            search_result.train_score = accuracy_score(y_train, search_result.train_predictions)
+            search_result.test_score = accuracy_score(y_test, search_result.test_predictions)
+            logging.info(f"{model_name}: params {search_result.best_params}, cv score {search_result.best_score:.4f}, "
+                         f"train score {search_result.train_score:.4f}, test score {search_result.test_score:.4f}")
 
-        return report
+        return search_results
     
     except Exception as e:
         raise NetworkSecurityException(e,sys)
@@ -0,0 +1,108 @@
+import sys
+import numpy as np
+import pandas as pd
+from joblib import Parallel,delayed
+from scipy.stats import chi2,ks_2samp
+from Network_security.entity.artifact_entity import DriftReportArtifact
+from Network_security.exception.exception import NetworkSecurityException
+
+DRIFT_METHODS=("chi2","psi")
+# columns are handed to worker threads in blocks of this size once a schema is wider than one block
+COLUMN_BLOCK_SIZE=64
+PSI_EPSILON=1e-4
+
+
+def _category_counts(values:np.ndarray,categories:np.ndarray)->np.ndarray:
+    # (n_categories, n_columns) counts for every column in one pass per category; NaN matches nothing
+    return np.stack([(values==category).sum(axis=0) for category in categories])
+
+
+def _discrete_block_report(base:np.ndarray,current:np.ndarray,categories:np.ndarray,method:str)->dict:
+    base_counts=_category_counts(base,categories).astype(np.float64)
+    current_counts=_category_counts(current,categories).astype(np.float64)
+    base_total=base_counts.sum(axis=0)
+    current_total=current_counts.sum(axis=0)
+
+    if method=="psi":
+        base_share=np.maximum(base_counts/np.maximum(base_total,1),PSI_EPSILON)
+        current_share=np.maximum(current_counts/np.maximum(current_total,1),PSI_EPSILON)
+        statistic=((current_share-base_share)*np.log(current_share/base_share)).sum(axis=0)
+        return {"statistic":statistic,"p_value":np.full(statistic.shape,np.nan)}
+
+    # chi-square test of homogeneity on the 2 x n_categories table of each column
+    category_total=base_counts+current_counts
+    grand_total=np.maximum(base_total+current_total,1)
+    observed=np.stack([base_counts,current_counts])
+    expected=np.stack([base_total,current_total])[:,None,:]*category_total[None,:,:]/grand_total
+    with np.errstate(divide="ignore",invalid="ignore"):
+        cells=np.where(expected>0,(observed-expected)**2/expected,0.0)
+    statistic=cells.sum(axis=(0,1))
+    dof=(category_total>0).sum(axis=0)-1
+    p_value=np.where(dof>0,chi2.sf(statistic,np.maximum(dof,1)),1.0)
+    return {"statistic":statistic,"p_value":p_value}
+
+
+def _continuous_block_report(base:np.ndarray,current:np.ndarray)->dict:
+    statistic=[]
+    p_value=[]
+    for column in range(base.shape[1]):
+        result=ks_2samp(base[:,column][~np.isnan(base[:,column])],current[:,column][~np.isnan(current[:,column])])
+        statistic.append(result.statistic)
+        p_value.append(result.pvalue)
+    return {"statistic":np.asarray(statistic),"p_value":np.asarray(p_value)}
+
+
+def _run_blocks(block_function,base:np.ndarray,current:np.ndarray,n_jobs:int,*args)->dict:
+    if base.shape[1]==0:
+        return {"statistic":np.empty(0),"p_value":np.empty(0)}
+    blocks=[slice(start,start+COLUMN_BLOCK_SIZE) for start in range(0,base.shape[1],COLUMN_BLOCK_SIZE)]
+    if len(blocks)==1:
+        return block_function(base,current,*args)
+    results=Parallel(n_jobs=n_jobs,prefer="threads")(
+        delayed(block_function)(base[:,block],current[:,block],*args) for block in blocks
+    )
+    return {key:np.concatenate([result[key] for result in results]) for key in ("statistic","p_value")}
+
+
+def get_drift_report(base_df:pd.DataFrame,current_df:pd.DataFrame,method:str="chi2",thresold:float=0.05,
+                     psi_thresold:float=0.2,max_categories:int=20,n_jobs:int=-1)->DriftReportArtifact:
+    try:
+        if method not in DRIFT_METHODS:
+            raise ValueError(f"method must be one of {DRIFT_METHODS}, got {method!r}")
+        columns=list(base_df.columns)
+        base=base_df[columns].to_numpy(dtype=np.float64)
+        current=current_df[columns].to_numpy(dtype=np.float64)
+
+        # low cardinality columns (all of the {-1,0,1} features) are compared on value counts, anything else with KS
+        cardinality=pd.concat([base_df[columns],current_df[columns]],ignore_index=True).nunique().to_numpy()
+        discrete=cardinality<=max_categories
+        categories=np.unique(np.concatenate([base[:,discrete].ravel(),current[:,discrete].ravel()]))
+        categories=categories[~np.isnan(categories)]
+
+        discrete_report=_run_blocks(_discrete_block_report,base[:,discrete],current[:,discrete],n_jobs,categories,method)
+        continuous_report=_run_blocks(_continuous_block_report,base[:,~discrete],current[:,~discrete],n_jobs)
+
+        column_report={}
+        discrete_columns=[column for column,is_discrete in zip(columns,discrete) if is_discrete]
+        continuous_columns=[column for column,is_discrete in zip(columns,discrete) if not is_discrete]
+        for column_method,names,report in ((method,discrete_columns,discrete_report),
+                                           ("ks",continuous_columns,continuous_report)):
+            for column,statistic,p_value in zip(names,report["statistic"],report["p_value"]):
+                if column_method=="psi":
+                    drift_status=bool(statistic>psi_thresold)
+                else:
+                    drift_status=bool(p_value<thresold)
+                column_report[column]={
+                    "method":column_method,
+                    "statistic":float(statistic),
+                    "p_value":None if np.isnan(p_value) else float(p_value),
+                    "drift_status":drift_status,
+                }
+
+        drifted_columns=[column for column in columns if column_report[column]["drift_status"]]
+        return DriftReportArtifact(drift_found=bool(drifted_columns),
+                                   drifted_columns=drifted_columns,
+                                   method=method,
+                                   column_report={column:column_report[column] for column in columns})
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
@@ -0,0 +1,192 @@
+import os,sys
+import hashlib
+import io
+import json
+import mmap
+import pickle
+import shutil
+from datetime import datetime
+import numpy as np
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import (
+    MODEL_BUNDLE_FORMAT_VERSION,MODEL_BUNDLE_MANIFEST_FILE_NAME,MODEL_BUNDLE_ARRAYS_FILE_NAME,
+    MODEL_BUNDLE_LATEST_FILE_NAME,MODEL_BUNDLE_VERSIONS_DIR,MODEL_BUNDLE_ARRAY_MIN_BYTES,MODEL_BUNDLE_KEEP_VERSIONS
+)
+from Network_security.utils.ml_utils.model.estimator import NetworkModel
+
+# offsets in arrays.bin are aligned so every array can be viewed in place
+ARRAY_ALIGNMENT=64
+
+
+# A model bundle is one directory:
+#   manifest.json   version, schema, feature order, metrics, training data hash and the index of arrays.bin
+#   <name>.pkl      one pickle per object (preprocessor, model, compiled_model)
+#   arrays.bin      every large numeric array of those objects, back to back
+# The pickles only hold references into arrays.bin, so loading maps the file once and hands out read-only
+# views: the OS page cache is shared by every process serving the same bundle.
+class _ArrayPickler(pickle.Pickler):
+    def __init__(self,file_obj,arrays_file,array_index:dict):
+        super().__init__(file_obj,protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_file=arrays_file
+        self.array_index=array_index
+        self.written={}
+
+    def persistent_id(self,obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes<MODEL_BUNDLE_ARRAY_MIN_BYTES:
+            return None
+        # the same array shared by two objects is stored once
+        key=self.written.get(id(obj))
+        if key is None:
+            array=np.ascontiguousarray(obj)
+            padding=-self.arrays_file.tell()%ARRAY_ALIGNMENT
+            self.arrays_file.write(b"\0"*padding)
+            key=str(len(self.array_index))
+            self.array_index[key]={"offset":self.arrays_file.tell(),"shape":list(array.shape),
+                                   "dtype":np.lib.format.dtype_to_descr(array.dtype)}
+            self.arrays_file.write(array.tobytes())
+            self.written[id(obj)]=key
+        return ("ndarray",key)
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self,file_obj,arrays_buffer,array_index:dict):
+        super().__init__(file_obj)
+        self.arrays_buffer=arrays_buffer
+        self.array_index=array_index
+
+    def persistent_load(self,pid):
+        _,key=pid
+        entry=self.array_index[key]
+        dtype=np.lib.format.descr_to_dtype(_descr_from_json(entry["dtype"]))
+        count=int(np.prod(entry["shape"]))
+        return np.frombuffer(self.arrays_buffer,dtype=dtype,count=count,offset=entry["offset"]).reshape(entry["shape"])
+
+
+def _descr_from_json(descr):
+    # JSON turns the (name, type) tuples of structured dtypes into lists
+    if isinstance(descr,list):
+        return [tuple(_descr_from_json(part) for part in field) for field in descr]
+    return descr
+
+
+def save_model_bundle(bundle_dir:str,objects:dict,manifest:dict)->dict:
+    try:
+        tmp_dir=f"{bundle_dir}.tmp"
+        shutil.rmtree(tmp_dir,ignore_errors=True)
+        os.makedirs(tmp_dir)
+        array_index={}
+        digest=hashlib.sha256()
+        object_files={}
+        with open(os.path.join(tmp_dir,MODEL_BUNDLE_ARRAYS_FILE_NAME),"wb") as arrays_file:
+            for name,obj in objects.items():
+                buffer=io.BytesIO()
+                _ArrayPickler(buffer,arrays_file,array_index).dump(obj)
+                object_files[name]=f"{name}.pkl"
+                with open(os.path.join(tmp_dir,object_files[name]),"wb") as file_obj:
+                    file_obj.write(buffer.getvalue())
+                digest.update(buffer.getvalue())
+        with open(os.path.join(tmp_dir,MODEL_BUNDLE_ARRAYS_FILE_NAME),"rb") as arrays_file:
+            for block in iter(lambda:arrays_file.read(1<<20),b""):
+                digest.update(block)
+
+        manifest={**manifest,
+                  "format_version":MODEL_BUNDLE_FORMAT_VERSION,
+                  "version":digest.hexdigest()[:12],
+                  "created_at":datetime.now().isoformat(),
+                  "objects":object_files,
+                  "arrays":array_index}
+        with open(os.path.join(tmp_dir,MODEL_BUNDLE_MANIFEST_FILE_NAME),"w") as file_obj:
+            json.dump(manifest,file_obj,indent=2,default=str)
+
+        shutil.rmtree(bundle_dir,ignore_errors=True)
+        os.replace(tmp_dir,bundle_dir)
+        logging.info(f"Saved model bundle {manifest['version']} to {bundle_dir} with {len(array_index)} mapped arrays")
+        return manifest
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def read_manifest(bundle_dir:str)->dict:
+    try:
+        with open(os.path.join(bundle_dir,MODEL_BUNDLE_MANIFEST_FILE_NAME)) as file_obj:
+            return json.load(file_obj)
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def load_model_bundle(bundle_dir:str,object_names:list=None,use_mmap:bool=True):
+    # returns ({name: object}, manifest); object_names limits which pickles are read
+    try:
+        manifest=read_manifest(bundle_dir)
+        arrays_file_path=os.path.join(bundle_dir,MODEL_BUNDLE_ARRAYS_FILE_NAME)
+        arrays_buffer=b""
+        if os.path.getsize(arrays_file_path):
+            with open(arrays_file_path,"rb") as file_obj:
+                if use_mmap:
+                    arrays_buffer=mmap.mmap(file_obj.fileno(),0,access=mmap.ACCESS_READ)
+                else:
+                    arrays_buffer=bytearray(file_obj.read())
+        objects={}
+        for name in object_names or manifest["objects"]:
+            with open(os.path.join(bundle_dir,manifest["objects"][name]),"rb") as file_obj:
+                objects[name]=_ArrayUnpickler(file_obj,arrays_buffer,manifest["arrays"]).load()
+        return objects,manifest
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def load_network_model(bundle_dir:str,prefer_compiled:bool=True,use_mmap:bool=True):
+    # with prefer_compiled, the flattened trees are loaded next to the sklearn model and answer small calls
+    try:
+        manifest=read_manifest(bundle_dir)
+        object_names=["preprocessor","model"]
+        if prefer_compiled and "compiled_model" in manifest["objects"]:
+            object_names.append("compiled_model")
+        objects,manifest=load_model_bundle(bundle_dir,object_names,use_mmap=use_mmap)
+        return NetworkModel(preprocessor=objects["preprocessor"],model=objects["model"],
+                            compiled_model=objects.get("compiled_model")),manifest
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def read_latest_bundle_dir(model_dir:str):
+    # the bundle LATEST points at, or None when nothing has been published
+    try:
+        latest_file_path=os.path.join(model_dir,MODEL_BUNDLE_LATEST_FILE_NAME)
+        if not os.path.exists(latest_file_path):
+            return None
+        with open(latest_file_path) as file_obj:
+            version=file_obj.read().strip()
+        return os.path.join(model_dir,MODEL_BUNDLE_VERSIONS_DIR,version)
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def publish_model_bundle(bundle_dir:str,model_dir:str,keep_versions:int=MODEL_BUNDLE_KEEP_VERSIONS)->str:
+    # copies a saved bundle under model_dir/versions/<version> and then flips LATEST to it
+    try:
+        version=read_manifest(bundle_dir)["version"]
+        versions_dir=os.path.join(model_dir,MODEL_BUNDLE_VERSIONS_DIR)
+        version_dir=os.path.join(versions_dir,version)
+        if not os.path.exists(version_dir):
+            tmp_dir=f"{version_dir}.tmp"
+            shutil.rmtree(tmp_dir,ignore_errors=True)
+            shutil.copytree(bundle_dir,tmp_dir)
+            os.replace(tmp_dir,version_dir)
+
+        latest_file_path=os.path.join(model_dir,MODEL_BUNDLE_LATEST_FILE_NAME)
+        with open(f"{latest_file_path}.tmp","w") as file_obj:
+            file_obj.write(version)
+        os.replace(f"{latest_file_path}.tmp",latest_file_path)
+
+        # processes still serving an old version keep their mapping after the files are removed
+        published=sorted((entry for entry in os.scandir(versions_dir) if entry.is_dir() and entry.name!=version
+                          and not entry.name.endswith(".tmp")),key=lambda entry:entry.stat().st_mtime)
+        for entry in published[:max(0,len(published)-(keep_versions-1))]:
+            shutil.rmtree(entry.path,ignore_errors=True)
+        logging.info(f"Published model bundle {version} to {model_dir}")
+        return version
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
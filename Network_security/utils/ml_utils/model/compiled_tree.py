@@ -0,0 +1,165 @@
+import sys
+import numpy as np
+from scipy.special import expit,softmax
+from sklearn.ensemble import GradientBoostingClassifier,RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+
+# rows are traversed in blocks so the (rows x trees) node matrix stays small for large batches
+ROW_BLOCK_SIZE=4096
+# features are ternary, so with integral inputs every node's next node can be looked up per value
+DISCRETE_VALUES=np.array([-1.0,0.0,1.0])
+# larger integral batches are deduplicated first, repeated feature vectors are traversed once
+DEDUPLICATE_MIN_ROWS=64
+
+
+# Every tree of a fitted ensemble flattened into shared node arrays. Leaves point back to themselves, so
+# all (row, tree) pairs can step down together for max_depth vectorised iterations without checking for
+# leaves. Exposes classes_, predict_proba and predict, which is all NetworkModel needs from a model.
+class CompiledTreeEnsemble:
+    def __init__(self,kind:str,classes,feature,threshold,left,right,value,roots,max_depth:int,
+                 n_features_in:int,learning_rate:float=1.0,init_raw=None):
+        try:
+            self.kind=kind
+            self.classes_=np.asarray(classes)
+            self.feature=feature
+            self.threshold=threshold
+            self.left=left
+            self.right=right
+            self.value=value
+            self.roots=roots
+            self.max_depth=max_depth
+            self.n_features_in_=n_features_in
+            self.learning_rate=learning_rate
+            self.init_raw=init_raw
+            # next node for an input of -1, 0 or 1 at every node, used when the batch is integral
+            goes_left=DISCRETE_VALUES[None,:]<=threshold[:,None]
+            self.discrete_next=np.where(goes_left,left[:,None],right[:,None]).astype(np.intp).ravel()
+            self.is_leaf=left==np.arange(len(left))
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _leaves(self,x:np.ndarray,discrete:bool)->np.ndarray:
+        # leaf node index for every (row, tree); only the pairs that have not reached a leaf keep stepping
+        n_trees=len(self.roots)
+        nodes=np.tile(self.roots.astype(np.intp),len(x))
+        row_offsets=np.repeat(np.arange(len(x),dtype=np.intp)*x.shape[1],n_trees)
+        active=np.flatnonzero(~self.is_leaf[nodes])
+        values=(x+1).astype(np.intp).ravel() if discrete else x.ravel()
+        for _ in range(self.max_depth):
+            if not len(active):
+                break
+            current=nodes[active]
+            inputs=values.take(row_offsets.take(active)+self.feature.take(current))
+            if discrete:
+                following=self.discrete_next.take(current*3+inputs)
+            else:
+                following=np.where(inputs<=self.threshold.take(current),self.left.take(current),self.right.take(current))
+            nodes[active]=following
+            active=active[~self.is_leaf.take(following)]
+        return nodes.reshape(len(x),n_trees)
+
+    def _predict_block(self,x:np.ndarray)->np.ndarray:
+        discrete=bool(np.isin(x,DISCRETE_VALUES).all())
+        if discrete and len(x)>=DEDUPLICATE_MIN_ROWS and x.shape[1]<=39:
+            # base-3 code of each row fits an int64 for up to 39 features
+            row_keys=(x+1).astype(np.int64)@(3**np.arange(x.shape[1],dtype=np.int64))
+            _,first_rows,inverse=np.unique(row_keys,return_index=True,return_inverse=True)
+            if len(first_rows)<len(x):
+                return self._predict_block(x[first_rows])[inverse.reshape(-1)]
+        leaf_values=self.value.take(self._leaves(x,discrete),axis=0)
+        if self.kind=="forest":
+            return leaf_values.mean(axis=1)
+        # boosting: leaves hold raw scores, trees are laid out iteration by iteration, one per class output
+        n_outputs=len(self.init_raw)
+        raw=self.init_raw+self.learning_rate*leaf_values.reshape(len(x),-1,n_outputs).sum(axis=1)
+        if n_outputs==1:
+            proba=expit(raw[:,0])
+            return np.column_stack([1-proba,proba])
+        return softmax(raw,axis=1)
+
+    def predict_proba(self,x)->np.ndarray:
+        try:
+            # same float32 inputs sklearn's trees compare against their float64 thresholds
+            x=np.asarray(x,dtype=np.float32).astype(np.float64)
+            if len(x)<=ROW_BLOCK_SIZE:
+                return self._predict_block(x)
+            return np.concatenate([self._predict_block(x[start:start+ROW_BLOCK_SIZE])
+                                   for start in range(0,len(x),ROW_BLOCK_SIZE)])
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def predict(self,x)->np.ndarray:
+        try:
+            return self.classes_[self.predict_proba(x).argmax(axis=1)]
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+
+def _flatten_trees(trees:list,leaf_values:list):
+    offsets=np.cumsum([0]+[tree.node_count for tree in trees])
+    feature=[]
+    threshold=[]
+    left=[]
+    right=[]
+    for tree,offset in zip(trees,offsets):
+        is_leaf=tree.children_left==-1
+        node_ids=np.arange(tree.node_count)+offset
+        feature.append(np.where(is_leaf,0,tree.feature))
+        threshold.append(np.where(is_leaf,np.inf,tree.threshold))
+        left.append(np.where(is_leaf,node_ids,tree.children_left+offset))
+        right.append(np.where(is_leaf,node_ids,tree.children_right+offset))
+    return (np.concatenate(feature).astype(np.intp),np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left).astype(np.int32),np.concatenate(right).astype(np.int32),
+            np.concatenate(leaf_values),offsets[:-1].astype(np.int32),max(tree.max_depth for tree in trees))
+
+
+def compile_tree_model(model):
+    # returns a CompiledTreeEnsemble for supported fitted tree models, None for anything else
+    try:
+        if isinstance(model,(RandomForestClassifier,DecisionTreeClassifier)):
+            estimators=model.estimators_ if isinstance(model,RandomForestClassifier) else [model]
+            if getattr(model,"n_outputs_",1)!=1:
+                return None
+            trees=[estimator.tree_ for estimator in estimators]
+            # per-tree class distributions, normalised the way DecisionTreeClassifier.predict_proba does
+            leaf_values=[]
+            for tree in trees:
+                value=tree.value[:,0,:]
+                total=value.sum(axis=1,keepdims=True)
+                leaf_values.append(np.divide(value,total,out=np.zeros_like(value),where=total>0))
+            feature,threshold,left,right,value,roots,max_depth=_flatten_trees(trees,leaf_values)
+            return CompiledTreeEnsemble("forest",model.classes_,feature,threshold,left,right,value,roots,
+                                        max_depth,model.n_features_in_)
+
+        if isinstance(model,GradientBoostingClassifier):
+            if model.loss!="log_loss" or model.init not in (None,"zero"):
+                return None
+            # iteration-major order, matching the (n_estimators, n_outputs) layout of estimators_
+            trees=[estimator.tree_ for estimator in model.estimators_.ravel()]
+            leaf_values=[tree.value[:,0,0] for tree in trees]
+            feature,threshold,left,right,value,roots,max_depth=_flatten_trees(trees,leaf_values)
+            n_outputs=model.estimators_.shape[1]
+            compiled=CompiledTreeEnsemble("boosting",model.classes_,feature,threshold,left,right,value,roots,
+                                          max_depth,model.n_features_in_,learning_rate=model.learning_rate,
+                                          init_raw=np.zeros(n_outputs))
+            # the init estimator only contributes a constant, recovered from one decision_function call
+            probe=np.zeros((1,model.n_features_in_))
+            tree_raw=compiled.value[compiled._leaves(probe,discrete=True)].reshape(1,-1,n_outputs).sum(axis=1)[0]
+            compiled.init_raw=np.ravel(model.decision_function(probe))-model.learning_rate*tree_raw
+            return compiled
+        return None
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def check_parity(model,compiled:CompiledTreeEnsemble,x,atol:float=1e-6)->bool:
+    try:
+        same_labels=np.array_equal(model.predict(x),compiled.predict(x))
+        max_diff=float(np.abs(model.predict_proba(x)-compiled.predict_proba(x)).max())
+        logging.info(f"Compiled model parity on {len(x)} rows: labels equal={same_labels}, max probability diff={max_diff:.2e}")
+        return same_labels and max_diff<=atol
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
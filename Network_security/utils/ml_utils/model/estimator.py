@@ -1,21 +1,58 @@
-from Network_security.constants.training_pipeline import SAVED_MODEL_DIR,MODEL_FILE_NAME
+from Network_security.constants.training_pipeline import SAVED_MODEL_DIR,MODEL_FILE_NAME,MODEL_COMPILED_MAX_ROWS
 import os,sys
+import time
 from Network_security.exception.exception import NetworkSecurityException
 from Network_security.logging.logger import logging
 
 class NetworkModel:
-    def __init__(self,preprocessor,model):
+    # compiled_model, when given, is a flattened copy of model that answers calls of up to compiled_max_rows rows
+    def __init__(self,preprocessor,model,compiled_model=None,compiled_max_rows:int=MODEL_COMPILED_MAX_ROWS):
         try:
             self.preprocessor=preprocessor
             self.model=model
+            self.compiled_model=compiled_model
+            self.compiled_max_rows=compiled_max_rows
         except Exception as e:
             raise NetworkSecurityException(e,sys)
+
+    def model_for(self,n_rows:int):
+        # models pickled before compiled_model existed have neither attribute
+        compiled_model=getattr(self,"compiled_model",None)
+        if compiled_model is not None and n_rows<=getattr(self,"compiled_max_rows",MODEL_COMPILED_MAX_ROWS):
+            return compiled_model
+        return self.model
         
     def predict(self,x):
         try:
             x_transform=self.preprocessor.transform(x)
-            y_hat=self.model.predict(x_transform)
+            y_hat=self.model_for(len(x_transform)).predict(x_transform)
             return y_hat 
         except Exception as e:
             raise NetworkSecurityException(e,sys)
+
+    def score(self,x,timings:dict=None):
+        try:
+            # labels plus the probability of the positive (phishing) class from one preprocessing pass;
+            # probabilities is None for models without predict_proba.
+            # timings, when given, receives preprocess_seconds and model_seconds
+            start=time.perf_counter()
+            x_transform=self.preprocessor.transform(x)
+            if timings is not None:
+                timings["preprocess_seconds"]=time.perf_counter()-start
+                start=time.perf_counter()
+            model=self.model_for(len(x_transform))
+            if not hasattr(model,"predict_proba"):
+                labels=model.predict(x_transform)
+                if timings is not None:
+                    timings["model_seconds"]=time.perf_counter()-start
+                return labels,None
+            proba=model.predict_proba(x_transform)
+            if timings is not None:
+                timings["model_seconds"]=time.perf_counter()-start
+            classes=model.classes_
+            labels=classes[proba.argmax(axis=1)]
+            positive=list(classes).index(1) if 1 in classes else len(classes)-1
+            return labels,proba[:,positive]
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
         
\ No newline at end of file
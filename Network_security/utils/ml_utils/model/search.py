@@ -0,0 +1,186 @@
+import sys
+import math
+import time
+from dataclasses import dataclass
+import numpy as np
+from joblib import Parallel,delayed,effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid,StratifiedKFold
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.utils.ml_utils.tracking.profiler import profile_span
+
+SEARCH_STRATEGIES=("grid","halving")
+
+
+@dataclass
+class ModelSearchResult:
+    best_params:dict
+    best_score:float
+    best_estimator:object
+    n_candidates:int
+    # predictions of the refit winner, made in the same worker that fit it
+    train_predictions:np.ndarray=None
+    test_predictions:np.ndarray=None
+    # accuracies of those predictions, filled in by evaluate_models
+    train_score:float=None
+    test_score:float=None
+
+
+# both also return the seconds they spent in the worker, so the time each family costs can be reported
+def _fit_and_score(estimator,params,x,y,train_idx,test_idx):
+    start=time.perf_counter()
+    estimator=clone(estimator).set_params(**params)
+    estimator.fit(x[train_idx],y[train_idx])
+    return accuracy_score(y[test_idx],estimator.predict(x[test_idx])),time.perf_counter()-start
+
+
+def _refit(estimator,params,x,y,x_test=None):
+    start=time.perf_counter()
+    estimator=clone(estimator).set_params(**params).fit(x,y)
+    test_predictions=estimator.predict(x_test) if x_test is not None else None
+    return estimator,estimator.predict(x),test_predictions,time.perf_counter()-start
+
+
+# Hyperparameter search over several model families at once. Every (model, params, fold) fit goes to
+# one shared joblib pool instead of one GridSearchCV per model, and each family's winner is refit once.
+# strategy="halving" runs successive halving on growing subsamples, and max_fits / max_seconds stop
+# launching new work once the budget is spent (the first candidate of every family always runs).
+class ModelSearch:
+    def __init__(self,models:dict,param:dict,cv:int=3,n_jobs:int=-1,strategy:str="grid",factor:int=3,
+                 max_fits:int=None,max_seconds:float=None,random_state:int=42):
+        try:
+            if strategy not in SEARCH_STRATEGIES:
+                raise ValueError(f"strategy must be one of {SEARCH_STRATEGIES}, got {strategy!r}")
+            self.models=models
+            self.param=param
+            self.cv=cv
+            self.n_jobs=n_jobs
+            self.strategy=strategy
+            self.factor=factor
+            self.max_fits=max_fits
+            self.max_seconds=max_seconds
+            self.random_state=random_state
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _budget_spent(self)->bool:
+        if self.max_fits is not None and self.n_fits>=self.max_fits:
+            return True
+        if self.max_seconds is not None and time.perf_counter()-self.start_time>=self.max_seconds:
+            return True
+        return False
+
+    def _score_candidates(self,parallel,candidates,x,y,sample_idx):
+        # candidates is a list of (model_name, params); returns their mean cv scores in the same order
+        folds=list(StratifiedKFold(n_splits=self.cv).split(sample_idx,y[sample_idx]))
+        results=parallel(
+            delayed(_fit_and_score)(self.models[model_name],params,x,y,sample_idx[train_idx],sample_idx[test_idx])
+            for model_name,params in candidates for train_idx,test_idx in folds
+        )
+        self.n_fits+=len(results)
+        scores,seconds=np.asarray(results).reshape(len(candidates),len(folds),2).transpose(2,0,1)
+        for (model_name,_),candidate_seconds in zip(candidates,seconds.sum(axis=1)):
+            self.fit_seconds[model_name]+=float(candidate_seconds)
+        return scores.mean(axis=1)
+
+    def _grid_search(self,parallel,candidates,x,y):
+        # interleave the families so a budget cut still leaves every family with evaluated candidates
+        queue=[]
+        for position in range(max(len(family) for family in candidates.values())):
+            for model_name,family in candidates.items():
+                if position<len(family):
+                    queue.append((model_name,family[position]))
+        batch_size=max(len(candidates),2*effective_n_jobs(self.n_jobs))
+        sample_idx=np.arange(len(y))
+        results={model_name:[] for model_name in candidates}
+        for start in range(0,len(queue),batch_size):
+            if start>0 and self._budget_spent():
+                logging.info(f"Search budget spent after {self.n_fits} fits, {len(queue)-start} candidates skipped")
+                break
+            batch=queue[start:start+batch_size]
+            with profile_span("search_batch",rows=len(sample_idx),candidates=len(batch)):
+                scores=self._score_candidates(parallel,batch,x,y,sample_idx)
+            for (model_name,params),score in zip(batch,scores):
+                results[model_name].append((score,params))
+        return results
+
+    def _halving_search(self,parallel,candidates,x,y):
+        rng=np.random.RandomState(self.random_state)
+        permutation=rng.permutation(len(y))
+        n_rounds=max(1,math.ceil(math.log(max(len(family) for family in candidates.values()),self.factor))+1)
+        min_resources=max(2*self.cv*len(np.unique(y)),len(y)//self.factor**(n_rounds-1))
+        surviving={model_name:list(family) for model_name,family in candidates.items()}
+        results={model_name:[] for model_name in candidates}
+        for round_number in range(n_rounds):
+            if round_number>0 and self._budget_spent():
+                logging.info(f"Search budget spent after {self.n_fits} fits in round {round_number}")
+                break
+            n_resources=min(len(y),min_resources*self.factor**round_number)
+            sample_idx=np.sort(permutation[:n_resources])
+            batch=[(model_name,params) for model_name,family in surviving.items() for params in family]
+            with profile_span("halving_round",rows=n_resources,round=round_number,candidates=len(batch)):
+                scores=self._score_candidates(parallel,batch,x,y,sample_idx)
+            for model_name in surviving:
+                results[model_name]=[]
+            for (model_name,params),score in zip(batch,scores):
+                results[model_name].append((score,params))
+            for model_name,family_results in results.items():
+                ranked=sorted(family_results,key=lambda result:result[0],reverse=True)
+                surviving[model_name]=[params for _,params in ranked[:max(1,math.ceil(len(ranked)/self.factor))]]
+            logging.info(f"Halving round {round_number}: {len(batch)} candidates on {n_resources} samples")
+            if all(len(family)==1 for family in surviving.values()):
+                break
+        return results
+
+    def search(self,x,y,x_test=None)->dict:
+        try:
+            x=np.asarray(x)
+            y=np.asarray(y)
+            self.start_time=time.perf_counter()
+            self.n_fits=0
+            candidates={model_name:list(ParameterGrid(self.param.get(model_name,{}))) for model_name in self.models}
+            # worker seconds each family spent in cross validation fits; refits are timed separately
+            self.fit_seconds={model_name:0.0 for model_name in candidates}
+            # a family with a single candidate has nothing to compare, so it skips cross validation
+            searched={model_name:family for model_name,family in candidates.items() if len(family)>1}
+
+            with profile_span("model_search",rows=len(y),strategy=self.strategy) as search_span,\
+                    Parallel(n_jobs=self.n_jobs) as parallel:
+                results={}
+                if searched:
+                    search_method=self._grid_search if self.strategy=="grid" else self._halving_search
+                    results=search_method(parallel,searched,x,y)
+
+                best={}
+                for model_name,family in candidates.items():
+                    if model_name in results:
+                        best_score,best_params=max(results[model_name],key=lambda result:result[0])
+                    else:
+                        best_score,best_params=np.nan,family[0]
+                    best[model_name]=(best_params,best_score)
+
+                # every family's winner is refit and scored in its own worker, so the slowest family sets the pace
+                with profile_span("refit",rows=len(y),candidates=len(best)):
+                    refits=parallel(
+                        delayed(_refit)(self.models[model_name],best_params,x,y,x_test)
+                        for model_name,(best_params,_) in best.items()
+                    )
+                self.n_fits+=len(refits)
+                refit_seconds={model_name:refit[3] for model_name,refit in zip(best,refits)}
+                search_span.details.update({"n_fits":self.n_fits,"fit_seconds":self.fit_seconds,
+                                            "refit_seconds":refit_seconds})
+
+            search_results={}
+            for (model_name,(best_params,best_score)),(estimator,train_predictions,test_predictions,_) in zip(best.items(),refits):
+                search_results[model_name]=ModelSearchResult(best_params=best_params,best_score=float(best_score),
+                                                             best_estimator=estimator,
+                                                             n_candidates=len(candidates[model_name]),
+                                                             train_predictions=train_predictions,
+                                                             test_predictions=test_predictions)
+            logging.info(f"Model search finished: {self.n_fits} fits in {time.perf_counter()-self.start_time:.1f}s, "
+                         f"worker seconds per family {({name:round(seconds,1) for name,seconds in self.fit_seconds.items()})}")
+            return search_results
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
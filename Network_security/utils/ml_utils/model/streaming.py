@@ -0,0 +1,121 @@
+import sys
+import time
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.naive_bayes import CategoricalNB
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.utils.ml_utils.model.search import ModelSearchResult
+from Network_security.utils.ml_utils.tracking.profiler import profile_span
+
+TRAINING_MODES=("batch","streaming")
+# -1/0/1 features become the category codes 0/1/2
+N_CATEGORIES=3
+
+
+def iter_chunks(n_rows:int,chunk_size:int,rng=None):
+    # (start, stop) of every chunk, in a shuffled order when rng is given
+    starts=np.arange(0,n_rows,chunk_size)
+    if rng is not None:
+        starts=rng.permutation(starts)
+    for start in starts.tolist():
+        yield start,min(start+chunk_size,n_rows)
+
+
+def read_chunk(array,start:int,stop:int)->np.ndarray:
+    # a slice of a memory mapped array is only read from disk here
+    return np.array(array[start:stop])
+
+
+# Naive Bayes over the three values each feature can take. Imputed fractions are rounded to the nearest value.
+class TernaryCategoricalNB(CategoricalNB):
+    def __init__(self,alpha:float=1.0,fit_prior:bool=True,class_prior=None):
+        super().__init__(alpha=alpha,fit_prior=fit_prior,class_prior=class_prior,min_categories=N_CATEGORIES)
+
+    @staticmethod
+    def _codes(X)->np.ndarray:
+        return np.clip(np.rint(np.asarray(X,dtype=np.float32)),-1,1).astype(np.int64)+1
+
+    def fit(self,X,y,sample_weight=None):
+        return super().fit(self._codes(X),y,sample_weight=sample_weight)
+
+    def partial_fit(self,X,y,classes=None,sample_weight=None):
+        return super().partial_fit(self._codes(X),y,classes=classes,sample_weight=sample_weight)
+
+    def predict(self,X):
+        return super().predict(self._codes(X))
+
+    def predict_proba(self,X):
+        return super().predict_proba(self._codes(X))
+
+    def predict_log_proba(self,X):
+        return super().predict_log_proba(self._codes(X))
+
+
+def fit_streaming(estimator,x,y,classes,chunk_size:int,epochs:int=1,random_state:int=42):
+    # partial_fit estimators see every chunk once per epoch; warm-started ensembles grow their initial
+    # n_estimators on every chunk, so each chunk contributes its own trees
+    try:
+        rng=np.random.RandomState(random_state)
+        if hasattr(estimator,"partial_fit"):
+            for epoch in range(epochs):
+                for start,stop in iter_chunks(len(y),chunk_size,rng):
+                    estimator.partial_fit(read_chunk(x,start,stop),read_chunk(y,start,stop),classes=classes)
+            return estimator
+
+        if getattr(estimator,"warm_start",False) and hasattr(estimator,"n_estimators"):
+            trees_per_chunk=estimator.n_estimators
+            n_estimators=0
+            for start,stop in iter_chunks(len(y),chunk_size,rng):
+                y_chunk=read_chunk(y,start,stop)
+                # every fit has to see all classes, otherwise the trees disagree on classes_
+                if len(np.unique(y_chunk))<len(classes):
+                    logging.info(f"Skipping chunk {start}:{stop} for {type(estimator).__name__}, it lacks a class")
+                    continue
+                n_estimators+=trees_per_chunk
+                estimator.set_params(n_estimators=n_estimators)
+                estimator.fit(read_chunk(x,start,stop),y_chunk)
+            if not n_estimators:
+                raise ValueError(f"No chunk of {chunk_size} rows contains every class")
+            return estimator
+
+        raise ValueError(f"{type(estimator).__name__} supports neither partial_fit nor warm_start")
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def predict_streaming(estimator,x,chunk_size:int)->np.ndarray:
+    try:
+        return np.concatenate([estimator.predict(read_chunk(x,start,stop))
+                               for start,stop in iter_chunks(len(x),chunk_size)])
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def train_streaming_models(models:dict,x_train,y_train,x_test,y_test,chunk_size:int,epochs:int=1,
+                           random_state:int=42)->dict:
+    # the streaming counterpart of evaluate_models: same {model_name: ModelSearchResult}, without cross validation,
+    # and no array is ever held in memory whole
+    try:
+        classes=np.unique(y_train)
+        search_results={}
+        for model_name,model in models.items():
+            start=time.perf_counter()
+            with profile_span("streaming_fit",rows=len(y_train),model=model_name,epochs=epochs):
+                estimator=fit_streaming(model,x_train,y_train,classes,chunk_size,epochs=epochs,random_state=random_state)
+            with profile_span("streaming_predict",rows=len(y_train)+len(y_test),model=model_name):
+                train_predictions=predict_streaming(estimator,x_train,chunk_size)
+                test_predictions=predict_streaming(estimator,x_test,chunk_size)
+            search_results[model_name]=ModelSearchResult(best_params=estimator.get_params(deep=False),
+                                                         best_score=float("nan"),best_estimator=estimator,
+                                                         n_candidates=1,train_predictions=train_predictions,
+                                                         test_predictions=test_predictions,
+                                                         train_score=accuracy_score(y_train,train_predictions),
+                                                         test_score=accuracy_score(y_test,test_predictions))
+            logging.info(f"{model_name}: streamed {len(y_train)} rows in chunks of {chunk_size} in "
+                         f"{time.perf_counter()-start:.1f}s, train score {search_results[model_name].train_score:.4f}, "
+                         f"test score {search_results[model_name].test_score:.4f}")
+        return search_results
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
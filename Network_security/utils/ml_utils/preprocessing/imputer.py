@@ -0,0 +1,187 @@
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator,TransformerMixin
+from sklearn.impute import KNNImputer
+from sklearn.neighbors import KDTree
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.utils.ml_utils.preprocessing.ternary import MISSING_SENTINEL,to_ternary,to_float
+
+IMPUTER_MODES=("exact","indexed")
+
+
+# KNN imputation that passes complete rows straight through and only searches neighbours for rows with gaps.
+# mode="exact" hands the incomplete rows to sklearn's KNNImputer, so results match it exactly.
+# mode="indexed" keeps only the distinct complete training rows (with their counts) as donors. Frequent
+# missing-value patterns get a cached KDTree over their observed columns and rare ones a brute force pass
+# over the distinct donors, which stops growing once the ternary feature space is saturated.
+# Ternary input is handled as int8 codes: complete rows come back as int8, only rows with gaps become floats.
+class FastKNNImputer(TransformerMixin,BaseEstimator):
+    def __init__(self,missing_values=np.nan,n_neighbors:int=3,weights:str="uniform",mode:str="exact",
+                 index_min_rows:int=32,max_cached_indexes:int=128):
+        self.missing_values=missing_values
+        self.n_neighbors=n_neighbors
+        self.weights=weights
+        self.mode=mode
+        self.index_min_rows=index_min_rows
+        self.max_cached_indexes=max_cached_indexes
+
+    def _missing_is_nan(self)->bool:
+        return isinstance(self.missing_values,float) and np.isnan(self.missing_values)
+
+    def _to_array(self,X)->np.ndarray:
+        # int8 codes whenever the input is ternary, so complete rows are never widened to float64
+        if isinstance(X,pd.DataFrame):
+            X=X.to_numpy()
+        if self._missing_is_nan():
+            codes=to_ternary(X)
+            if codes is not None:
+                return codes
+        return np.array(X,dtype=np.float64)
+
+    def _check_features(self,X):
+        # like sklearn's estimators: a frame must carry the fitted columns in the fitted order, since
+        # the donors are matched by position and a reordered frame would be imputed from the wrong columns
+        feature_names=getattr(self,"feature_names_in_",None)
+        if isinstance(X,pd.DataFrame) and feature_names is not None:
+            columns=[str(column) for column in X.columns]
+            if columns!=list(feature_names):
+                missing=[name for name in feature_names if name not in set(columns)]
+                unexpected=[column for column in columns if column not in set(feature_names)]
+                detail=(f"missing {missing}, unexpected {unexpected}" if missing or unexpected
+                        else "same columns in a different order")
+                raise ValueError(f"The feature names should match those that were passed during fit: {detail}")
+        n_features=X.shape[1] if len(np.shape(X))==2 else None
+        if n_features!=self.n_features_in_:
+            raise ValueError(f"X has {n_features} features, but FastKNNImputer is expecting "
+                             f"{self.n_features_in_} features as input")
+
+    def _to_float(self,X:np.ndarray)->np.ndarray:
+        return to_float(X) if X.dtype==np.int8 else X
+
+    def _get_mask(self,X:np.ndarray)->np.ndarray:
+        if X.dtype==np.int8:
+            return X==MISSING_SENTINEL
+        if self._missing_is_nan():
+            return np.isnan(X)
+        return X==self.missing_values
+
+    def fit(self,X,y=None):
+        try:
+            if self.mode not in IMPUTER_MODES:
+                raise ValueError(f"mode must be one of {IMPUTER_MODES}, got {self.mode!r}")
+            if isinstance(X,pd.DataFrame):
+                self.feature_names_in_=np.asarray(X.columns,dtype=object)
+            X=self._to_array(X)
+            self.n_features_in_=X.shape[1]
+            mask=self._get_mask(X)
+            self.valid_mask_=~mask.all(axis=0)
+
+            complete_rows=~mask[:,self.valid_mask_].any(axis=1)
+            self.knn_imputer_=None
+            self.donors_=None
+            if self.mode=="exact" or complete_rows.sum()<self.n_neighbors:
+                self.knn_imputer_=KNNImputer(missing_values=self.missing_values,n_neighbors=self.n_neighbors,
+                                             weights=self.weights).fit(self._to_float(X))
+            else:
+                donors,donor_counts=np.unique(X[complete_rows][:,self.valid_mask_],axis=0,return_counts=True)
+                self.donors_=np.ascontiguousarray(donors,dtype=np.float32)
+                self.donor_counts_=donor_counts
+                self.donor_means_=np.average(self.donors_,axis=0,weights=donor_counts)
+            self._reset_index_cache()
+            return self
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _reset_index_cache(self):
+        self._index_cache=OrderedDict()
+        self._index_lock=threading.Lock()
+
+    def __getstate__(self):
+        # KDTrees are rebuilt lazily after unpickling rather than shipped with the model
+        state=self.__dict__.copy()
+        state.pop("_index_cache",None)
+        state.pop("_index_lock",None)
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self._reset_index_cache()
+
+    def _get_index(self,observed:np.ndarray,n_rows:int):
+        key=observed.tobytes()
+        with self._index_lock:
+            index=self._index_cache.get(key)
+            if index is not None:
+                self._index_cache.move_to_end(key)
+                return index
+        if n_rows<self.index_min_rows:
+            return None
+        index=KDTree(self.donors_[:,observed])
+        with self._index_lock:
+            self._index_cache[key]=index
+            if len(self._index_cache)>self.max_cached_indexes:
+                self._index_cache.popitem(last=False)
+        return index
+
+    def _nearest_donors(self,rows:np.ndarray,observed:np.ndarray):
+        k=min(self.n_neighbors,len(self.donors_))
+        query=rows[:,observed]
+        index=self._get_index(observed,len(rows))
+        if index is not None:
+            return index.query(query,k=k)
+        donors=self.donors_[:,observed]
+        squared=((query**2).sum(axis=1)[:,None]+(donors**2).sum(axis=1)[None,:]-2.0*query@donors.T)
+        nearest=np.argpartition(squared,k-1,axis=1)[:,:k]
+        nearest_squared=np.take_along_axis(squared,nearest,axis=1)
+        order=np.argsort(nearest_squared,axis=1)
+        distances=np.sqrt(np.clip(np.take_along_axis(nearest_squared,order,axis=1),0,None))
+        return distances,np.take_along_axis(nearest,order,axis=1)
+
+    def _impute_pattern(self,rows:np.ndarray,missing:np.ndarray)->np.ndarray:
+        observed=~missing
+        if not observed.any():
+            rows[:,missing]=self.donor_means_[missing]
+            return rows
+        distances,indices=self._nearest_donors(rows,observed)
+        # donors are deduplicated, so each neighbour contributes as many copies as needed to reach k
+        counts=self.donor_counts_[indices]
+        used_before=np.cumsum(counts,axis=1)-counts
+        copies=np.clip(self.n_neighbors-used_before,0,counts).astype(np.float64)
+        if self.weights=="distance":
+            # same convention as sklearn: exact matches take all the weight
+            exact_match=distances==0
+            exact_rows=exact_match.any(axis=1)
+            with np.errstate(divide="ignore",invalid="ignore"):
+                copies=np.where(exact_rows[:,None],copies*exact_match,copies/distances)
+        neighbour_values=self.donors_[:,missing][indices]
+        rows[:,missing]=(neighbour_values*copies[:,:,None]).sum(axis=1)/copies.sum(axis=1)[:,None]
+        return rows
+
+    def transform(self,X):
+        try:
+            self._check_features(X)
+            X=self._to_array(X)
+            mask=self._get_mask(X)[:,self.valid_mask_]
+            rows_with_missing=mask.any(axis=1)
+            # complete rows need no distance computation at all, and ternary input stays int8
+            if not rows_with_missing.any():
+                return X[:,self.valid_mask_]
+            X=self._to_float(X)
+            Xt=X[:,self.valid_mask_]
+
+            if self.knn_imputer_ is not None:
+                Xt[rows_with_missing]=self.knn_imputer_.transform(X[rows_with_missing])
+                return Xt
+
+            incomplete_idx=np.flatnonzero(rows_with_missing)
+            patterns,pattern_idx=np.unique(mask[incomplete_idx],axis=0,return_inverse=True)
+            pattern_idx=pattern_idx.reshape(-1)
+            for i,missing in enumerate(patterns):
+                rows_idx=incomplete_idx[pattern_idx==i]
+                Xt[rows_idx]=self._impute_pattern(Xt[rows_idx],missing)
+            return Xt
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
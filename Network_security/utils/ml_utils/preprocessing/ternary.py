@@ -0,0 +1,61 @@
+import sys
+import numpy as np
+
+from Network_security.exception.exception import NetworkSecurityException
+
+# Features are -1/0/1 and the label is ±1, so a matrix of them is carried as int8 codes: one byte per value
+# instead of eight. A missing value, NaN everywhere else, is stored as MISSING_SENTINEL. Estimators get
+# the codes as they are (sklearn converts to its own float dtype at fit/predict time); only code that has to
+# compute with missing values turns them back into floats with to_float.
+MISSING_SENTINEL=-128
+INT8_MAX=127
+
+
+def missing_mask(x:np.ndarray)->np.ndarray:
+    if x.dtype==np.int8:
+        return x==MISSING_SENTINEL
+    if x.dtype.kind=="f":
+        return np.isnan(x)
+    return np.zeros(x.shape,dtype=bool)
+
+
+def to_ternary(x):
+    # int8 codes of x, or None when some value is not a small whole number (an imputed 1/3, a 7.5 ...)
+    try:
+        x=np.asarray(x)
+        if x.dtype==np.int8:
+            return x
+        if x.dtype.kind in "iub":
+            if x.size and (x.min()<-INT8_MAX or x.max()>INT8_MAX):
+                return None
+            return x.astype(np.int8)
+        if x.dtype.kind!="f":
+            return None
+        missing=np.isnan(x)
+        values=np.where(missing,0,x)
+        if not ((values==np.trunc(values))&(np.abs(values)<=INT8_MAX)).all():
+            return None
+        codes=values.astype(np.int8)
+        codes[missing]=MISSING_SENTINEL
+        return codes
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def to_float(x,dtype=np.float64)->np.ndarray:
+    # floats with NaN for missing values; arrays that are not int8 codes are only cast
+    try:
+        x=np.asarray(x)
+        if x.dtype!=np.int8:
+            return np.array(x,dtype=dtype)
+        values=x.astype(dtype)
+        values[x==MISSING_SENTINEL]=np.nan
+        return values
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
+
+def compact_features(x)->np.ndarray:
+    # what gets written to disk: int8 codes when possible, float32 otherwise
+    codes=to_ternary(x)
+    return codes if codes is not None else np.asarray(x,dtype=np.float32)
@@ -0,0 +1,155 @@
+import os,sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import MLFLOW_EXPERIMENT_NAME,MLFLOW_MODEL_ARTIFACT_PATH
+
+# limits of a single log_batch request on the tracking server
+MAX_BATCH_METRICS=1000
+MAX_BATCH_PARAMS=100
+MAX_BATCH_TAGS=100
+# older tracking servers reject longer param values
+MAX_PARAM_LENGTH=500
+
+
+# One mlflow run per training, talked to through MlflowClient rather than the fluent API, so nothing
+# depends on a thread-local active run. Metrics, params and tags are buffered and sent with log_batch
+# when a run ends; candidate runs are nested under the parent through the mlflow.parentRunId tag; the model
+# is saved and uploaded once, on a background thread, while training carries on. A disabled tracker
+# accepts every call and does nothing.
+class ExperimentTracker:
+    def __init__(self,experiment_name:str=MLFLOW_EXPERIMENT_NAME,enabled:bool=True):
+        try:
+            self.experiment_name=experiment_name
+            self.enabled=enabled
+            self.run_id=None
+            self._client=None
+            self._experiment_id=None
+            self._buffers={}
+            self._child_run_ids=[]
+            self._uploads=[]
+            self._uploader=None
+            self._lock=threading.Lock()
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _get_client(self):
+        if self._client is None:
+            from mlflow.tracking import MlflowClient
+            self._client=MlflowClient()
+            experiment=self._client.get_experiment_by_name(self.experiment_name)
+            self._experiment_id=(experiment.experiment_id if experiment is not None
+                                 else self._client.create_experiment(self.experiment_name))
+        return self._client
+
+    def _create_run(self,run_name:str,tags:dict)->str:
+        run=self._get_client().create_run(self._experiment_id,tags=tags,run_name=run_name)
+        run_id=run.info.run_id
+        with self._lock:
+            self._buffers[run_id]={"metrics":{},"params":{},"tags":{}}
+        return run_id
+
+    def start_run(self,run_name:str,tags:dict=None)->str:
+        try:
+            if not self.enabled:
+                return None
+            if self.run_id is not None:
+                raise Exception(f"Run {self.run_id} is still open")
+            self.run_id=self._create_run(run_name,tags or {})
+            logging.info(f"Started mlflow run {self.run_id} in experiment {self.experiment_name}")
+            return self.run_id
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def start_child_run(self,run_name:str,tags:dict=None)->str:
+        try:
+            if not self.enabled or self.run_id is None:
+                return None
+            run_id=self._create_run(run_name,{**(tags or {}),"mlflow.parentRunId":self.run_id})
+            self._child_run_ids.append(run_id)
+            return run_id
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _buffer(self,kind:str,values:dict,run_id:str):
+        run_id=run_id or self.run_id
+        if not self.enabled or run_id is None:
+            return
+        with self._lock:
+            self._buffers[run_id][kind].update(values)
+
+    def log_metrics(self,metrics:dict,run_id:str=None):
+        # values that are None (a family without a cv score) are left out
+        self._buffer("metrics",{key:float(value) for key,value in metrics.items() if value is not None},run_id)
+
+    def log_params(self,params:dict,run_id:str=None):
+        self._buffer("params",{key:str(value)[:MAX_PARAM_LENGTH] for key,value in params.items()},run_id)
+
+    def set_tags(self,tags:dict,run_id:str=None):
+        self._buffer("tags",{key:str(value) for key,value in tags.items()},run_id)
+
+    def _upload_model(self,run_id:str,model,artifact_path:str):
+        import mlflow.sklearn
+        start=time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_dir=os.path.join(tmp_dir,artifact_path)
+            mlflow.sklearn.save_model(model,model_dir)
+            self._get_client().log_artifacts(run_id,model_dir,artifact_path)
+        upload_seconds=time.perf_counter()-start
+        self.log_metrics({"model_upload_seconds":upload_seconds},run_id)
+        logging.info(f"Uploaded model to mlflow run {run_id} in {upload_seconds:.2f}s")
+
+    def log_model_async(self,model,artifact_path:str=MLFLOW_MODEL_ARTIFACT_PATH,run_id:str=None):
+        try:
+            run_id=run_id or self.run_id
+            if not self.enabled or run_id is None:
+                return
+            if self._uploader is None:
+                self._uploader=ThreadPoolExecutor(max_workers=1,thread_name_prefix="mlflow-upload")
+            self._uploads.append(self._uploader.submit(self._upload_model,run_id,model,artifact_path))
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _flush(self,run_id:str):
+        from mlflow.entities import Metric,Param,RunTag
+        with self._lock:
+            buffer=self._buffers[run_id]
+            self._buffers[run_id]={"metrics":{},"params":{},"tags":{}}
+        timestamp=int(time.time()*1000)
+        metrics=[Metric(key,value,timestamp,0) for key,value in buffer["metrics"].items()]
+        params=[Param(key,value) for key,value in buffer["params"].items()]
+        tags=[RunTag(key,value) for key,value in buffer["tags"].items()]
+        client=self._get_client()
+        while metrics or params or tags:
+            client.log_batch(run_id,metrics=metrics[:MAX_BATCH_METRICS],params=params[:MAX_BATCH_PARAMS],
+                             tags=tags[:MAX_BATCH_TAGS])
+            metrics,params,tags=metrics[MAX_BATCH_METRICS:],params[MAX_BATCH_PARAMS:],tags[MAX_BATCH_TAGS:]
+
+    def end_run(self,status:str="FINISHED"):
+        try:
+            if not self.enabled or self.run_id is None:
+                return
+            # a failed upload is logged, it does not fail a training that already finished
+            for upload in self._uploads:
+                try:
+                    upload.result()
+                except Exception as e:
+                    logging.info(f"Model upload to mlflow run {self.run_id} failed: {e}")
+            self._uploads=[]
+            if self._uploader is not None:
+                self._uploader.shutdown()
+                self._uploader=None
+            client=self._get_client()
+            for run_id in self._child_run_ids+[self.run_id]:
+                self._flush(run_id)
+                client.set_terminated(run_id,status=status)
+            logging.info(f"Ended mlflow run {self.run_id} with status {status}")
+            self._child_run_ids=[]
+            self._buffers={}
+            self.run_id=None
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
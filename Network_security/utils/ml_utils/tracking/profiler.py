@@ -0,0 +1,278 @@
+import os,sys
+import cProfile
+import json
+import pstats
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    resource=None
+
+from Network_security.exception.exception import NetworkSecurityException
+from Network_security.logging.logger import logging
+from Network_security.entity.artifact_entity import RunProfileArtifact
+
+# "off" records wall time, CPU time, memory and rows only; "cprofile" also runs cProfile over the whole
+# run; "sample" also samples the main thread's stack every few milliseconds, written as folded stacks
+# that flamegraph.pl or speedscope read directly
+PROFILE_MODES=("off","cprofile","sample")
+PAGE_SIZE=os.sysconf("SC_PAGE_SIZE") if hasattr(os,"sysconf") else 4096
+
+# the profiler of the running pipeline; profile_span is a no-op while it is None
+_active_profiler=None
+
+
+def current_rss_mb()->float:
+    # resident memory right now; where /proc is missing, the peak so far is the best there is
+    try:
+        with open("/proc/self/statm") as file_obj:
+            return int(file_obj.read().split()[1])*PAGE_SIZE/(1024*1024)
+    except OSError:
+        if resource is None:
+            return 0.0
+        peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak/(1024*1024) if sys.platform=="darwin" else peak/1024
+
+
+def _rows_of(value):
+    # frames and arrays only; a pymongo collection answers every attribute with a sub-collection
+    shape=getattr(value,"shape",None)
+    return int(shape[0]) if isinstance(shape,tuple) and shape else None
+
+
+class ProfileSpan:
+    def __init__(self,name:str,path:str,depth:int,rows:int=None,details:dict=None):
+        self.name=name
+        self.path=path
+        self.depth=depth
+        self.rows=rows
+        self.details=details or {}
+        self.status="running"
+        self.wall_seconds=None
+        self.cpu_seconds=None
+        self.rss_start_mb=None
+        self.rss_end_mb=None
+        self.peak_rss_mb=None
+
+    def to_dict(self)->dict:
+        span={"name":self.name,"path":self.path,"depth":self.depth,"status":self.status,
+              "wall_seconds":self.wall_seconds,"cpu_seconds":self.cpu_seconds,
+              "rss_start_mb":self.rss_start_mb,"rss_end_mb":self.rss_end_mb,"peak_rss_mb":self.peak_rss_mb,
+              "rows":self.rows}
+        if self.rows and self.wall_seconds:
+            span["rows_per_second"]=self.rows/self.wall_seconds
+        return {**span,**self.details}
+
+
+# Wall time, CPU time, memory and rows of every stage and sub-step of a training run. Spans nest per thread;
+# a background thread samples resident memory so each open span knows its own peak, not just the process'.
+# CPU time is the whole process', joblib workers run in other processes and are not included.
+class RunProfiler:
+    def __init__(self,mode:str="off",sample_interval:float=0.005,memory_interval:float=0.05,top_functions:int=30):
+        try:
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"profile mode must be one of {PROFILE_MODES}, got {mode!r}")
+            self.mode=mode
+            self.sample_interval=sample_interval
+            self.memory_interval=memory_interval
+            self.top_functions=top_functions
+            self.spans=[]
+            self.started_at=None
+            self.wall_seconds=None
+            self.cpu_seconds=None
+            self.peak_rss_mb=None
+            self._start=None
+            self._local=threading.local()
+            self._open_spans=set()
+            self._lock=threading.Lock()
+            self._stop_event=threading.Event()
+            self._sampler=None
+            self._target_thread_id=None
+            self._stack_counts=Counter()
+            self._cprofile=None
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def _stack(self)->list:
+        if not hasattr(self._local,"stack"):
+            self._local.stack=[]
+        return self._local.stack
+
+    @contextmanager
+    def span(self,name:str,rows:int=None,**details):
+        stack=self._stack()
+        parent=stack[-1] if stack else None
+        span=ProfileSpan(name,f"{parent.path}/{name}" if parent else name,len(stack),rows,details)
+        span.rss_start_mb=span.peak_rss_mb=current_rss_mb()
+        with self._lock:
+            self.spans.append(span)
+            self._open_spans.add(span)
+        stack.append(span)
+        start,cpu_start=time.perf_counter(),time.process_time()
+        try:
+            yield span
+            span.status="completed"
+        except BaseException:
+            span.status="failed"
+            raise
+        finally:
+            span.wall_seconds=time.perf_counter()-start
+            span.cpu_seconds=time.process_time()-cpu_start
+            span.rss_end_mb=current_rss_mb()
+            stack.pop()
+            with self._lock:
+                self._open_spans.discard(span)
+                span.peak_rss_mb=max(span.peak_rss_mb,span.rss_end_mb)
+
+    def _sample_stack(self):
+        frame=sys._current_frames().get(self._target_thread_id)
+        frames=[]
+        while frame is not None:
+            code=frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame=frame.f_back
+        if frames:
+            self._stack_counts[";".join(reversed(frames))]+=1
+
+    def _run_sampler(self):
+        interval=self.sample_interval if self.mode=="sample" else self.memory_interval
+        last_memory_sample=0.0
+        while not self._stop_event.wait(interval):
+            if self.mode=="sample":
+                self._sample_stack()
+            now=time.perf_counter()
+            if now-last_memory_sample>=self.memory_interval:
+                last_memory_sample=now
+                rss_mb=current_rss_mb()
+                with self._lock:
+                    for span in self._open_spans:
+                        span.peak_rss_mb=max(span.peak_rss_mb,rss_mb)
+
+    def start(self):
+        global _active_profiler
+        try:
+            self.started_at=datetime.now()
+            self._start=(time.perf_counter(),time.process_time())
+            self._target_thread_id=threading.get_ident()
+            self._stop_event.clear()
+            self._sampler=threading.Thread(target=self._run_sampler,name="run-profiler",daemon=True)
+            self._sampler.start()
+            if self.mode=="cprofile":
+                self._cprofile=cProfile.Profile()
+                self._cprofile.enable()
+            _active_profiler=self
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def stop(self):
+        global _active_profiler
+        try:
+            if self._sampler is None:
+                return
+            if self._cprofile is not None:
+                self._cprofile.disable()
+            self._stop_event.set()
+            self._sampler.join()
+            self._sampler=None
+            if _active_profiler is self:
+                _active_profiler=None
+            self.wall_seconds=time.perf_counter()-self._start[0]
+            self.cpu_seconds=time.process_time()-self._start[1]
+            self.peak_rss_mb=max([span.peak_rss_mb for span in self.spans]+[current_rss_mb()])
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    def stage_profile(self,stage_span:ProfileSpan)->dict:
+        # a stage's own numbers plus every sub-step that ran inside it, in start order
+        prefix=f"{stage_span.path}/"
+        return {**stage_span.to_dict(),
+                "steps":[span.to_dict() for span in self.spans if span.path.startswith(prefix)]}
+
+    def top_cprofile_functions(self)->list:
+        stats=pstats.Stats(self._cprofile)
+        rows=[]
+        for (file_name,line_number,function_name),(_,n_calls,total_time,cumulative_time,_) in stats.stats.items():
+            rows.append({"function":f"{function_name} ({os.path.basename(file_name)}:{line_number})",
+                         "calls":n_calls,"total_seconds":total_time,"cumulative_seconds":cumulative_time})
+        return sorted(rows,key=lambda row:row["cumulative_seconds"],reverse=True)[:self.top_functions]
+
+    def top_sampled_functions(self)->list:
+        # share of samples in which a function was on the stack, and in which it was the running frame
+        n_samples=sum(self._stack_counts.values())
+        on_stack,running=Counter(),Counter()
+        for stack,count in self._stack_counts.items():
+            frames=stack.split(";")
+            running[frames[-1]]+=count
+            for frame in set(frames):
+                on_stack[frame]+=count
+        return [{"function":frame,"samples":count,"share":count/n_samples,"self_share":running[frame]/n_samples}
+                for frame,count in on_stack.most_common(self.top_functions)]
+
+    def write(self,run_profile_file_path:str,cprofile_file_path:str=None,stacks_file_path:str=None)->RunProfileArtifact:
+        try:
+            self.stop()
+            os.makedirs(os.path.dirname(run_profile_file_path),exist_ok=True)
+            top_functions=[]
+            if self._cprofile is not None and cprofile_file_path:
+                self._cprofile.dump_stats(cprofile_file_path)
+                top_functions=self.top_cprofile_functions()
+            else:
+                cprofile_file_path=None
+            if self.mode=="sample" and stacks_file_path:
+                with open(stacks_file_path,"w") as file_obj:
+                    for stack,count in self._stack_counts.items():
+                        file_obj.write(f"{stack} {count}\n")
+                top_functions=self.top_sampled_functions()
+            else:
+                stacks_file_path=None
+
+            stages={span.name:self.stage_profile(span) for span in self.spans if span.depth==0}
+            with open(run_profile_file_path,"w") as file_obj:
+                json.dump({"mode":self.mode,"started_at":self.started_at.isoformat() if self.started_at else None,
+                           "wall_seconds":self.wall_seconds,"cpu_seconds":self.cpu_seconds,
+                           "peak_rss_mb":self.peak_rss_mb,"spans":[span.to_dict() for span in self.spans],
+                           "top_functions":top_functions},file_obj,indent=2,default=str)
+            logging.info(f"Run profile written to {run_profile_file_path}: "+", ".join(
+                f"{name} {stage['wall_seconds']:.2f}s" for name,stage in stages.items()))
+            return RunProfileArtifact(run_profile_file_path=run_profile_file_path,mode=self.mode,
+                                      wall_seconds=self.wall_seconds,cpu_seconds=self.cpu_seconds,
+                                      peak_rss_mb=self.peak_rss_mb,stages=stages,
+                                      cprofile_file_path=cprofile_file_path,stacks_file_path=stacks_file_path)
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+
+@contextmanager
+def profile_span(name:str,rows:int=None,**details):
+    # a sub-step of whatever stage is running; outside a profiled run the span is recorded nowhere
+    profiler=_active_profiler
+    if profiler is None:
+        yield ProfileSpan(name,name,0,rows,details)
+        return
+    with profiler.span(name,rows,**details) as span:
+        yield span
+
+
+def profiled(name:str=None):
+    # decorator form of profile_span; rows come from the returned frame/array, else from the first array argument
+    def decorator(func):
+        span_name=name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args,**kwargs):
+            if _active_profiler is None:
+                return func(*args,**kwargs)
+            with profile_span(span_name) as span:
+                result=func(*args,**kwargs)
+                span.rows=_rows_of(result)
+                if span.rows is None:
+                    span.rows=next((rows for rows in map(_rows_of,[*args,*kwargs.values()]) if rows is not None),None)
+                return result
+        return wrapper
+    return decorator
@@ -4,23 +4,29 @@ ca=certifi.where()
 from dotenv import load_dotenv
 load_dotenv()
 mongo_db_url=os.getenv("MONGODB_URL_KEY")
-print(mongo_db_url)
 import pymongo
 from Network_security.exception.exception import NetworkSecurityException
 from Network_security.logging.logger import logging
-from Network_security.pipeline.training_pipeline import TrainingPipeline
+# the url carries credentials, only whether it is set goes to the log
+logging.info(f"MONGODB_URL_KEY is {'set' if mongo_db_url else 'not set'}")
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI,Request,UploadFile,File
+from fastapi import FastAPI,Request,UploadFile,File,HTTPException
 from uvicorn import run as app_run
 from fastapi.responses import Response
 from starlette.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
+import json
 
-from Network_security.utils.main_utils.utils import load_object
-from Network_security.utils.ml_utils.model.estimator import NetworkModel
+from Network_security.serving.model_registry import ModelRegistry
+from Network_security.serving.batch_scheduler import BatchScheduler
+from Network_security.serving.training_jobs import TrainingJobManager
+from Network_security.serving.prediction_cache import PredictionCache
+from Network_security.serving.metrics import ServingMetrics,MetricsMiddleware,CONTENT_TYPE as METRICS_CONTENT_TYPE
+from Network_security.utils.main_utils.schema import FeatureSchema,SchemaValidator,SchemaValidationError
 
 
-from Network_security.constants.training_pipeline import DATA_INGESTION_DATABASE_NAME,DATA_INGESTION_COLLECTION_NAME
+from Network_security.constants.training_pipeline import DATA_INGESTION_DATABASE_NAME,DATA_INGESTION_COLLECTION_NAME,SCORE_MAX_RECORDS,PREDICTION_CACHE_ENABLED,SERVING_LOG_SAMPLE_RATE
 
 client=pymongo.MongoClient(mongo_db_url,tlsCAFile=ca)
 database=client[DATA_INGESTION_DATABASE_NAME]
@@ -39,46 +45,117 @@ app.add_middleware(
 from fastapi.templating import Jinja2Templates
 templates = Jinja2Templates(directory="./templates")
 
+model_registry=ModelRegistry()
+feature_schema=FeatureSchema()
+schema_validator=SchemaValidator()
+serving_metrics=ServingMetrics(model_registry)
+batch_scheduler=BatchScheduler(model_registry,prediction_cache=PredictionCache() if PREDICTION_CACHE_ENABLED else None,
+                               serving_metrics=serving_metrics)
+serving_metrics.add_batch_scheduler(batch_scheduler)
+training_jobs=TrainingJobManager(on_promote=model_registry.load)
+# request latency, sizes and errors for /metrics, plus a sampled JSON log line per request
+app.add_middleware(MetricsMiddleware,serving_metrics=serving_metrics,sample_rate=SERVING_LOG_SAMPLE_RATE)
+
+@app.on_event("startup")
+async def startup_event():
+    model_registry.start()
+    batch_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batch_scheduler.stop()
+    model_registry.stop()
+    training_jobs.stop()
+
 @app.get("/",tags=["authentication"])
 async def index():
     return RedirectResponse(url="/docs")
 
+@app.get("/health")
+async def health_route():
+    health=model_registry.health()
+    health["scheduler"]=batch_scheduler.metrics()
+    return health
+
+@app.get("/metrics")
+async def metrics_route():
+    return Response(content=serving_metrics.render(),media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/train")
-async def train_route():
+async def train_route(auto_promote: bool = True):
+    # training runs in a background process, poll /train/{job_id} for progress
     try:
-        train_pipeline=TrainingPipeline()
-        train_pipeline.run_pipeline()
-        return Response("Training is successful")
-    except Exception as e:
-        raise NetworkSecurityException(e,sys)
+        job_id=training_jobs.start_job(auto_promote=auto_promote)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409,detail=str(e))
+    return {"job_id":job_id,"status_url":f"/train/{job_id}"}
+
+@app.get("/train/{job_id}")
+async def train_status_route(job_id: str):
+    job=training_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404,detail=f"Unknown training job {job_id}")
+    return job
 
 @app.post("/predict")
 async def predict_route(request: Request,file: UploadFile = File(...)):
+    # parsing, scoring and rendering all run off the event loop
+    df=await run_in_threadpool(pd.read_csv,file.file)
+    # a bad upload is rejected before it reaches the model; column order and extra columns do not matter here
+    errors=schema_validator.check_structure(df,require_target=False,strict=False)
+    if errors:
+        raise HTTPException(status_code=422,detail="; ".join(errors))
+    features=df[feature_schema.feature_columns].to_numpy(dtype="float64")
+    try:
+        schema_validator.check_features(features)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422,detail=str(e))
     try:
-        df=pd.read_csv(file.file)
-        #print(df)
-        preprocesor=load_object("final_model/preprocessor.pkl")
-        final_model=load_object("final_model/model.pkl")
-        network_model = NetworkModel(preprocessor=preprocesor,model=final_model)
-        print(df.iloc[0])
-        y_pred = network_model.predict(df)
-        print(y_pred)
+        y_pred,_,model_version=await batch_scheduler.submit(features)
+        request.state.rows=len(df)
+        request.state.model_version=model_version
         df['predicted_column'] = y_pred
-        print(df['predicted_column'])
         #df['predicted_column'].replace(-1, 0)
         #return df.to_json()
-        df.to_csv('prediction_output/output.csv')
-        table_html = df.to_html(classes='table table-striped')
-        #print(table_html)
-        return templates.TemplateResponse("table.html", {"request": request, "table": table_html})
+        await run_in_threadpool(df.to_csv,'prediction_output/output.csv')
+        table_html = await run_in_threadpool(df.to_html,classes='table table-striped')
+        return templates.TemplateResponse(request, "table.html", {"table": table_html})
         
     except Exception as e:
             raise NetworkSecurityException(e,sys)
 
+@app.post("/v1/score")
+async def score_route(request: Request):
+    # JSON records, or application/octet-stream with packed int8 rows in schema order.
+    # Nothing is rendered or written to disk here.
+    body=await request.body()
+    try:
+        if request.headers.get("content-type","").startswith("application/octet-stream"):
+            features=feature_schema.records_from_packed(body,max_records=SCORE_MAX_RECORDS)
+        else:
+            features=feature_schema.records_from_json(json.loads(body),max_records=SCORE_MAX_RECORDS)
+        schema_validator.check_features(features)
+    except ValueError as e:
+        # SchemaValidationError and malformed JSON are both client errors
+        raise HTTPException(status_code=422,detail=str(e))
+    if not model_registry.has_model():
+        raise HTTPException(status_code=503,detail=f"No model loaded from {model_registry.model_dir}")
+    try:
+        # concurrent requests are scored together by the batch scheduler
+        labels,probabilities,model_version=await batch_scheduler.submit(features)
+        request.state.rows=len(features)
+        request.state.model_version=model_version
+        return {
+            "model_version":model_version,
+            "labels":labels.tolist(),
+            "probabilities":probabilities.tolist() if probabilities is not None else None,
+        }
+    except Exception as e:
+        raise NetworkSecurityException(e,sys)
+
 
 if __name__=="__main__":
     app_run(app,host="0.0.0.0",port=8080)
 
-print(" Deployment trigger")
 # Triggering CI/CD again!
 
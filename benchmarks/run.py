@@ -0,0 +1,356 @@
+import os,sys
+import argparse
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Times the training and serving hot paths on synthetic data and writes one JSON report, so runs can be
+# compared with --baseline. Everything runs inside a scratch workspace (Artifacts, final_model, logs and
+# mlruns are all relative to the working directory), the checkout itself is never written to.
+#
+#   python -m benchmarks.run --rows 100000 --output bench.json --baseline previous.json
+#
+# Needs mongomock (ingestion runs against an in-memory Mongo) and httpx (FastAPI TestClient), both pinned in
+# requirements-dev.txt; a stage whose dependency is missing is reported as skipped.
+
+REPO_DIR=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BATCH_SIZES="1,10,100,1000,10000,100000,1000000"
+DEFAULT_API_BATCH_SIZES="1,100,1000"
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF)->float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak=resource.getrusage(who).ru_maxrss
+    return peak/(1024*1024) if sys.platform=="darwin" else peak/1024
+
+
+def latency_stats(seconds:list,rows:int)->dict:
+    milliseconds=np.array(seconds)*1000
+    return {
+        "rows":rows,
+        "repeats":len(seconds),
+        "mean_ms":float(milliseconds.mean()),
+        "p50_ms":float(np.percentile(milliseconds,50)),
+        "p95_ms":float(np.percentile(milliseconds,95)),
+        "p99_ms":float(np.percentile(milliseconds,99)),
+        "max_ms":float(milliseconds.max()),
+        "rows_per_second":rows/float(np.mean(seconds)),
+    }
+
+
+def sample_latency(func,rows:int,min_repeats:int,max_repeats:int,budget_seconds:float)->dict:
+    # one untimed warm-up call, then repeats until both min_repeats and the time budget are reached
+    func()
+    seconds=[]
+    start=time.perf_counter()
+    while len(seconds)<max_repeats and (len(seconds)<min_repeats or time.perf_counter()-start<budget_seconds):
+        call_start=time.perf_counter()
+        func()
+        seconds.append(time.perf_counter()-call_start)
+    return latency_stats(seconds,rows)
+
+
+class Benchmark:
+    def __init__(self,args,workdir:str):
+        self.args=args
+        self.workdir=workdir
+        self.report={"meta":self.meta(),"stages":{},"predict":{},"api":{}}
+
+    def meta(self)->dict:
+        try:
+            commit=subprocess.run(["git","rev-parse","--short","HEAD"],cwd=REPO_DIR,capture_output=True,
+                                  text=True,check=True).stdout.strip()
+        except Exception:
+            commit=None
+        import pandas,sklearn
+        return {
+            "created_at":datetime.now().isoformat(),
+            "commit":commit,
+            "python":platform.python_version(),
+            "numpy":np.__version__,
+            "pandas":pandas.__version__,
+            "sklearn":sklearn.__version__,
+            "platform":platform.platform(),
+            "cpu_count":os.cpu_count(),
+            "rows":self.args.rows,
+            "missing_rate":self.args.missing_rate,
+        }
+
+    def stage(self,name:str,func,rows:int):
+        # wall time plus the process' peak RSS after the stage; the increase is only non-zero for a stage
+        # that pushed the peak higher than every stage before it
+        peak_before=peak_rss_mb()
+        start=time.perf_counter()
+        result=func()
+        seconds=time.perf_counter()-start
+        self.report["stages"][name]={
+            "seconds":seconds,
+            "rows":rows,
+            "rows_per_second":rows/seconds if seconds else None,
+            "peak_rss_mb":peak_rss_mb(),
+            "peak_rss_increase_mb":peak_rss_mb()-peak_before,
+            "peak_rss_children_mb":peak_rss_mb(resource.RUSAGE_CHILDREN),
+        }
+        print(f"{name:<16} {seconds:9.3f}s  {rows/seconds if seconds else 0:12.0f} rows/s  "
+              f"peak rss {peak_rss_mb():8.1f} MB",flush=True)
+        return result
+
+    def skip(self,section:str,name:str,reason:str):
+        self.report[section][name]={"skipped":reason}
+        print(f"{name:<16} skipped: {reason}",flush=True)
+
+    def run_training(self):
+        from benchmarks.synthetic import make_dataset
+        from Network_security.entity.config_entity import (
+            TrainingPipelineConfig,DataIngestionConfig,DataValidationConfig,DataTransformationConfig,ModelTrainerConfig
+        )
+        from Network_security.components.data_ingestion import DataIngestion
+        from Network_security.components.data_validation import DataValidation
+        from Network_security.components.data_transformation import DataTransformation
+        from Network_security.components.model_trainer import ModelTrainer
+        from Network_security.utils.main_utils.utils import load_numpy_array,evaluate_models
+
+        rows=self.args.rows
+        dataframe=make_dataset(rows,missing_rate=self.args.missing_rate,random_state=self.args.seed)
+        training_pipeline_config=TrainingPipelineConfig(timestamp=datetime.now())
+
+        # ingestion: the documents are inserted untimed, the timed part is fetching them back, the feature
+        # store and the train/test split
+        data_ingestion_config=DataIngestionConfig(training_pipeline_config)
+        try:
+            import mongomock
+            mongo_client=mongomock.MongoClient()
+            mongo_client[data_ingestion_config.database_name][data_ingestion_config.collection_name].insert_many(
+                dataframe.to_dict("records"))
+            data_ingestion=DataIngestion(data_ingestion_config,mongo_client=mongo_client)
+            data_ingestion_artifact=self.stage("ingestion",data_ingestion.initiate_data_ingestion,rows)
+        except ImportError:
+            self.skip("stages","ingestion","mongomock is not installed, the dataframe is split without Mongo")
+            data_ingestion_artifact=DataIngestion(data_ingestion_config).initiate_data_ingestion(dataframe)
+        del dataframe
+
+        data_validation=DataValidation(data_ingestion_artifact,DataValidationConfig(training_pipeline_config))
+        data_validation_artifact=self.stage("validation",data_validation.initiate_data_validation,rows)
+
+        # drift on its own, on the validated splits
+        train_df=DataValidation.read_data(data_validation_artifact.valid_train_file_path)
+        test_df=DataValidation.read_data(data_validation_artifact.valid_test_file_path)
+        self.stage("drift",lambda:data_validation.detect_database_drift(base_df=train_df,current_df=test_df),
+                   len(train_df)+len(test_df))
+        del train_df,test_df
+
+        data_transformation=DataTransformation(data_validation_artifact,DataTransformationConfig(training_pipeline_config))
+        data_transformation_artifact=self.stage("transformation",data_transformation.initiate_data_transformation,rows)
+
+        model_trainer_config=ModelTrainerConfig(training_pipeline_config)
+        if self.args.search_strategy:
+            model_trainer_config.search_strategy=self.args.search_strategy
+        if self.args.max_fits:
+            model_trainer_config.search_max_fits=self.args.max_fits
+        model_trainer=ModelTrainer(model_trainer_config,data_transformation_artifact)
+        x_train,y_train,x_test,y_test=(
+            load_numpy_array(data_transformation_artifact.transformed_train_file_path,mmap_mode='r'),
+            load_numpy_array(data_transformation_artifact.transformed_train_target_file_path,mmap_mode='r'),
+            load_numpy_array(data_transformation_artifact.transformed_test_file_path,mmap_mode='r'),
+            load_numpy_array(data_transformation_artifact.transformed_test_target_file_path,mmap_mode='r'),
+        )
+        models,params=model_trainer.get_model_candidates()
+        search_results=self.stage("evaluate_models",lambda:evaluate_models(
+            x_train=x_train,y_train=y_train,x_test=x_test,y_test=y_test,models=models,param=params,
+            cv=model_trainer_config.search_cv,n_jobs=model_trainer_config.search_n_jobs,
+            strategy=model_trainer_config.search_strategy,factor=model_trainer_config.search_halving_factor,
+            max_fits=model_trainer_config.search_max_fits,max_seconds=model_trainer_config.search_max_seconds),len(y_train))
+        self.report["stages"]["evaluate_models"]["test_scores"]={
+            model_name:search_result.test_score for model_name,search_result in search_results.items()}
+        return model_trainer,data_transformation_artifact,search_results
+
+    def publish_champion(self,model_trainer,data_transformation_artifact,search_results)->str:
+        # untimed: the champion goes into the workspace's final_model the way the trainer publishes it
+        from Network_security.constants.training_pipeline import FINAL_MODEL_DIR
+        from Network_security.utils.main_utils.utils import load_object
+        from Network_security.utils.ml_utils.model.bundle import save_model_bundle,publish_model_bundle
+
+        best_model_name=max(search_results,key=lambda model_name:search_results[model_name].test_score)
+        model=search_results[best_model_name].best_estimator
+        objects={"preprocessor":load_object(data_transformation_artifact.transformed_object_file_path),"model":model}
+        compiled_model=model_trainer.compile_model(model)
+        if compiled_model is not None:
+            objects["compiled_model"]=compiled_model
+        bundle_dir=os.path.join(self.workdir,"benchmark_bundle")
+        save_model_bundle(bundle_dir,objects,{"model_name":best_model_name,"model_class":type(model).__name__})
+        publish_model_bundle(bundle_dir,FINAL_MODEL_DIR)
+        self.report["meta"]["champion_model"]=best_model_name
+        self.report["meta"]["compiled"]=compiled_model is not None
+        return bundle_dir
+
+    def run_predict(self,bundle_dir:str):
+        from benchmarks.synthetic import make_features
+        from Network_security.utils.ml_utils.model.bundle import load_network_model
+
+        batch_sizes=self.args.batch_sizes
+        # float64, the way both endpoints hand features to the model
+        features=make_features(max(batch_sizes),random_state=self.args.seed+1).to_numpy(dtype="float64")
+        from Network_security.utils.ml_utils.model.estimator import NetworkModel
+
+        network_models={"sklearn":load_network_model(bundle_dir,prefer_compiled=False)[0]}
+        if self.report["meta"]["compiled"]:
+            # "compiled" forces the flattened trees at every batch size; "served" is what the registry serves,
+            # which switches to sklearn above MODEL_COMPILED_MAX_ROWS
+            served_model=load_network_model(bundle_dir,prefer_compiled=True)[0]
+            network_models["compiled"]=NetworkModel(served_model.preprocessor,served_model.compiled_model)
+            network_models["served"]=served_model
+        for model_kind,network_model in network_models.items():
+            self.report["predict"][model_kind]={}
+            for batch_size in batch_sizes:
+                batch=features[:batch_size]
+                stats=sample_latency(lambda:network_model.predict(batch),batch_size,self.args.min_repeats,
+                                     self.args.max_repeats,self.args.budget_seconds)
+                stats["peak_rss_mb"]=peak_rss_mb()
+                self.report["predict"][model_kind][str(batch_size)]=stats
+                print(f"predict {model_kind:<8} {batch_size:>8} rows  p50 {stats['p50_ms']:10.3f} ms  "
+                      f"p99 {stats['p99_ms']:10.3f} ms  {stats['rows_per_second']:12.0f} rows/s",flush=True)
+
+    def run_api(self):
+        try:
+            from fastapi.testclient import TestClient
+        except (ImportError,RuntimeError) as e:
+            self.skip("api","predict",f"TestClient is unavailable: {e}")
+            return
+        from benchmarks.synthetic import make_features
+        from Network_security.constants.training_pipeline import SCORE_MAX_RECORDS
+        from app import app
+
+        api_batch_sizes=self.args.api_batch_sizes
+        features=make_features(max(api_batch_sizes),random_state=self.args.seed+2)
+        with TestClient(app) as client:
+            for endpoint in ("/predict","/v1/score"):
+                self.report["api"][endpoint]={}
+                for batch_size in api_batch_sizes:
+                    if endpoint=="/v1/score" and batch_size>SCORE_MAX_RECORDS:
+                        continue
+                    batch=features.iloc[:batch_size]
+                    if endpoint=="/predict":
+                        payload=batch.to_csv(index=False).encode()
+                        send=lambda:client.post(endpoint,files={"file":("batch.csv",payload,"text/csv")})
+                    else:
+                        payload=json.dumps({"records":batch.to_dict("records")})
+                        send=lambda:client.post(endpoint,content=payload,headers={"content-type":"application/json"})
+
+                    def request():
+                        response=send()
+                        if response.status_code!=200:
+                            raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+
+                    stats=sample_latency(request,batch_size,self.args.min_repeats,self.args.max_repeats,
+                                         self.args.budget_seconds)
+                    self.report["api"][endpoint][str(batch_size)]=stats
+                    print(f"api {endpoint:<10} {batch_size:>6} rows  p50 {stats['p50_ms']:10.3f} ms  "
+                          f"p99 {stats['p99_ms']:10.3f} ms  {stats['rows_per_second']:12.0f} rows/s",flush=True)
+
+    def run(self)->dict:
+        model_trainer,data_transformation_artifact,search_results=self.run_training()
+        bundle_dir=self.publish_champion(model_trainer,data_transformation_artifact,search_results)
+        self.run_predict(bundle_dir)
+        if not self.args.skip_api:
+            self.run_api()
+        self.report["meta"]["peak_rss_mb"]=peak_rss_mb()
+        return self.report
+
+
+def flatten_timings(report:dict,prefix:str="")->dict:
+    # every "seconds" and "*_ms" value of a report, keyed by its path
+    timings={}
+    for key,value in report.items():
+        path=f"{prefix}{key}"
+        if isinstance(value,dict):
+            timings.update(flatten_timings(value,f"{path}."))
+        elif isinstance(value,(int,float)) and (key=="seconds" or key in ("p50_ms","p95_ms","p99_ms")):
+            timings[path]=float(value)
+    return timings
+
+
+def compare(report:dict,baseline:dict,threshold:float)->dict:
+    current,previous=flatten_timings(report),flatten_timings(baseline)
+    comparison={}
+    for path in sorted(current.keys()&previous.keys()):
+        if not previous[path]:
+            continue
+        ratio=current[path]/previous[path]
+        comparison[path]={"baseline":previous[path],"current":current[path],"ratio":ratio,
+                          "regression":ratio>1+threshold}
+    return comparison
+
+
+def setup_workspace(workdir:str):
+    # the schema and templates are read through paths relative to the working directory
+    for name in ("data_schema","templates"):
+        target=os.path.join(workdir,name)
+        if not os.path.exists(target):
+            os.symlink(os.path.join(REPO_DIR,name),target)
+    os.makedirs(os.path.join(workdir,"prediction_output"),exist_ok=True)
+
+
+def parse_sizes(value:str)->list:
+    return sorted({int(size) for size in value.split(",") if size})
+
+
+def main(argv=None)->int:
+    parser=argparse.ArgumentParser(description="Benchmark the training and serving hot paths on synthetic data")
+    parser.add_argument("--rows",type=int,default=10_000,help="rows of synthetic training data")
+    parser.add_argument("--batch-sizes",type=parse_sizes,default=parse_sizes(DEFAULT_BATCH_SIZES),
+                        help="NetworkModel.predict batch sizes")
+    parser.add_argument("--api-batch-sizes",type=parse_sizes,default=parse_sizes(DEFAULT_API_BATCH_SIZES),
+                        help="rows per /predict and /v1/score request")
+    parser.add_argument("--missing-rate",type=float,default=0.0,help="fraction of feature values left empty")
+    parser.add_argument("--seed",type=int,default=42)
+    parser.add_argument("--search-strategy",choices=["grid","halving"],default=None)
+    parser.add_argument("--max-fits",type=int,default=None,help="cap on the model search's fits")
+    parser.add_argument("--min-repeats",type=int,default=5)
+    parser.add_argument("--max-repeats",type=int,default=200)
+    parser.add_argument("--budget-seconds",type=float,default=2.0,help="time spent sampling each latency")
+    parser.add_argument("--skip-api",action="store_true")
+    parser.add_argument("--output",default="benchmark.json")
+    parser.add_argument("--baseline",default=None,help="an earlier report to compare against")
+    parser.add_argument("--regression-threshold",type=float,default=0.1,help="slowdown reported as a regression")
+    parser.add_argument("--workdir",default=None,help="kept after the run; a temporary directory otherwise")
+    args=parser.parse_args(argv)
+
+    output_file_path=os.path.abspath(args.output)
+    baseline_file_path=os.path.abspath(args.baseline) if args.baseline else None
+    workdir=os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="network_security_bench_")
+    os.makedirs(workdir,exist_ok=True)
+    setup_workspace(workdir)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0,REPO_DIR)
+    cwd=os.getcwd()
+    os.chdir(workdir)
+    try:
+        report=Benchmark(args,workdir).run()
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir,ignore_errors=True)
+
+    regressions=[]
+    if baseline_file_path:
+        with open(baseline_file_path) as file_obj:
+            report["comparison"]=compare(report,json.load(file_obj),args.regression_threshold)
+        regressions=[path for path,entry in report["comparison"].items() if entry["regression"]]
+        for path in regressions:
+            entry=report["comparison"][path]
+            print(f"regression {path}: {entry['baseline']:.4f} -> {entry['current']:.4f} ({entry['ratio']:.2f}x)")
+    with open(output_file_path,"w") as file_obj:
+        json.dump(report,file_obj,indent=2)
+    print(f"Wrote {output_file_path}")
+    return 1 if regressions else 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from Network_security.constants.training_pipeline import SCHEMA_FILE_PATH,TARGET_COLUMN
+from Network_security.utils.main_utils.utils import read_yaml_file
+
+FEATURE_VALUES=np.array([-1,0,1],dtype=np.int8)
+
+
+# Random rows shaped like schema.yaml: every feature is -1/0/1 with its own value frequencies (some
+# columns never take 0, like the binary ones in the real data), and the ±1 label depends on a weighted
+# sum of the features and of products of feature pairs plus noise, so the models have something to learn
+# and, as on the real data, the tree ensembles learn it better than a linear model.
+def make_dataset(n_rows:int,schema_file_path:str=SCHEMA_FILE_PATH,target_column:str=TARGET_COLUMN,
+                 missing_rate:float=0.0,random_state:int=42)->pd.DataFrame:
+    rng=np.random.default_rng(random_state)
+    schema_config=read_yaml_file(schema_file_path)
+    columns=[list(column.keys())[0] for column in schema_config["columns"]]
+    feature_columns=[column for column in columns if column!=target_column]
+
+    frequencies=rng.dirichlet(np.ones(3),size=len(feature_columns))
+    binary=rng.random(len(feature_columns))<0.5
+    frequencies[binary,1]=0
+    frequencies/=frequencies.sum(axis=1,keepdims=True)
+    cumulative=frequencies.cumsum(axis=1)
+    features=FEATURE_VALUES[(rng.random((n_rows,len(feature_columns)))[:,:,None]>cumulative[None,:,:-1]).sum(axis=2)]
+
+    values=features.astype(np.float32)
+    weights=rng.normal(scale=0.5,size=len(feature_columns)).astype(np.float32)
+    pairs=rng.choice(len(feature_columns),size=(len(feature_columns),2))
+    pair_weights=rng.normal(scale=3.0,size=len(pairs)).astype(np.float32)
+    logits=values@weights+(values[:,pairs[:,0]]*values[:,pairs[:,1]])@pair_weights+rng.normal(scale=1.0,size=n_rows)
+    target=np.where(logits>np.median(logits),1,-1).astype(np.int8)
+
+    data={column:features[:,position] for position,column in enumerate(feature_columns)}
+    if missing_rate:
+        missing=rng.random(features.shape)<missing_rate
+        data={column:np.where(missing[:,position],np.nan,values).astype(np.float32)
+              for position,(column,values) in enumerate(data.items())}
+    data[target_column]=target
+    return pd.DataFrame(data)[columns]
+
+
+def make_features(n_rows:int,schema_file_path:str=SCHEMA_FILE_PATH,target_column:str=TARGET_COLUMN,
+                  random_state:int=7)->pd.DataFrame:
+    return make_dataset(n_rows,schema_file_path,target_column,random_state=random_state).drop(columns=target_column)
@@ -1,6 +1,9 @@
 import os
 import sys
-import json
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime,timezone
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,48 +15,152 @@ ca=certifi.where()
 import pandas as pd
 import numpy as np
 import pymongo
+from pymongo import UpdateOne
 
 from Network_security.exception.exception import NetworkSecurityException
-from Network_security.logging import logger
+from Network_security.logging.logger import logging
+from Network_security.constants.training_pipeline import (
+    DATA_INGESTION_DATABASE_NAME,DATA_INGESTION_COLLECTION_NAME,DATA_INGESTION_LOAD_CHUNK_SIZE,
+    DATA_INGESTION_LOAD_BATCH_SIZE,DATA_INGESTION_LOAD_N_WORKERS,DATA_INGESTION_ROW_KEY_FIELD,
+    DATA_INGESTION_UPDATED_AT_FIELD
+)
 
 class NetworkDataExtract():
-    def __init__(self):
+    def __init__(self,mongo_client=None,n_workers:int=DATA_INGESTION_LOAD_N_WORKERS,
+                 batch_size:int=DATA_INGESTION_LOAD_BATCH_SIZE):
         try:
-            pass
+            # one pooled client shared by every worker, created on first use
+            self.mongo_client=mongo_client
+            self.n_workers=n_workers
+            self.batch_size=batch_size
         except Exception as e:
             raise NetworkSecurityException(e,sys)
-    
+
+    def get_collection(self,database,collection):
+        try:
+            if self.mongo_client is None:
+                self.mongo_client=pymongo.MongoClient(MONGO_DB_URL,maxPoolSize=max(self.n_workers,1)*2)
+            return self.mongo_client[database][collection]
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
+    @staticmethod
+    def dataframe_to_records(data:pd.DataFrame)->list:
+        # one python list per column, zipped into dicts; NaN becomes None the way to_json wrote null
+        columns=[str(column) for column in data.columns]
+        values=[]
+        for column in data.columns:
+            series=data[column]
+            if series.isna().any():
+                series=series.astype(object).where(series.notna(),None)
+            values.append(series.tolist())
+        return [dict(zip(columns,row)) for row in zip(*values)]
+
+    @staticmethod
+    def row_keys(data:pd.DataFrame,seen_counts:dict)->list:
+        # hash of the row's values plus its occurrence number, so duplicate rows stay distinct documents
+        # and loading the same file again maps every row onto the document it created the first time
+        normalized=pd.DataFrame({
+            column:(series.astype("float64") if pd.api.types.is_numeric_dtype(series) else series.astype(str))
+            for column,series in data.items()
+        })
+        hashes=pd.util.hash_pandas_object(normalized,index=False).to_numpy()
+        occurrences=pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+        keys=[]
+        for row_hash,occurrence in zip(hashes.tolist(),occurrences.tolist()):
+            keys.append(f"{row_hash:016x}-{seen_counts.get(row_hash,0)+occurrence}")
+        for row_hash,count in zip(*np.unique(hashes,return_counts=True)):
+            seen_counts[int(row_hash)]=seen_counts.get(int(row_hash),0)+int(count)
+        return keys
+
     def csv_to_json_convertor(self,file_path):
         try:
             data=pd.read_csv(file_path)
             data.reset_index(drop=True,inplace=True)
-            records=list(json.loads(data.T.to_json()).values())
+            records=self.dataframe_to_records(data)
             return records
         except Exception as e:
             raise NetworkSecurityException(e,sys)
-        
-    def insert_data_mongodb(self,records,database,collection):
+
+    def _write_batch(self,collection,records:list,upsert:bool)->int:
+        # training ingestion re-fetches documents by this marker; in upsert mode it is only set on insert,
+        # so reloading a file does not make every document look changed
+        written_at=datetime.now(timezone.utc)
+        for record in records:
+            record[DATA_INGESTION_UPDATED_AT_FIELD]=written_at
+        if upsert:
+            # $setOnInsert leaves documents that are already there untouched, _id included
+            result=collection.bulk_write([UpdateOne({DATA_INGESTION_ROW_KEY_FIELD:record[DATA_INGESTION_ROW_KEY_FIELD]},
+                                                    {"$setOnInsert":record},upsert=True) for record in records],
+                                         ordered=False)
+            return result.upserted_count
+        return len(collection.insert_many(records,ordered=False).inserted_ids)
+
+    def write_batches(self,batches,collection,upsert:bool=False)->int:
+        # at most two batches per worker are in flight, so memory stays flat however large the input is
+        written=0
+        pending=deque()
+        with ThreadPoolExecutor(max_workers=self.n_workers,thread_name_prefix="mongo-load") as executor:
+            for records in batches:
+                if len(pending)>=2*self.n_workers:
+                    written+=pending.popleft().result()
+                pending.append(executor.submit(self._write_batch,collection,records,upsert))
+            while pending:
+                written+=pending.popleft().result()
+        return written
+
+    def insert_data_mongodb(self,records,database,collection,upsert:bool=False):
         try:
             self.database=database
             self.collection=collection
             self.records=records
 
-            self.mongo_client=pymongo.MongoClient(MONGO_DB_URL)
-            self.database=self.mongo_client[self.database]
-
-            self.collection=self.database[self.collection]
-            self.collection.insert_many(self.records)
+            collection=self.get_collection(self.database,self.collection)
+            batches=(records[start:start+self.batch_size] for start in range(0,len(records),self.batch_size))
+            self.write_batches(batches,collection,upsert=upsert)
             return(len(self.records))
-        
+
         except Exception as e:
             raise NetworkSecurityException(e,sys)
-    
+
+    def load_csv(self,file_path,database,collection,upsert:bool=False,
+                 chunk_size:int=DATA_INGESTION_LOAD_CHUNK_SIZE)->int:
+        # streams the CSV chunk by chunk; returns the number of documents inserted (already present rows are
+        # not counted in upsert mode)
+        try:
+            collection=self.get_collection(database,collection)
+            collection.create_index(DATA_INGESTION_UPDATED_AT_FIELD)
+            if upsert:
+                collection.create_index(DATA_INGESTION_ROW_KEY_FIELD,unique=True,
+                                        partialFilterExpression={DATA_INGESTION_ROW_KEY_FIELD:{"$exists":True}})
+            seen_counts={}
+
+            def batches():
+                for chunk in pd.read_csv(file_path,chunksize=chunk_size):
+                    records=self.dataframe_to_records(chunk)
+                    if upsert:
+                        for record,row_key in zip(records,self.row_keys(chunk,seen_counts)):
+                            record[DATA_INGESTION_ROW_KEY_FIELD]=row_key
+                    for start in range(0,len(records),self.batch_size):
+                        yield records[start:start+self.batch_size]
+
+            written=self.write_batches(batches(),collection,upsert=upsert)
+            logging.info(f"Loaded {file_path} into {database}.{collection.name}: {written} documents written")
+            return written
+        except Exception as e:
+            raise NetworkSecurityException(e,sys)
+
 if __name__=='__main__':
-    FILE_PATH="Network_security_data\phisingData.csv"
-    DATABASE="KUNAL_AI"
-    Collection="Networkdata"
-    networkobj=NetworkDataExtract()
-    records=networkobj.csv_to_json_convertor(file_path=FILE_PATH)
-    print(records)
-    no_of_records=networkobj.insert_data_mongodb(records,DATABASE,Collection)
-    print(no_of_records)
\ No newline at end of file
+    parser=argparse.ArgumentParser(description="Load a CSV of URL features into MongoDB")
+    parser.add_argument("file_path",nargs="?",default=os.path.join("Network_security_data","phisingData.csv"))
+    parser.add_argument("--database",default=DATA_INGESTION_DATABASE_NAME)
+    parser.add_argument("--collection",default=DATA_INGESTION_COLLECTION_NAME)
+    parser.add_argument("--upsert",action="store_true",help="skip rows that an earlier load already wrote")
+    parser.add_argument("--chunk-size",type=int,default=DATA_INGESTION_LOAD_CHUNK_SIZE)
+    parser.add_argument("--batch-size",type=int,default=DATA_INGESTION_LOAD_BATCH_SIZE)
+    parser.add_argument("--workers",type=int,default=DATA_INGESTION_LOAD_N_WORKERS)
+    args=parser.parse_args()
+    networkobj=NetworkDataExtract(n_workers=args.workers,batch_size=args.batch_size)
+    no_of_records=networkobj.load_csv(args.file_path,args.database,args.collection,upsert=args.upsert,
+                                      chunk_size=args.chunk_size)
+    print(no_of_records)
@@ -0,0 +1,49 @@
+import os
+import sys
+import pickle
+
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from Network_security.constants.training_pipeline import TARGET_COLUMN,FINAL_MODEL_FILE_NAME,FINAL_PREPROCESSOR_FILE_NAME
+from Network_security.utils.ml_utils.model.estimator import NetworkModel
+from Network_security.utils.ml_utils.preprocessing.imputer import FastKNNImputer
+
+REPO_ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# push_data.py lives at the repository root, outside the package
+sys.path.insert(0,REPO_ROOT)
+PHISHING_DATA_FILE_PATH=os.path.join(REPO_ROOT,"Network_security_data","phisingData.csv")
+
+
+@pytest.fixture(autouse=True)
+def repo_root_cwd(monkeypatch):
+    # schema and template paths in the package are relative to the repository root
+    monkeypatch.chdir(REPO_ROOT)
+
+
+@pytest.fixture(scope="session")
+def phishing_data()->pd.DataFrame:
+    return pd.read_csv(PHISHING_DATA_FILE_PATH)
+
+
+@pytest.fixture(scope="session")
+def network_model(phishing_data)->NetworkModel:
+    features=phishing_data.drop(columns=TARGET_COLUMN).iloc[:3000]
+    target=phishing_data[TARGET_COLUMN].iloc[:3000].replace(-1,0)
+    preprocessor=FastKNNImputer().fit(features)
+    model=DecisionTreeClassifier(max_depth=8,random_state=0).fit(preprocessor.transform(features),target)
+    return NetworkModel(preprocessor=preprocessor,model=model)
+
+
+@pytest.fixture
+def model_dir(tmp_path,network_model)->str:
+    # a final_model directory in the plain pickle layout the registry still serves
+    model_dir=tmp_path/"final_model"
+    model_dir.mkdir()
+    with open(model_dir/FINAL_PREPROCESSOR_FILE_NAME,"wb") as file_obj:
+        pickle.dump(network_model.preprocessor,file_obj)
+    with open(model_dir/FINAL_MODEL_FILE_NAME,"wb") as file_obj:
+        pickle.dump(network_model.model,file_obj)
+    return str(model_dir)
+
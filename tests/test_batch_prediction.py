@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Network_security.constants.training_pipeline import TARGET_COLUMN,BATCH_PREDICTION_OUTPUT_COLUMN
+from Network_security.entity.config_entity import BatchPredictionConfig
+from Network_security.pipeline.batch_prediction import BatchPrediction
+
+
+def run_batch_prediction(tmp_path,model_dir,frame:pd.DataFrame)->pd.DataFrame:
+    input_file_path=tmp_path/"input.csv"
+    frame.to_csv(input_file_path,index=False)
+    batch_prediction_config=BatchPredictionConfig(input_file_path=str(input_file_path),
+                                                  output_file_path=str(tmp_path/"output.csv"),
+                                                  model_dir=model_dir,chunk_size=500,n_workers=1)
+    batch_prediction_artifact=BatchPrediction(batch_prediction_config).initiate_batch_prediction()
+    assert batch_prediction_artifact.rows_scored==len(frame)
+    return pd.read_csv(batch_prediction_artifact.output_file_path)
+
+
+@pytest.fixture
+def scoring_frame(phishing_data)->pd.DataFrame:
+    return phishing_data.drop(columns=TARGET_COLUMN).iloc[3000:5000].reset_index(drop=True)
+
+
+def test_predictions_match_the_model(tmp_path,model_dir,network_model,scoring_frame):
+    output=run_batch_prediction(tmp_path,model_dir,scoring_frame)
+    np.testing.assert_array_equal(output[BATCH_PREDICTION_OUTPUT_COLUMN],network_model.predict(scoring_frame))
+
+
+def test_reordered_columns_are_scored_in_schema_order(tmp_path,model_dir,network_model,scoring_frame):
+    reordered=scoring_frame[scoring_frame.columns[::-1]]
+    output=run_batch_prediction(tmp_path,model_dir,reordered)
+    assert list(output.columns[:-1])==list(reordered.columns)
+    np.testing.assert_array_equal(output[BATCH_PREDICTION_OUTPUT_COLUMN],network_model.predict(scoring_frame))
+
+
+def test_extra_columns_are_kept_but_not_scored(tmp_path,model_dir,network_model,phishing_data,scoring_frame):
+    with_extra=scoring_frame.assign(url_id=np.arange(len(scoring_frame)))
+    with_extra[TARGET_COLUMN]=phishing_data[TARGET_COLUMN].iloc[3000:5000].to_numpy()
+    output=run_batch_prediction(tmp_path,model_dir,with_extra)
+    np.testing.assert_array_equal(output["url_id"],np.arange(len(scoring_frame)))
+    np.testing.assert_array_equal(output[BATCH_PREDICTION_OUTPUT_COLUMN],network_model.predict(scoring_frame))
+
+
+def test_values_outside_the_schema_domain_are_rejected(tmp_path,model_dir,scoring_frame):
+    scoring_frame.iloc[7,3]=5
+    with pytest.raises(Exception,match="must be one of"):
+        run_batch_prediction(tmp_path,model_dir,scoring_frame)
+    assert not (tmp_path/"output.csv").exists()
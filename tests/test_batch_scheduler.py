@@ -0,0 +1,98 @@
+import os
+import asyncio
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from Network_security.constants.training_pipeline import TARGET_COLUMN,FINAL_MODEL_FILE_NAME
+from Network_security.serving.batch_scheduler import BatchScheduler
+from Network_security.serving.model_registry import ModelRegistry
+from Network_security.serving.prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def model_registry(model_dir)->ModelRegistry:
+    model_registry=ModelRegistry(model_dir=model_dir,poll_interval=0)
+    model_registry.load()
+    return model_registry
+
+
+def submit_all(batch_scheduler:BatchScheduler,*requests)->list:
+    async def run():
+        batch_scheduler.start()
+        try:
+            return await asyncio.gather(*(batch_scheduler.submit(features) for features in requests))
+        finally:
+            await batch_scheduler.stop()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("use_cache",[False,True])
+def test_empty_request_returns_empty_arrays(model_registry,phishing_data,use_cache):
+    batch_scheduler=BatchScheduler(model_registry,prediction_cache=PredictionCache() if use_cache else None)
+    features=phishing_data.drop(columns=TARGET_COLUMN).to_numpy(dtype="float64")
+    empty=features[:0]
+    [(labels,probabilities,model_version)]=submit_all(batch_scheduler,empty)
+    assert labels.shape==(0,) and probabilities.shape==(0,)
+    assert model_version==model_registry.get_version()
+    # alongside a request with rows
+    (labels,_,_),(other_labels,_,_)=submit_all(batch_scheduler,empty,features[:10])
+    assert labels.shape==(0,) and len(other_labels)==10
+    # an empty request never reaches the model
+    assert batch_scheduler.metrics()["rows"]==10
+
+
+@pytest.mark.parametrize("use_cache",[False,True])
+def test_scores_match_the_model(model_registry,network_model,phishing_data,use_cache):
+    batch_scheduler=BatchScheduler(model_registry,prediction_cache=PredictionCache() if use_cache else None)
+    features=phishing_data.drop(columns=TARGET_COLUMN).to_numpy(dtype="float64")[:50]
+    # the second request repeats rows of the first, which the cache answers
+    results=submit_all(batch_scheduler,features[:30],features[20:50])
+    labels=np.concatenate([results[0][0],results[1][0][10:]])
+    expected_labels,expected_probabilities=network_model.score(features)
+    np.testing.assert_array_equal(labels,expected_labels)
+    np.testing.assert_allclose(results[1][1],expected_probabilities[20:50])
+
+
+def test_cached_labels_keep_the_model_dtype(model_dir,network_model,phishing_data):
+    # a model trained on the int8 targets the transformation stage stores returns int8 labels
+    features=phishing_data.drop(columns=TARGET_COLUMN).to_numpy(dtype="float64")[:20]
+    model=DecisionTreeClassifier(max_depth=4,random_state=0).fit(
+        network_model.preprocessor.transform(features),(phishing_data[TARGET_COLUMN].to_numpy()[:20]==1).astype("int8"))
+    with open(os.path.join(model_dir,FINAL_MODEL_FILE_NAME),"wb") as file_obj:
+        pickle.dump(model,file_obj)
+    model_registry=ModelRegistry(model_dir=model_dir,poll_interval=0)
+    model_registry.load()
+
+    batch_scheduler=BatchScheduler(model_registry,prediction_cache=PredictionCache())
+    [(scored_labels,scored_probabilities,_)]=submit_all(batch_scheduler,features)
+    # every row is a cache hit now
+    [(cached_labels,cached_probabilities,_)]=submit_all(batch_scheduler,features)
+    assert batch_scheduler.metrics()["rows"]==20
+    assert scored_labels.dtype==cached_labels.dtype==np.int8
+    assert cached_probabilities.dtype==scored_probabilities.dtype
+    np.testing.assert_array_equal(cached_labels,scored_labels)
+
+
+def test_large_requests_skip_the_cache(monkeypatch,model_registry,network_model,phishing_data):
+    prediction_cache=PredictionCache(max_request_rows=100)
+    batch_scheduler=BatchScheduler(model_registry,prediction_cache=prediction_cache)
+    lookups=[]
+    lookup=prediction_cache.lookup
+
+    def counting_lookup(keys,*args):
+        lookups.append(len(keys))
+        return lookup(keys,*args)
+
+    monkeypatch.setattr(prediction_cache,"lookup",counting_lookup)
+    features=phishing_data.drop(columns=TARGET_COLUMN).to_numpy(dtype="float64")
+
+    (small_labels,_,_),(large_labels,_,_)=submit_all(batch_scheduler,features[:100],features[:500])
+    assert lookups==[100]
+    assert prediction_cache.metrics()["bypassed_rows"]==500
+    assert batch_scheduler.metrics()["rows"]==600
+    expected_labels,_=network_model.score(features[:500])
+    np.testing.assert_array_equal(large_labels,expected_labels)
+    np.testing.assert_array_equal(small_labels,expected_labels[:100])
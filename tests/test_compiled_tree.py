@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import AdaBoostClassifier,GradientBoostingClassifier,RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from Network_security.constants.training_pipeline import TARGET_COLUMN
+from Network_security.utils.ml_utils.model.compiled_tree import ROW_BLOCK_SIZE,compile_tree_model
+from Network_security.utils.ml_utils.preprocessing.imputer import FastKNNImputer
+
+MODELS={
+    "decision_tree":lambda:DecisionTreeClassifier(random_state=0),
+    "random_forest":lambda:RandomForestClassifier(n_estimators=25,max_depth=10,random_state=0),
+    "gradient_boosting":lambda:GradientBoostingClassifier(n_estimators=30,max_depth=3,random_state=0),
+    "gradient_boosting_zero_init":lambda:GradientBoostingClassifier(n_estimators=30,init="zero",random_state=0),
+}
+
+
+@pytest.fixture(scope="module")
+def ternary_data(phishing_data):
+    # int8 codes, as the transformation stage stores complete rows
+    x=phishing_data.drop(columns=TARGET_COLUMN).to_numpy(dtype=np.int8)
+    y=(phishing_data[TARGET_COLUMN].to_numpy()==1).astype(np.int8)
+    return x[:6000],y[:6000],x[6000:]
+
+
+@pytest.fixture(scope="module")
+def imputed_data(ternary_data):
+    # 10% of the cells blanked and filled by KNN imputation, which leaves fractional values like 1/3
+    x_train,y_train,x_test=ternary_data
+    rng=np.random.default_rng(0)
+
+    def blank(x):
+        x=x.astype(np.float64)
+        x[rng.random(x.shape)<0.1]=np.nan
+        return x
+
+    imputer=FastKNNImputer().fit(blank(x_train))
+    x_train_imputed=np.asarray(imputer.transform(blank(x_train)),dtype=np.float64)
+    x_test_imputed=np.asarray(imputer.transform(blank(x_test)),dtype=np.float64)
+    assert not np.isin(x_test_imputed,[-1.0,0.0,1.0]).all()
+    return x_train_imputed,y_train,x_test_imputed
+
+
+def assert_parity(model,x):
+    compiled=compile_tree_model(model)
+    assert compiled is not None
+    np.testing.assert_allclose(compiled.predict_proba(x),model.predict_proba(x),rtol=0,atol=1e-9)
+    np.testing.assert_array_equal(compiled.predict(x),model.predict(x))
+    # single rows take the path online scoring uses, without deduplication
+    np.testing.assert_allclose(compiled.predict_proba(x[:1]),model.predict_proba(x[:1]),rtol=0,atol=1e-9)
+
+
+@pytest.mark.parametrize("model_name",MODELS)
+def test_parity_on_ternary_int8_input(model_name,ternary_data):
+    x_train,y_train,x_test=ternary_data
+    model=MODELS[model_name]().fit(x_train,y_train)
+    assert x_test.dtype==np.int8
+    assert_parity(model,x_test)
+
+
+@pytest.mark.parametrize("model_name",MODELS)
+def test_parity_on_imputed_float_input(model_name,imputed_data):
+    x_train,y_train,x_test=imputed_data
+    model=MODELS[model_name]().fit(x_train,y_train)
+    assert_parity(model,x_test)
+    # a model trained on fractional values still scores complete ternary rows the same way
+    assert_parity(model,np.round(x_test))
+
+
+@pytest.mark.parametrize("model_name",MODELS)
+def test_parity_across_row_blocks(model_name,ternary_data,imputed_data):
+    x_train,y_train,x_test=imputed_data
+    model=MODELS[model_name]().fit(x_train,y_train)
+    # more rows than one block, mixing repeated ternary rows (deduplicated) with fractional ones
+    x=np.concatenate([np.tile(ternary_data[2],(2,1)),x_test])
+    assert len(x)>ROW_BLOCK_SIZE
+    assert_parity(model,x)
+
+
+def test_parity_on_multiclass_gradient_boosting(ternary_data):
+    x_train,_,x_test=ternary_data
+    y_train=x_train[:,7]+1
+    model=GradientBoostingClassifier(n_estimators=20,max_depth=3,random_state=0).fit(np.delete(x_train,7,axis=1),y_train)
+    assert_parity(model,np.delete(x_test,7,axis=1))
+
+
+@pytest.mark.parametrize("model",[
+    AdaBoostClassifier(n_estimators=10,random_state=0),
+    GradientBoostingClassifier(n_estimators=5,loss="exponential",random_state=0),
+])
+def test_unsupported_models_are_not_compiled(model,ternary_data):
+    x_train,y_train,_=ternary_data
+    assert compile_tree_model(model.fit(x_train,y_train)) is None
@@ -0,0 +1,126 @@
+from datetime import datetime,timezone
+
+import pandas as pd
+import pytest
+
+mongomock=pytest.importorskip("mongomock")
+
+from Network_security.components.data_ingestion import DataIngestion
+from Network_security.constants.training_pipeline import DATA_INGESTION_UPDATED_AT_FIELD
+from Network_security.entity.config_entity import TrainingPipelineConfig,DataIngestionConfig
+from push_data import NetworkDataExtract
+
+
+@pytest.fixture
+def data_ingestion_config(tmp_path)->DataIngestionConfig:
+    data_ingestion_config=DataIngestionConfig(TrainingPipelineConfig())
+    data_ingestion_config.snapshot_file_path=str(tmp_path/"snapshot"/"collection.parquet")
+    data_ingestion_config.snapshot_state_file_path=str(tmp_path/"snapshot"/"collection.yaml")
+    data_ingestion_config.batch_size=100
+    # the writes in a test all land within the default lookback window
+    data_ingestion_config.updated_at_lookback_seconds=0
+    return data_ingestion_config
+
+
+@pytest.fixture
+def mongo_client(phishing_data,data_ingestion_config):
+    mongo_client=mongomock.MongoClient()
+    NetworkDataExtract(mongo_client=mongo_client,n_workers=1,batch_size=100).insert_data_mongodb(
+        NetworkDataExtract.dataframe_to_records(phishing_data.iloc[:500]),
+        data_ingestion_config.database_name,data_ingestion_config.collection_name)
+    return mongo_client
+
+
+def export(data_ingestion_config,mongo_client):
+    # returns the exported frame and the number of documents fetched with their features
+    data_ingestion=DataIngestion(data_ingestion_config,mongo_client=mongo_client)
+    fetch=data_ingestion.fetch_documents_as_dataframe
+    fetched=[]
+
+    def counting_fetch(collection,query,with_ids=False):
+        dataframe=fetch(collection,query,with_ids=with_ids)
+        fetched.append(len(dataframe))
+        return dataframe
+
+    data_ingestion.fetch_documents_as_dataframe=counting_fetch
+    return data_ingestion.export_collection_as_dataframe(),sum(fetched)
+
+
+def full_export(data_ingestion_config,mongo_client)->pd.DataFrame:
+    data_ingestion=DataIngestion(data_ingestion_config,mongo_client=mongo_client)
+    return data_ingestion.fetch_documents_as_dataframe(data_ingestion.get_collection(),{},with_ids=True)
+
+
+def get_collection(data_ingestion_config,mongo_client):
+    return mongo_client[data_ingestion_config.database_name][data_ingestion_config.collection_name]
+
+
+def assert_same_rows(dataframe:pd.DataFrame,expected:pd.DataFrame):
+    expected=expected.sort_values("_id",ignore_index=True).drop(columns="_id")
+    pd.testing.assert_frame_equal(dataframe.astype("float64"),expected.astype("float64"))
+
+
+def test_unchanged_collection_reuses_the_snapshot(monkeypatch,data_ingestion_config,mongo_client):
+    first,first_fetched=export(data_ingestion_config,mongo_client)
+    collection=get_collection(data_ingestion_config,mongo_client)
+    find=type(collection).find
+    queries=[]
+
+    def recording_find(self,*args,**kwargs):
+        queries.append(args[0] if args else kwargs.get("filter"))
+        return find(self,*args,**kwargs)
+
+    monkeypatch.setattr(type(collection),"find",recording_find)
+    second,second_fetched=export(data_ingestion_config,mongo_client)
+    assert first_fetched==500
+    assert second_fetched==0
+    # nothing was deleted, so the collection's _ids are not listed
+    assert {} not in queries
+    pd.testing.assert_frame_equal(first,second)
+
+
+def test_updated_document_is_fetched_again(data_ingestion_config,mongo_client):
+    first,_=export(data_ingestion_config,mongo_client)
+    collection=get_collection(data_ingestion_config,mongo_client)
+    document=collection.find_one({},sort=[("_id",1)])
+    collection.update_one({"_id":document["_id"]},{"$set":{"URL_Length":-document["URL_Length"] or 1,
+                                                           DATA_INGESTION_UPDATED_AT_FIELD:datetime.now(timezone.utc)}})
+
+    second,second_fetched=export(data_ingestion_config,mongo_client)
+    assert second_fetched==1
+    assert second.loc[0,"URL_Length"]!=first.loc[0,"URL_Length"]
+    assert_same_rows(second,full_export(data_ingestion_config,mongo_client))
+
+
+def test_delete_balanced_by_an_insert_is_picked_up(data_ingestion_config,mongo_client,phishing_data):
+    export(data_ingestion_config,mongo_client)
+    collection=get_collection(data_ingestion_config,mongo_client)
+    collection.delete_one({"_id":collection.find_one({},sort=[("_id",1)])["_id"]})
+    NetworkDataExtract(mongo_client=mongo_client,n_workers=1).insert_data_mongodb(
+        NetworkDataExtract.dataframe_to_records(phishing_data.iloc[[600]]),
+        data_ingestion_config.database_name,data_ingestion_config.collection_name)
+
+    second,_=export(data_ingestion_config,mongo_client)
+    assert len(second)==500
+    assert_same_rows(second,full_export(data_ingestion_config,mongo_client))
+
+
+def test_documents_without_the_change_marker_are_fetched_incrementally(data_ingestion_config,mongo_client,
+                                                                       phishing_data):
+    collection=get_collection(data_ingestion_config,mongo_client)
+    # documents loaded before the marker existed
+    collection.delete_many({})
+    collection.insert_many(NetworkDataExtract.dataframe_to_records(phishing_data.iloc[:500]))
+    first,first_fetched=export(data_ingestion_config,mongo_client)
+    assert first_fetched==500
+    assert collection.count_documents({DATA_INGESTION_UPDATED_AT_FIELD:{"$exists":False}})==0
+
+    second,second_fetched=export(data_ingestion_config,mongo_client)
+    assert second_fetched==0
+    pd.testing.assert_frame_equal(first,second)
+
+    # another legacy writer adds a document without the marker
+    collection.insert_one(NetworkDataExtract.dataframe_to_records(phishing_data.iloc[[700]])[0])
+    third,third_fetched=export(data_ingestion_config,mongo_client)
+    assert third_fetched==1
+    assert_same_rows(third,full_export(data_ingestion_config,mongo_client))
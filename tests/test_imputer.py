@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.impute import KNNImputer
+
+from Network_security.utils.ml_utils.preprocessing.imputer import FastKNNImputer
+
+
+def ternary_frame(n_rows:int=300,n_columns:int=6,missing_rate:float=0.05,seed:int=0)->pd.DataFrame:
+    rng=np.random.default_rng(seed)
+    values=rng.choice([-1.0,0.0,1.0],size=(n_rows,n_columns))
+    values[rng.random(values.shape)<missing_rate]=np.nan
+    return pd.DataFrame(values,columns=[f"feature_{i}" for i in range(n_columns)])
+
+
+def test_exact_mode_matches_sklearn():
+    frame=ternary_frame()
+    expected=KNNImputer(n_neighbors=3).fit(frame).transform(frame)
+    imputer=FastKNNImputer(n_neighbors=3,mode="exact").fit(frame)
+    np.testing.assert_allclose(np.asarray(imputer.transform(frame),dtype=np.float64),expected)
+
+
+def test_complete_rows_pass_through():
+    frame=ternary_frame(missing_rate=0.0)
+    imputer=FastKNNImputer().fit(frame)
+    np.testing.assert_array_equal(np.asarray(imputer.transform(frame),dtype=np.float64),frame.to_numpy())
+
+
+@pytest.mark.parametrize("mode",["exact","indexed"])
+def test_transform_rejects_reordered_columns(mode):
+    frame=ternary_frame()
+    imputer=FastKNNImputer(mode=mode).fit(frame)
+    with pytest.raises(Exception,match="feature names should match"):
+        imputer.transform(frame[frame.columns[::-1]])
+
+
+@pytest.mark.parametrize("mode",["exact","indexed"])
+def test_transform_rejects_extra_and_missing_columns(mode):
+    frame=ternary_frame()
+    imputer=FastKNNImputer(mode=mode).fit(frame)
+    with pytest.raises(Exception,match="unexpected \\['extra'\\]"):
+        imputer.transform(frame.assign(extra=1.0))
+    with pytest.raises(Exception,match="missing \\['feature_5'\\]"):
+        imputer.transform(frame.drop(columns="feature_5"))
+
+
+def test_transform_rejects_wrong_feature_count():
+    frame=ternary_frame()
+    imputer=FastKNNImputer().fit(frame)
+    with pytest.raises(Exception,match="expecting 6 features"):
+        imputer.transform(frame.to_numpy()[:,:5])
+    # an array in the fitted column order is still accepted
+    assert imputer.transform(frame.to_numpy()).shape==frame.shape
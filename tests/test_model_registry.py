@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from Network_security.constants.training_pipeline import TARGET_COLUMN,MODEL_COMPILED_MAX_ROWS
+from Network_security.serving.model_registry import ModelRegistry
+from Network_security.utils.ml_utils.model.bundle import save_model_bundle,publish_model_bundle
+from Network_security.utils.ml_utils.model.compiled_tree import compile_tree_model
+
+
+@pytest.fixture
+def bundle_model_dir(tmp_path,network_model)->str:
+    model_dir=str(tmp_path/"final_model")
+    bundle_dir=str(tmp_path/"bundle")
+    save_model_bundle(bundle_dir,{"preprocessor":network_model.preprocessor,"model":network_model.model,
+                                  "compiled_model":compile_tree_model(network_model.model)},{})
+    publish_model_bundle(bundle_dir,model_dir)
+    return model_dir
+
+
+def count_calls(monkeypatch,model)->list:
+    calls=[]
+    predict_proba=model.predict_proba
+
+    def counting_predict_proba(x):
+        calls.append(len(x))
+        return predict_proba(x)
+
+    monkeypatch.setattr(model,"predict_proba",counting_predict_proba)
+    return calls
+
+
+def test_batch_size_picks_the_model(monkeypatch,bundle_model_dir,network_model,phishing_data):
+    model_registry=ModelRegistry(model_dir=bundle_model_dir,poll_interval=0)
+    model_registry.load()
+    served_model=model_registry.get_model()
+    assert served_model.compiled_model is not None
+    sklearn_calls=count_calls(monkeypatch,served_model.model)
+    compiled_calls=count_calls(monkeypatch,served_model.compiled_model)
+
+    features=phishing_data.drop(columns=TARGET_COLUMN).to_numpy(dtype="float64")
+    small,large=features[:MODEL_COMPILED_MAX_ROWS],features[:2000]
+    small_labels,small_probabilities=served_model.score(small)
+    large_labels,large_probabilities=served_model.score(large)
+    assert compiled_calls==[len(small)]
+    assert sklearn_calls==[len(large)]
+
+    expected_labels,expected_probabilities=network_model.score(large)
+    np.testing.assert_array_equal(large_labels,expected_labels)
+    np.testing.assert_array_equal(small_labels,expected_labels[:len(small)])
+    np.testing.assert_allclose(small_probabilities,expected_probabilities[:len(small)],atol=1e-9)
+
+
+def test_without_prefer_compiled_only_sklearn_is_loaded(bundle_model_dir):
+    model_registry=ModelRegistry(model_dir=bundle_model_dir,poll_interval=0,prefer_compiled=False)
+    model_registry.load()
+    served_model=model_registry.get_model()
+    assert served_model.compiled_model is None
+    assert served_model.model_for(1) is served_model.model